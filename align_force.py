@@ -3,17 +3,158 @@ Stable-Whisper를 이용한 강제 정렬 (Korean Character-Level Optimization)
 - 영어: 단어(Word) 단위 정렬
 - 한국어: 글자(Character/Syllable) 단위 정밀 정렬
 - [수정] 단어 연결 정보(^) 포함: 클라이언트에서 단어/글자 단위 선택 가능
+- [수정] Whisper 모델은 공유 캐시에서 재사용 (곡마다 로드/해제하지 않음)
+- [수정] 파일 경로 대신 메모리의 보컬 파형 입력 지원 (MP3 재디코딩/ffmpeg 호출 없이 16kHz로 리샘플)
+- [수정] Whisper 단어와 원본 토큰을 편집 거리 정렬로 대응 (개수가 달라도 대응된 구간은 ^ 유지)
+- [수정] 보컬 구간(에너지 VAD)만 잘라 구간별로 정렬 (전주/간주 무음 제외, 구간 실패는 해당 구간만 대체)
+- [수정] 구간 병렬 정렬은 워커 프로세스별 자체 모델로 실행 (한 모델을 스레드끼리 공유하지 않음)
 """
 
+import julius
+import numpy as np
 import stable_whisper
 import torch
 import datetime
+from contextlib import contextmanager
 import logging
-import gc
+import multiprocessing
+import threading
+import time
 import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+from config import (
+    WHISPER_MODEL_SIZE, WHISPER_MODEL_IDLE_TTL, MODEL_MIN_FREE_MEMORY_RATIO,
+    ALIGN_VAD, ALIGN_VAD_MIN_SILENCE, ALIGN_VAD_MAX_VOICED_RATIO, ALIGN_WORKERS
+)
+from services.model_cache import ModelCache
+from services.sequence_align import map_tokens
+from services.vad import detect_vocal_regions, split_by_regions
 
 logger = logging.getLogger(__name__)
 
+# Whisper 입력 샘플레이트
+WHISPER_SAMPLE_RATE = 16000
+
+# 모든 정렬 호출이 공유하는 Whisper 모델 캐시
+whisper_cache = ModelCache(
+    'whisper',
+    idle_ttl=WHISPER_MODEL_IDLE_TTL,
+    max_entries=1,
+    min_free_ratio=MODEL_MIN_FREE_MEMORY_RATIO
+)
+
+# 정렬 시간 통계 (로드 시간은 whisper_cache가 집계)
+_align_stats = {'calls': 0, 'failures': 0, 'total_align_seconds': 0.0, 'last_align_seconds': 0.0,
+                'last_coverage': None, 'last_regions': None, 'last_voiced_ratio': None, 'region_failures': 0}
+_align_stats_lock = threading.Lock()
+
+def _load_whisper(model_size: str, device: str):
+    return stable_whisper.load_model(model_size, device=device)
+
+# 구간 병렬 정렬용 프로세스 풀 (워커마다 자체 Whisper 모델 보유)
+# stable-whisper는 정렬 중 모델 객체에 cross-attention 훅/임시 상태를 두므로 한 모델을 스레드끼리 공유할 수 없음
+_worker_model = None
+
+def _init_region_worker(model_size: str, device: str):
+    global _worker_model
+    _worker_model = _load_whisper(model_size, device)
+
+def _align_region_in_worker(segment: np.ndarray, text: str, language: str, offset: float) -> List[Dict[str, Any]]:
+    result = _worker_model.align(torch.from_numpy(segment), text, language=language)
+    return _flatten_words(result, offset=offset)
+
+class _RegionPool:
+    """모델/장치별 워커 풀 + 사용 중인 정렬 수 (교체된 풀은 마지막 사용자가 끝난 뒤 종료)"""
+
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.executor = ProcessPoolExecutor(
+            max_workers=ALIGN_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_region_worker,
+            initargs=key
+        )
+        self.users = 0
+        self.retired = False
+
+_region_pool = None
+_region_pool_lock = threading.Lock()
+
+def _retire_region_pool_locked(pool: _RegionPool) -> bool:
+    """현재 풀에서 내림. Returns: 바로 종료해도 되면 True (사용 중이면 마지막 사용자가 종료)"""
+    global _region_pool
+    if _region_pool is pool:
+        _region_pool = None
+    pool.retired = True
+    return pool.users == 0
+
+@contextmanager
+def _borrow_region_pool(model_size: str, device: str):
+    """
+    정렬 워커 풀을 빌려 사용 (한 번 띄운 뒤 재사용, spawn으로 CUDA 상태 비공유)
+    - 모델/장치가 바뀌면 새 풀로 교체하고, 이전 풀은 진행 중인 정렬이 끝난 뒤 종료
+    """
+    global _region_pool
+    key = (model_size, device)
+    stale = None
+    with _region_pool_lock:
+        if _region_pool is not None and _region_pool.key != key:
+            old = _region_pool
+            if _retire_region_pool_locked(old):
+                stale = old
+        if _region_pool is None:
+            _region_pool = _RegionPool(key)
+        pool = _region_pool
+        pool.users += 1
+    if stale is not None:
+        stale.executor.shutdown(wait=False)
+    try:
+        yield pool
+    finally:
+        with _region_pool_lock:
+            pool.users -= 1
+            finished = pool.retired and pool.users == 0
+        if finished:
+            pool.executor.shutdown(wait=False)
+
+def _discard_region_pool(pool: _RegionPool):
+    """워커가 죽어 깨진 풀은 버림 (다음 정렬에서 새로 띄움, 종료는 마지막 사용자가 처리)"""
+    with _region_pool_lock:
+        _retire_region_pool_locked(pool)
+
+def preload_whisper_model(device: str = 'cuda', model_size: str = None):
+    """서버 시작 시 Whisper 모델을 미리 올려둠 (첫 정렬 요청의 로드 지연 제거)"""
+    model_size = model_size or WHISPER_MODEL_SIZE
+    with whisper_cache.acquire((model_size, device), lambda: _load_whisper(model_size, device), device):
+        pass
+
+def get_align_metrics() -> dict:
+    """모델 로드 시간 vs 정렬 시간 비교용 통계"""
+    with _align_stats_lock:
+        stats = dict(_align_stats)
+    cache_stats = whisper_cache.stats()
+    stats['avg_align_seconds'] = (stats['total_align_seconds'] / stats['calls']) if stats['calls'] else 0.0
+    stats['model_loads'] = cache_stats['misses']
+    stats['total_load_seconds'] = cache_stats['total_load_seconds']
+    stats['cache'] = cache_stats
+    return stats
+
+def prepare_waveform(audio, samplerate: int, device: str = 'cpu') -> torch.Tensor:
+    """
+    (channels, samples) 또는 (samples,) 파형 → Whisper 입력 (16kHz 모노 float32)
+    - 다운믹스 후 리샘플하여 연산량 최소화, 리샘플은 julius 다상(polyphase) sinc 필터 (GPU 가능)
+    """
+    if isinstance(audio, np.ndarray) and not audio.flags.writeable:
+        audio = np.array(audio)
+    wav = torch.as_tensor(audio, dtype=torch.float32)
+    if wav.dim() == 2:
+        wav = wav.mean(0)
+    if samplerate != WHISPER_SAMPLE_RATE:
+        wav = julius.resample_frac(wav.to(device), int(samplerate), WHISPER_SAMPLE_RATE)
+    return wav.contiguous()
+
 def format_timestamp(seconds: float) -> str:
     """초 단위를 mm:ss.xx 형식으로 변환"""
     if seconds is None: return "00:00.00"
@@ -42,70 +183,191 @@ def preprocess_text_for_sync(text: str) -> str:
             tokens.append(word)
     return " ".join(tokens)
 
-def align_lyrics(audio_path: str, text: str, device: str = 'cuda', language: str = 'ko') -> str:
+def tokenize_lyrics(text: str) -> List[Dict[str, Any]]:
+    """
+    원본 가사 → 정렬 단위 토큰 ('이어지는 글자' 여부 포함)
+    [{'text': '사', 'is_start': True}, {'text': '랑', 'is_start': False}, ...]
+    """
+    tokens = []
+    for word in text.replace('\n', ' ').strip().split():
+        has_korean = any(ord('가') <= ord(c) <= ord('힣') for c in word)
+        if has_korean:
+            for i, char in enumerate(word):
+                tokens.append({
+                    'text': char,
+                    'is_start': (i == 0) # 단어의 첫 글자만 True
+                })
+        else:
+            tokens.append({'text': word, 'is_start': True})
+    return tokens
+
+def _flatten_words(result, offset: float = 0.0) -> List[Dict[str, Any]]:
+    """Whisper 결과 → [{'start', 'end', 'text'}] (구간 정렬이면 구간 시작만큼 이동)"""
+    words = []
+    for segment in result.segments:
+        for word in segment.words:
+            w_text = word.word.strip()
+            if w_text:
+                words.append({'start': word.start + offset, 'end': word.end + offset, 'text': w_text})
+    return words
+
+def _spread_tokens(tokens: List[Dict[str, Any]], region: Tuple[float, float]) -> List[Dict[str, Any]]:
+    """정렬 실패 구간: 토큰을 구간 안에 글자 수 비례로 배치 (가사가 통째로 빠지지 않도록)"""
+    start, end = region
+    total = sum(len(t['text']) for t in tokens) or 1
+    words, cursor = [], start
+    for t in tokens:
+        length = (end - start) * len(t['text']) / total
+        words.append({'start': cursor, 'end': cursor + length, 'text': t['text']})
+        cursor += length
+    return words
+
+def _split_lyrics(text: str, regions: List[Tuple[float, float]]) -> List[List[Dict[str, Any]]]:
+    """
+    가사를 보컬 구간 길이에 비례하여 나눔 (구간별 토큰 목록)
+    - 줄 단위로 나누고, 줄 수가 구간 수보다 적으면 단어 단위로 나눔
+    """
+    units = [line for line in text.split('\n') if line.strip()]
+    if len(units) < len(regions):
+        units = text.split()
+    unit_tokens = [tokenize_lyrics(unit) for unit in units]
+    ranges = split_by_regions([sum(len(t['text']) for t in tokens) for tokens in unit_tokens], regions)
+    return [[t for tokens in unit_tokens[first:last] for t in tokens] for first, last in ranges]
+
+def _align_regions(model, wav: torch.Tensor, text: str, regions: List[Tuple[float, float]],
+                   language: str, pool: Optional[_RegionPool] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    보컬 구간별 정렬 (pool이 있으면 워커 프로세스 병렬, 없으면 공유 모델로 순차)
+    - 한 구간의 실패는 해당 구간만 균등 배치로 대체
+    Returns: (Whisper 단어 목록, 실패 구간 수)
+    """
+    parts = _split_lyrics(text, regions)
+    jobs = [(region, tokens) for region, tokens in zip(regions, parts) if tokens]
+
+    def segment_of(region):
+        start, end = region
+        return wav[int(start * WHISPER_SAMPLE_RATE):int(end * WHISPER_SAMPLE_RATE)]
+
+    outcomes = []
+    if pool is not None:
+        futures = [pool.executor.submit(_align_region_in_worker, segment_of(region).cpu().numpy(),
+                               " ".join(t['text'] for t in tokens), language, region[0])
+                   for region, tokens in jobs]
+        for future in futures:
+            try:
+                outcomes.append(future.result() or ValueError("정렬 결과 없음"))
+            except BrokenProcessPool as e:
+                _discard_region_pool(pool)
+                outcomes.append(e)
+            except Exception as e:
+                outcomes.append(e)
+    else:
+        for region, tokens in jobs:
+            try:
+                result = model.align(segment_of(region), " ".join(t['text'] for t in tokens), language=language)
+                outcomes.append(_flatten_words(result, offset=region[0]) or ValueError("정렬 결과 없음"))
+            except Exception as e:
+                outcomes.append(e)
+
+    words, failures = [], 0
+    for (region, tokens), outcome in zip(jobs, outcomes):
+        if isinstance(outcome, Exception):
+            failures += 1
+            logger.warning(f"[Align] 구간 {region[0]:.1f}-{region[1]:.1f}s 정렬 실패, 균등 배치로 대체: {outcome}")
+            words.extend(_spread_tokens(tokens, region))
+        else:
+            words.extend(outcome)
+    if jobs and failures == len(jobs):
+        raise RuntimeError("모든 보컬 구간 정렬 실패")
+    return words, failures
+
+def align_lyrics(audio, text: str, device: str = 'cuda', language: str = 'ko',
+                 model_size: str = None, samplerate: int = None, segmented: bool = None) -> str:
     """
     음성과 텍스트를 강제 정렬하여 LRC 생성
     - 단어 내부의 글자(이어지는 글자)에는 '^' 접두어를 붙임
+    Args:
+        audio: 오디오 파일 경로 또는 파형 배열(numpy/torch, (channels, samples) 또는 (samples,))
+        samplerate: 파형 입력 시 샘플레이트 (필수)
+        segmented: 보컬 구간(VAD)별 정렬 여부 (None이면 ALIGN_VAD 설정, 파형 입력에만 적용)
     """
-    logger.info(f"[Align] Whisper 정렬 시작 (Device: {device})")
+    model_size = model_size or WHISPER_MODEL_SIZE
+    segmented = ALIGN_VAD if segmented is None else segmented
+    logger.info(f"[Align] Whisper 정렬 시작 (Model: {model_size}, Device: {device})")
     
-    model = None
     try:
         # 1. 원본 텍스트 분석하여 '이어지는 글자' 여부 파악
-        # original_tokens: [{'text': '사', 'is_start': True}, {'text': '랑', 'is_start': False}, ...]
-        original_tokens = []
-        raw_words = text.replace('\n', ' ').strip().split()
-        
-        for word in raw_words:
-            has_korean = any(ord('가') <= ord(c) <= ord('힣') for c in word)
-            if has_korean:
-                for i, char in enumerate(word):
-                    original_tokens.append({
-                        'text': char,
-                        'is_start': (i == 0) # 단어의 첫 글자만 True
-                    })
-            else:
-                original_tokens.append({'text': word, 'is_start': True})
+        original_tokens = tokenize_lyrics(text)
 
         # 2. Whisper 입력용 텍스트 생성
         processed_text = " ".join([t['text'] for t in original_tokens])
         
-        # 3. 모델 로드 및 정렬
-        model = stable_whisper.load_model('medium', device=device)
-        result = model.align(audio_path, processed_text, language=language)
+        # 파형 입력은 16kHz 모노로 변환하여 직접 전달 (경로 입력은 stable-whisper가 디코딩)
+        regions = None
+        if not isinstance(audio, str):
+            if not samplerate:
+                raise ValueError("파형 입력에는 samplerate가 필요합니다")
+            audio = prepare_waveform(audio, samplerate, device)
+
+            # 보컬 구간 검출: 무음(간주/전주)이 충분할 때만 구간별 정렬
+            if segmented:
+                total = audio.shape[-1] / WHISPER_SAMPLE_RATE
+                regions = detect_vocal_regions(audio.cpu().numpy(), WHISPER_SAMPLE_RATE,
+                                               min_silence=ALIGN_VAD_MIN_SILENCE)
+                voiced = sum(e - s for s, e in regions)
+                logger.info(f"[Align] 보컬 구간 {len(regions)}개, {voiced:.0f}s / {total:.0f}s")
+                if not regions or voiced > total * ALIGN_VAD_MAX_VOICED_RATIO:
+                    regions = None
+                with _align_stats_lock:
+                    _align_stats['last_voiced_ratio'] = round(voiced / total, 4) if total else None
+
+        # 3. 캐시된 모델로 정렬
+        failed_regions = 0
+        if regions and ALIGN_WORKERS > 1 and len(regions) > 1:
+            # 워커 프로세스가 각자 모델을 보유하므로 공유 캐시 모델은 사용하지 않음
+            with _borrow_region_pool(model_size, device) as pool:
+                align_start = time.time()
+                whisper_words, failed_regions = _align_regions(None, audio, text, regions, language, pool=pool)
+                align_seconds = time.time() - align_start
+        else:
+            with whisper_cache.acquire((model_size, device), lambda: _load_whisper(model_size, device), device) as model:
+                align_start = time.time()
+                if regions:
+                    whisper_words, failed_regions = _align_regions(model, audio, text, regions, language)
+                else:
+                    whisper_words = _flatten_words(model.align(audio, processed_text, language=language))
+                align_seconds = time.time() - align_start
+
+        with _align_stats_lock:
+            _align_stats['calls'] += 1
+            _align_stats['total_align_seconds'] += align_seconds
+            _align_stats['last_align_seconds'] = align_seconds
+            _align_stats['last_regions'] = len(regions) if regions else 1
+            _align_stats['region_failures'] += failed_regions
+        logger.info(f"[Align] 정렬 소요: {align_seconds:.1f}s")
         
         # 4. LRC 변환 (Whisper 결과와 원본 토큰 매핑)
         lines = ["[by:AiPlugs-TrackSeparation]"]
         
-        # Whisper 결과 플랫하게 펼치기
-        whisper_words = []
-        for segment in result.segments:
-            for word in segment.words:
-                w_text = word.word.strip()
-                if w_text:
-                    whisper_words.append({
-                        'start': word.start,
-                        'end': word.end,
-                        'text': w_text
-                    })
-        
-        # 1:1 매핑 시도 (Whisper가 토큰을 생략하지 않았다고 가정)
-        # 만약 개수가 다르면 안전하게 접두어를 붙이지 않음 (Fail-safe)
-        use_markers = len(whisper_words) == len(original_tokens)
-        if not use_markers:
-            logger.warning(f"[Align] 토큰 개수 불일치(Orig:{len(original_tokens)} vs Whisper:{len(whisper_words)}). 단어 그룹핑 비활성화.")
+        # Whisper 단어 ↔ 원본 토큰 편집 거리 정렬 (생략/병합/오인식된 부분만 대응에서 빠짐)
+        mapping, coverage = map_tokens([w['text'] for w in whisper_words], [t['text'] for t in original_tokens])
+        with _align_stats_lock:
+            _align_stats['last_coverage'] = coverage['coverage']
+        if coverage['matched'] + coverage['substituted'] < len(original_tokens):
+            logger.warning(f"[Align] 토큰 불일치 (Orig:{len(original_tokens)} vs Whisper:{len(whisper_words)}), "
+                           f"일치 {coverage['matched']} / 치환 {coverage['substituted']} (coverage={coverage['coverage']:.1%})")
+        lines.append(f"[coverage:{coverage['coverage']:.4f}]")
 
-        for i, w_obj in enumerate(whisper_words):
+        for w_obj, token_index in zip(whisper_words, mapping):
             start = format_timestamp(w_obj['start'])
             end = format_timestamp(w_obj['end'])
             text_content = w_obj['text']
             
-            # 이어지는 글자 마킹 (^)
+            # 이어지는 글자 마킹 (^): 대응된 원본 토큰이 단어 첫 글자가 아니면 붙임
+            # 대응이 없는 단어는 새 단어로 취급 (안전하게 접두어 없음)
             prefix = ""
-            if use_markers:
-                # 원본 토큰의 is_start가 False이면(이어지는 글자면) ^ 붙임
-                if not original_tokens[i]['is_start']:
-                    prefix = "^"
+            if token_index is not None and not original_tokens[token_index]['is_start']:
+                prefix = "^"
             
             lines.append(f"[{start}] <{end}> {prefix}{text_content}")
         
@@ -113,12 +375,9 @@ def align_lyrics(audio_path: str, text: str, device: str = 'cuda', language: str
         return '\n'.join(lines)
     
     except Exception as e:
+        with _align_stats_lock:
+            _align_stats['failures'] += 1
         logger.error(f"[Align] Whisper 처리 중 오류 발생: {e}")
         import traceback
         logger.error(traceback.format_exc())
-        return None
-    
-    finally:
-        if model: del model
-        gc.collect()
-        torch.cuda.empty_cache()
\ No newline at end of file
+        return None
\ No newline at end of file
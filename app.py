@@ -1,18 +1,22 @@
 import logging
+import threading
 from datetime import datetime
 import torch
 from flask import Flask
 from flask_cors import CORS
-from config import Config
-from extensions import socketio
+from config import Config, WHISPER_PRELOAD
 # processor import 제거
-from controllers.routes import bp as main_bp
-from controllers.socket_events import register_socket_events
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def create_app():
+    # 공유 객체(작업 큐/캐시 관리자/색인)는 앱을 만들 때만 초기화
+    # (정렬 워커 프로세스는 spawn 시 이 모듈을 __mp_main__으로 다시 import하므로 모듈 수준에서 만들지 않음)
+    from extensions import socketio
+    from controllers.routes import bp as main_bp
+    from controllers.socket_events import register_socket_events
+
     app = Flask(__name__)
     app.config.from_object(Config)
     CORS(app, resources={r"/*": {"origins": "*"}})
@@ -28,9 +32,10 @@ def create_app():
     register_socket_events(socketio)
     return app
 
-app = create_app()
-
 if __name__ == '__main__':
+    from extensions import socketio
+    app = create_app()
+
     logger.info("="*70)
     logger.info("🚀 YouTube Track Separator Server Starting...")
     
@@ -40,5 +45,12 @@ if __name__ == '__main__':
         logger.info(f"💾 VRAM: {torch.cuda.get_device_properties(0).total_memory / 1e9:.1f} GB")
     else:
         logger.info("🔧 Device: CPU")
+
+    if WHISPER_PRELOAD:
+        # Whisper 모델 미리 로드 (백그라운드, 서버 기동 지연 없음)
+        from align_force import preload_whisper_model
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        threading.Thread(target=preload_whisper_model, args=(device,), daemon=True).start()
+        logger.info("🔤 Whisper 모델 사전 로드 시작")
         
     socketio.run(app, host='0.0.0.0', port=5010, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
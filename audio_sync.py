@@ -20,12 +20,13 @@ class AudioSyncProcessor:
         self.sync_info = {}
         self.reference_tempo = None
 
-    def analyze_track(self, audio_path):
+    def analyze_track(self, audio_path, stem_store=None):
         """
         트랙 분석
         
         Args:
             audio_path: 오디오 파일 경로
+            stem_store: services.stem_store.StemStore (있으면 같은 이름의 트랙을 디코딩 없이 사용)
             
         Returns:
             bool: 성공 여부
@@ -34,8 +35,12 @@ class AudioSyncProcessor:
             audio_path = str(audio_path)
             logger.info(f'[분석] 시작: {audio_path}')
             
-            # 오디오 로드
-            y, sr = librosa.load(audio_path, sr=None)
+            # 오디오 로드 (저장소에 있으면 memmap에서 바로 모노 변환)
+            stem_name = Path(audio_path).stem
+            if stem_store is not None and stem_name in stem_store.names:
+                y, sr = stem_store.read(stem_name).mean(axis=0), stem_store.samplerate
+            else:
+                y, sr = librosa.load(audio_path, sr=None)
             logger.info(f'[분석] 로드 완료 - SR: {sr}, 길이: {len(y)} samples')
             
             # 템포 분석 (librosa 0.10+ 호환성)
@@ -0,0 +1,5 @@
+"""
+오프라인 성능 측정 도구
+- 합성 오디오 + 가짜 yt-dlp + 가사 스텁 + (선택) 초소형 Demucs로 TrackSeparationWorkflow 전체 실행
+- 실행: python -m benchmarks.run_pipeline --help
+"""
@@ -0,0 +1,171 @@
+"""
+Demucs CPU 추론 프로파일 품질/속도 비교
+- 고정 픽스처(합성 곡, 성분별 정답 포함)를 기준 설정(apply_model 기본값)과 프로파일 조합으로 분리
+- 설정별 소요 시간, 실시간 배수, 성분별 SDR(정답 대비)과 기준 출력 대비 SDR 보고
+- shifts 무작위 이동은 설정마다 같은 시드로 고정 (출력 차이는 설정 차이만 반영)
+
+Usage:
+    python -m benchmarks.cpu_profile --duration 30 --threads 1 4 --batch 1 4 8 --quantize
+    python -m benchmarks.cpu_profile --model htdemucs --json cpu_report.json   # 캐시된 실제 가중치 사용
+필요 조건: numpy, torch, demucs (CPU만 사용, 네트워크 불필요)
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def sdr(reference: np.ndarray, estimate: np.ndarray) -> float:
+    """신호 대 왜곡비 (dB)"""
+    noise = np.sum((reference - estimate) ** 2)
+    return float(10 * np.log10(np.sum(reference ** 2) / max(noise, 1e-12) + 1e-12))
+
+
+def _load_model(name: str):
+    from demucs import pretrained
+    from benchmarks.stubs import TINY_MODEL_NAME, build_tiny_demucs
+
+    model = build_tiny_demucs() if name == TINY_MODEL_NAME else pretrained.get_model(name)
+    model.cpu()
+    model.eval()
+    return model
+
+
+def _separate(run, model, wav, seed: int):
+    """DemucsProcessor.separate와 같은 정규화 후 run(model, mix)으로 분리"""
+    import torch
+
+    ref = wav.mean(0)
+    mix = (wav - ref.mean()) / ref.std()
+    random.seed(seed)
+    torch.manual_seed(seed)
+    started = time.perf_counter()
+    with torch.no_grad():
+        sources = run(model, mix[None])[0]
+    elapsed = time.perf_counter() - started
+    return (sources * ref.std() + ref.mean()).numpy(), elapsed
+
+
+def run_report(args) -> Dict[str, Any]:
+    import torch
+    from demucs.apply import apply_model
+    from benchmarks.fixtures import synth_stems
+    from cpu_inference import apply_model_batched, quantize_model
+
+    if args.interop_threads > 0:
+        torch.set_num_interop_threads(args.interop_threads)
+    default_threads = torch.get_num_threads()
+
+    model = _load_model(args.model)
+    stems = synth_stems(args.video_id, args.duration, model.samplerate)
+    truth = np.stack([stems[name] for name in model.sources])
+    wav = torch.from_numpy(truth.sum(0))
+    audio_seconds = wav.shape[-1] / model.samplerate
+    quantized = quantize_model(model) if args.quantize else None
+
+    def measure(label, run, threads, target):
+        torch.set_num_threads(threads)
+        _separate(run, target, wav[:, :model.samplerate * 2], args.seed)  # 워밍업
+        times, out = [], None
+        for _ in range(args.repeat):
+            out, elapsed = _separate(run, target, wav, args.seed)
+            times.append(elapsed)
+        best = min(times)
+        return {
+            'label': label,
+            'threads': threads,
+            'seconds': round(best, 3),
+            'realtime_factor': round(audio_seconds / best, 2),
+            'sdr': {name: round(sdr(truth[i], out[i]), 2) for i, name in enumerate(model.sources)},
+            'output': out
+        }
+
+    baseline_run = lambda m, mix: apply_model(m, mix, device='cpu', shifts=1, split=True,
+                                               overlap=args.overlap, progress=False)
+    baseline = measure('baseline', baseline_run, default_threads, model)
+
+    rows = [baseline]
+    for threads, batch, quant in itertools.product(args.threads, args.batch, [False, True] if args.quantize else [False]):
+        if batch <= 1:
+            run = baseline_run
+        else:
+            run = (lambda b: lambda m, mix: apply_model_batched(m, mix, shifts=1, overlap=args.overlap,
+                                                                 batch_size=b))(batch)
+        label = f"threads={threads} batch={batch}{' int8' if quant else ''}"
+        row = measure(label, run, threads, quantized if quant else model)
+        row['batch'] = batch
+        row['quantize'] = quant
+        rows.append(row)
+
+    baseline_out = baseline['output']
+    for row in rows:
+        out = row.pop('output')
+        row['speedup'] = round(baseline['seconds'] / row['seconds'], 2)
+        row['sdr_mean'] = round(float(np.mean(list(row['sdr'].values()))), 2)
+        row['sdr_vs_baseline'] = None if row is baseline else round(sdr(baseline_out, out), 2)
+
+    return {
+        'model': args.model,
+        'duration': args.duration,
+        'overlap': args.overlap,
+        'cpu_count': os.cpu_count(),
+        'default_threads': default_threads,
+        'rows': rows
+    }
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"\nmodel={report['model']}  duration={report['duration']}s  overlap={report['overlap']}  "
+          f"cpus={report['cpu_count']}  default threads={report['default_threads']}")
+    header = f"{'config':<28}{'seconds':>10}{'x rt':>8}{'speedup':>9}{'SDR':>8}{'vs base':>9}"
+    print(header)
+    print('-' * len(header))
+    for row in report['rows']:
+        vs = '-' if row['sdr_vs_baseline'] is None else f"{row['sdr_vs_baseline']:.1f}"
+        print(f"{row['label']:<28}{row['seconds']:>10.3f}{row['realtime_factor']:>8.2f}{row['speedup']:>9.2f}"
+              f"{row['sdr_mean']:>8.2f}{vs:>9}")
+
+
+def parse_args(argv=None):
+    from benchmarks.stubs import TINY_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description='Demucs CPU inference profile report')
+    parser.add_argument('--model', default=TINY_MODEL_NAME, help='Demucs 모델 이름 (기본: 무작위 초기화 소형 모델)')
+    parser.add_argument('--duration', type=float, default=30.0, help='픽스처 길이(초)')
+    parser.add_argument('--video-id', default='cpu-profile', help='픽스처 시드')
+    parser.add_argument('--threads', type=int, nargs='+', default=[os.cpu_count() or 1], help='intra-op 스레드 수 목록')
+    parser.add_argument('--interop-threads', type=int, default=1, help='inter-op 스레드 수 (0이면 기본값)')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 4], help='forward당 구간 수 목록')
+    parser.add_argument('--quantize', action='store_true', help='int8 동적 양자화 조합 포함')
+    parser.add_argument('--overlap', type=float, default=0.25)
+    parser.add_argument('--repeat', type=int, default=2, help='설정별 반복 횟수 (최소 시간 사용)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='결과를 JSON 파일로 저장')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    # GPU가 있어도 CPU 경로만 측정
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    sys.path.insert(0, str(BENCH_DIR.parent))
+    args = parse_args(argv)
+    report = run_report(args)
+    _print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n결과 저장: {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
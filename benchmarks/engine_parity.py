@@ -0,0 +1,150 @@
+"""
+TorchScript 추론 엔진 parity / 속도 확인 (eager 경로 대비)
+- 같은 모델을 eager와 내보낸 엔진(inference_engine)으로 고정 픽스처에서 분리하여 출력 비교
+- 두 경로 모두 같은 분할/배치 규칙(apply_model_batched)과 같은 시드 사용 (차이는 엔진만 반영)
+- 모델 준비 시간: eager 구성, 최초 내보내기(cold), 디스크 캐시 로드(warm)
+- 출력 SDR이 DEMUCS_ENGINE_PARITY_DB 미만이면 종료 코드 1
+
+Usage:
+    python -m benchmarks.engine_parity --duration 20 --batch 4
+    python -m benchmarks.engine_parity --model htdemucs --cache-dir /tmp/engine   # 캐시된 실제 가중치 사용
+필요 조건: numpy, torch, demucs (CPU만 사용, 네트워크 불필요)
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def run_report(args, cache_dir: Path) -> Dict[str, Any]:
+    import torch
+    from benchmarks.cpu_profile import _load_model, _separate, sdr
+    from benchmarks.fixtures import synth_stems
+    from config import DEMUCS_ENGINE_PARITY_DB
+    from cpu_inference import apply_model_batched
+    from inference_engine import DemucsEngine, is_exported
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    started = time.perf_counter()
+    model = _load_model(args.model)
+    eager_load = time.perf_counter() - started
+
+    engine = DemucsEngine('cpu', batch_size=args.batch, cache_dir=cache_dir)
+    started = time.perf_counter()
+    exported = engine.export(args.model, model)
+    export_seconds = time.perf_counter() - started
+    if not is_exported(exported):
+        raise RuntimeError(f"{args.model}: 내보내기 실패 또는 대상 아님 (로그 확인)")
+
+    started = time.perf_counter()
+    loaded = engine.load(args.model)
+    warm_load = time.perf_counter() - started
+
+    stems = synth_stems(args.video_id, args.duration, model.samplerate)
+    truth = np.stack([stems[name] for name in model.sources])
+    wav = torch.from_numpy(truth.sum(0))
+    audio_seconds = wav.shape[-1] / model.samplerate
+
+    def run(m, mix):
+        return apply_model_batched(m, mix, shifts=1, overlap=args.overlap, batch_size=args.batch)
+
+    rows = []
+    outputs = {}
+    for label, target in (('eager', model), ('torchscript', loaded)):
+        _separate(run, target, wav[:, :model.samplerate * 2], args.seed)  # 워밍업
+        times = []
+        for _ in range(args.repeat):
+            outputs[label], elapsed = _separate(run, target, wav, args.seed)
+            times.append(elapsed)
+        best = min(times)
+        rows.append({
+            'label': label,
+            'seconds': round(best, 3),
+            'realtime_factor': round(audio_seconds / best, 2),
+            'sdr_mean': round(float(np.mean([sdr(truth[i], outputs[label][i])
+                                             for i in range(len(model.sources))])), 2)
+        })
+
+    parity = sdr(outputs['eager'], outputs['torchscript'])
+    return {
+        'model': args.model,
+        'duration': args.duration,
+        'batch': args.batch,
+        'threads': torch.get_num_threads(),
+        'load_seconds': {
+            'eager': round(eager_load, 3),
+            'export_cold': round(export_seconds, 3),
+            'engine_warm': round(warm_load, 3)
+        },
+        'rows': rows,
+        'speedup': round(rows[0]['seconds'] / rows[1]['seconds'], 2),
+        'parity_sdr': round(parity, 2),
+        'max_abs_diff': float(np.abs(outputs['eager'] - outputs['torchscript']).max()),
+        'parity_threshold': DEMUCS_ENGINE_PARITY_DB,
+        'ok': parity >= DEMUCS_ENGINE_PARITY_DB
+    }
+
+
+def _print_report(report: Dict[str, Any]):
+    load = report['load_seconds']
+    print(f"\nmodel={report['model']}  duration={report['duration']}s  batch={report['batch']}  "
+          f"threads={report['threads']}")
+    print(f"load: eager {load['eager']:.3f}s  export(cold) {load['export_cold']:.3f}s  "
+          f"engine(warm) {load['engine_warm']:.3f}s")
+    header = f"{'engine':<14}{'seconds':>10}{'x rt':>8}{'SDR':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in report['rows']:
+        print(f"{row['label']:<14}{row['seconds']:>10.3f}{row['realtime_factor']:>8.2f}{row['sdr_mean']:>8.2f}")
+    status = 'OK' if report['ok'] else 'FAIL'
+    print(f"speedup x{report['speedup']:.2f}  parity {report['parity_sdr']:.1f} dB "
+          f"(>= {report['parity_threshold']:.1f}, max diff {report['max_abs_diff']:.2e})  {status}")
+
+
+def parse_args(argv=None):
+    from benchmarks.stubs import TINY_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description='Demucs TorchScript engine parity check')
+    parser.add_argument('--model', default=TINY_MODEL_NAME, help='Demucs 모델 이름 (기본: 무작위 초기화 소형 모델)')
+    parser.add_argument('--duration', type=float, default=20.0, help='픽스처 길이(초)')
+    parser.add_argument('--video-id', default='engine-parity', help='픽스처 시드')
+    parser.add_argument('--batch', type=int, default=4, help='forward당 구간 수 (내보내기 배치 크기)')
+    parser.add_argument('--threads', type=int, default=0, help='intra-op 스레드 수 (0이면 기본값)')
+    parser.add_argument('--overlap', type=float, default=0.25)
+    parser.add_argument('--repeat', type=int, default=2, help='엔진별 반복 횟수 (최소 시간 사용)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache-dir', help='내보낸 모델 저장 위치 (기본: 임시 디렉토리)')
+    parser.add_argument('--json', help='결과를 JSON 파일로 저장')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    # GPU가 있어도 CPU 경로만 측정
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    sys.path.insert(0, str(BENCH_DIR.parent))
+    args = parse_args(argv)
+    if args.cache_dir:
+        report = run_report(args, Path(args.cache_dir))
+    else:
+        with tempfile.TemporaryDirectory(prefix='engine-parity-') as tmp:
+            report = run_report(args, Path(tmp))
+    _print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n결과 저장: {args.json}")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
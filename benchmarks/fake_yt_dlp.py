@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+네트워크 없이 동작하는 yt-dlp 대역 (벤치마크 전용)
+- 실제 yt-dlp와 같은 인자 형태를 받아 합성 오디오/자막을 생성
+- --version / --dump-json / 오디오 다운로드(-o) / 자막(--write-sub, --skip-download) 지원
+- 환경 변수:
+    BENCH_DURATION   합성 곡 길이(초), 기본 60
+    BENCH_NET_DELAY  요청당 모의 네트워크 지연(초), 기본 0
+    BENCH_SUBTITLES  0이면 자막 없음으로 응답
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import synth_track, write_subtitles, write_wav  # noqa: E402
+
+
+def _option(args, name, default=None):
+    if name in args:
+        i = args.index(name)
+        if i + 1 < len(args):
+            return args[i + 1]
+    return default
+
+
+def _video_id(args) -> str:
+    for arg in args:
+        m = re.search(r'[?&]v=([\w-]+)', arg)
+        if m:
+            return m.group(1)
+    return 'unknown'
+
+
+def main(args) -> int:
+    if '--version' in args:
+        print('2099.01.01 (benchmark stand-in)')
+        return 0
+
+    duration = float(os.environ.get('BENCH_DURATION', '60'))
+    time.sleep(float(os.environ.get('BENCH_NET_DELAY', '0')))
+    video_id = _video_id(args)
+
+    if '--dump-json' in args:
+        print(json.dumps({'id': video_id, 'title': f'Benchmark {video_id}',
+                          'duration': duration, 'uploader': 'benchmark'}))
+        return 0
+
+    output = _option(args, '-o')
+    if not output:
+        print('ERROR: -o 필요', file=sys.stderr)
+        return 2
+
+    if '--skip-download' in args:
+        if os.environ.get('BENCH_SUBTITLES', '1') == '0':
+            return 0
+        out_dir = Path(output).parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_subtitles(out_dir / f'Benchmark {video_id}.ko.vtt', duration)
+        return 0
+
+    # 오디오: 합성 WAV를 요청된 형식으로 변환 (확장자 템플릿이면 YouTube 원본과 같은 AAC/m4a)
+    output_path = Path(output.replace('%(ext)s', 'm4a'))
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = Path(tmp) / 'source.wav'
+        write_wav(wav_path, synth_track(video_id, duration))
+        codec = {
+            '.mp3': ['-c:a', 'libmp3lame', '-q:a', '2'],
+            '.m4a': ['-c:a', 'aac', '-b:a', '128k']
+        }.get(output_path.suffix.lower(), ['-c:a', 'copy'])
+        proc = subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', str(wav_path), *codec, str(output_path)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f'ERROR: ffmpeg 실패: {proc.stderr}', file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,91 @@
+"""
+벤치마크용 합성 오디오 픽스처
+- video_id로 시드를 정해 같은 id는 항상 같은 음원, 다른 id는 서로 다른 음원 생성
+  (지문 재사용이 의도치 않게 분리 단계를 건너뛰지 않도록)
+- 보컬/드럼/베이스/기타 성분을 섞은 스테레오 44.1kHz, 외부 패키지 없이 numpy + wave만 사용
+"""
+
+import hashlib
+import wave
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+
+
+def _seed(video_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(video_id.encode(), digest_size=4).digest(), 'little')
+
+
+def synth_stems(video_id: str, duration: float = 60.0, sr: int = SAMPLE_RATE) -> dict:
+    """
+    성분별 스테레오 트랙 {'drums', 'bass', 'other', 'vocals'} (각 (2, samples) float32)
+    - 합이 synth_track과 정확히 같음 (분리 품질 측정의 정답으로 사용)
+    """
+    rng = np.random.default_rng(_seed(video_id))
+    n = int(duration * sr)
+    t = np.arange(n, dtype=np.float32) / sr
+    bpm = rng.uniform(80, 140)
+    beat = 60.0 / bpm
+
+    # 드럼: 박자마다 감쇠하는 노이즈 버스트
+    phase = np.mod(t, beat)
+    drums = rng.standard_normal(n).astype(np.float32) * np.exp(-phase * 40) * 0.5
+
+    # 베이스: 마디마다 바뀌는 저음 사인파
+    roots = 40 + rng.integers(0, 12, size=int(duration / (beat * 4)) + 1)
+    bass_freq = 440.0 * 2 ** ((roots[(t // (beat * 4)).astype(int)] - 69) / 12)
+    bass = np.sin(2 * np.pi * np.cumsum(bass_freq) / sr).astype(np.float32) * 0.4
+
+    # 보컬: 비브라토가 있는 선율 + 배음, 프레이즈 사이 쉼
+    notes = 60 + rng.integers(0, 12, size=int(duration / beat) + 1)
+    vocal_freq = 440.0 * 2 ** ((notes[(t // beat).astype(int)] - 69) / 12) * (1 + 0.01 * np.sin(2 * np.pi * 5.5 * t))
+    vocal_phase = 2 * np.pi * np.cumsum(vocal_freq) / sr
+    vocal = (np.sin(vocal_phase) + 0.5 * np.sin(2 * vocal_phase) + 0.25 * np.sin(3 * vocal_phase)).astype(np.float32)
+    vocal *= (np.mod(t, beat * 8) < beat * 6) * 0.3
+
+    # 기타: 느린 화음 패드
+    chord = 48 + rng.integers(0, 12) + np.array([0, 4, 7])
+    other = sum(np.sin(2 * np.pi * 440.0 * 2 ** ((m - 69) / 12) * t) for m in chord).astype(np.float32) * 0.1
+
+    stems = {
+        'drums': np.stack([drums, drums]),
+        'bass': np.stack([bass, bass]),
+        'other': np.stack([other * 1.1, other * 0.9]),
+        'vocals': np.stack([vocal * 0.9, vocal * 1.1])
+    }
+    peak = np.abs(sum(stems.values())).max()
+    scale = 0.9 / peak if peak > 0 else 1.0
+    return {name: (stem * scale).astype(np.float32) for name, stem in stems.items()}
+
+
+def synth_track(video_id: str, duration: float = 60.0, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """(2, samples) float32 스테레오 합성 곡"""
+    return sum(synth_stems(video_id, duration, sr).values())
+
+
+def write_wav(path, audio: np.ndarray, sr: int = SAMPLE_RATE):
+    """(channels, samples) float32 → 16bit PCM WAV"""
+    pcm = (np.clip(audio, -1, 1) * 32767).astype('<i2').T.copy()
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(audio.shape[0])
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(pcm.tobytes())
+
+
+def write_subtitles(path, duration: float = 60.0, line_seconds: float = 4.0):
+    """간단한 한국어 WebVTT 자막"""
+    lines = ['WEBVTT', '']
+    for i in range(int(duration // line_seconds)):
+        start, end = i * line_seconds, (i + 1) * line_seconds
+
+        def ts(sec):
+            return f"{int(sec // 3600):02d}:{int(sec % 3600 // 60):02d}:{sec % 60:06.3f}"
+        lines += [f"{ts(start)} --> {ts(end)}", f"벤치마크 가사 {i + 1}번째 줄입니다", '']
+    Path(path).write_text('\n'.join(lines), encoding='utf-8')
+
+
+def sample_lyrics(duration: float = 60.0, line_seconds: float = 4.0) -> str:
+    return '\n'.join(f"벤치마크 가사 {i + 1}번째 줄입니다" for i in range(int(duration // line_seconds)))
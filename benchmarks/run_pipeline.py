@@ -0,0 +1,210 @@
+"""
+TrackSeparationWorkflow 오프라인 벤치마크
+- 외부 의존 없이 전체 파이프라인(download → separate → encode → text → align)을 작업 큐로 실행
+- 동시성 수준별로 단계 지연 백분위(p50/p90/p99)와 시간당 처리량(jobs/hour) 보고
+
+Usage:
+    python -m benchmarks.run_pipeline --jobs 8 --concurrency 1 2 4 --duration 60
+    python -m benchmarks.run_pipeline --model htdemucs --device auto   # 캐시된 실제 가중치 사용
+필요 조건: ffmpeg, numpy, torch, demucs (네트워크 불필요)
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+PERCENTILES = (50, 90, 99)
+
+
+def _install_fake_yt_dlp(bin_dir: Path):
+    """PATH 앞쪽에 yt-dlp 대역 실행 파일 배치 (subprocess 호출이 그대로 대역을 찾도록)"""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    script = bin_dir / 'yt-dlp'
+    script.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{BENCH_DIR / "fake_yt_dlp.py"}" "$@"\n')
+    script.chmod(script.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    os.environ['PATH'] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    out = {f'p{p}': round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    out['mean'] = round(float(np.mean(values)), 3)
+    out['n'] = len(values)
+    return out
+
+
+def _make_workflow(download_dir: Path, args):
+    from benchmarks.stubs import StubLyricsCrawler, make_stub_aligner
+    from services.workflow import TrackSeparationWorkflow
+
+    # 운영 지문 색인(downloads/fingerprints.jsonl)을 열거나 정리하지 않도록 생성 시점부터 벤치마크 폴더 안의 색인 사용
+    workflow = TrackSeparationWorkflow(str(download_dir), fingerprint_index_path=download_dir / 'fingerprints.jsonl')
+    workflow.lyrics_crawler = StubLyricsCrawler(args.duration, args.lyrics_delay)
+    if not args.whisper:
+        workflow.aligner = make_stub_aligner(args.duration, args.align_delay)
+    if not args.fingerprint:
+        workflow.fingerprints = None
+    workflow.REQUIRE_MANUAL_SUBTITLES = True
+    return workflow
+
+
+def run_level(concurrency: int, args, root: Path) -> Dict[str, Any]:
+    """동시성 1개 수준 실행: 매번 빈 다운로드 폴더에서 시작 (캐시 적중 없음)"""
+    from services.job_queue import JobQueue
+
+    download_dir = root / f'c{concurrency}'
+    download_dir.mkdir(parents=True, exist_ok=True)
+    workflow = _make_workflow(download_dir, args)
+    queue = JobQueue(num_workers=concurrency, max_queue_size=args.jobs)
+    queue.start()
+
+    meta = ({'sourceType': 'official', 'title': 'Benchmark', 'artist': 'benchmark', 'album': None}
+            if args.lyrics == 'official' else {'sourceType': 'general', 'title': None, 'artist': None})
+
+    remaining = threading.Semaphore(0)
+    jobs = []
+    started = time.time()
+    for i in range(args.jobs):
+        job = queue.submit(
+            workflow.process_video,
+            {'video_id': f'bench{concurrency}x{i:03d}', 'model': args.model, 'meta': meta,
+             'streaming': args.streaming},
+            on_complete=lambda job, result: remaining.release()
+        )
+        if job is None:
+            raise RuntimeError('작업 큐 거절 (max_queue_size 확인)')
+        jobs.append(job)
+    for _ in jobs:
+        remaining.acquire()
+    elapsed = time.time() - started
+
+    stage_walls: Dict[str, List[float]] = {}
+    totals, waits, failures = [], [], []
+    for job in jobs:
+        result = job.result or {}
+        if not result.get('success'):
+            failures.append({'video_id': job.kwargs['video_id'], 'error': result.get('error')})
+        for record in result.get('timeline', []):
+            stage_walls.setdefault(record['stage'], []).append(record['wall_seconds'])
+        totals.append(job.finished_at - job.started_at)
+        waits.append(job.started_at - job.created_at)
+
+    workflow._io_pool.shutdown(wait=False)
+    workflow._text_pool.shutdown(wait=False)
+    return {
+        'concurrency': concurrency,
+        'jobs': len(jobs),
+        'failed': len(failures),
+        'failures': failures,
+        'elapsed_seconds': round(elapsed, 3),
+        'jobs_per_hour': round(len(jobs) / elapsed * 3600, 1) if elapsed > 0 else None,
+        'audio_realtime_factor': round(len(jobs) * args.duration / elapsed, 2) if elapsed > 0 else None,
+        'job_seconds': _percentiles(totals),
+        'queue_wait_seconds': _percentiles(waits),
+        'stages': {stage: _percentiles(values) for stage, values in stage_walls.items()}
+    }
+
+
+def _print_level(report: Dict[str, Any]):
+    print(f"\n== concurrency={report['concurrency']}  jobs={report['jobs']}  failed={report['failed']}  "
+          f"elapsed={report['elapsed_seconds']}s  jobs/hour={report['jobs_per_hour']}  "
+          f"x realtime={report['audio_realtime_factor']}")
+    header = f"{'stage':<20}" + ''.join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f"{'mean':>10}{'n':>6}"
+    print(header)
+    print('-' * len(header))
+    rows = [('job (run)', report['job_seconds']), ('queue wait', report['queue_wait_seconds'])]
+    rows += sorted(report['stages'].items())
+    for name, s in rows:
+        if not s:
+            continue
+        print(f"{name:<20}" + ''.join(f"{s['p' + str(p)]:>10.3f}" for p in PERCENTILES) + f"{s['mean']:>10.3f}{s['n']:>6}")
+    for failure in report['failures'][:5]:
+        print(f"  ! {failure['video_id']}: {failure['error']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TrackSeparationWorkflow offline benchmark')
+    parser.add_argument('--jobs', type=int, default=8, help='동시성 수준별 작업 수')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4], help='워커 수 목록')
+    parser.add_argument('--duration', type=float, default=60.0, help='합성 곡 길이(초)')
+    parser.add_argument('--model', default=None, help='Demucs 모델 이름 (기본: 무작위 초기화 소형 모델)')
+    parser.add_argument('--device', choices=['cpu', 'auto'], default='cpu', help='auto면 CUDA 사용 가능 시 GPU')
+    parser.add_argument('--lyrics', choices=['official', 'subtitles'], default='official',
+                        help='official: 가사 스텁, subtitles: 가짜 yt-dlp 자막')
+    parser.add_argument('--whisper', action='store_true', help='정렬에 실제 Whisper 사용 (모델이 캐시되어 있어야 함)')
+    parser.add_argument('--fingerprint', action='store_true', help='오디오 지문 단계 포함')
+    parser.add_argument('--streaming', action='store_true', help='점진적(HLS) 분리 모드')
+    parser.add_argument('--warmup', type=int, default=1, help='측정 전 모델 로드용 작업 수')
+    parser.add_argument('--net-delay', type=float, default=0.0, help='yt-dlp 호출당 모의 지연(초)')
+    parser.add_argument('--lyrics-delay', type=float, default=0.0, help='가사 조회 모의 지연(초)')
+    parser.add_argument('--align-delay', type=float, default=0.0, help='정렬 스텁 모의 지연(초)')
+    parser.add_argument('--workdir', help='작업 폴더 (기본: 임시 폴더, 종료 시 삭제)')
+    parser.add_argument('--json', help='결과를 JSON 파일로 저장')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    # torch/워크플로 import 전에 환경 구성
+    if args.device == 'cpu':
+        os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    # 가짜 yt-dlp 실행 파일을 쓰도록 subprocess 방식 고정
+    os.environ['YTDLP_ENGINE'] = 'subprocess'
+    os.environ['BENCH_DURATION'] = str(args.duration)
+    os.environ['BENCH_NET_DELAY'] = str(args.net_delay)
+    os.environ['BENCH_SUBTITLES'] = '1' if args.lyrics == 'subtitles' else '0'
+
+    root = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='yts-bench-'))
+    root.mkdir(parents=True, exist_ok=True)
+    _install_fake_yt_dlp(root / 'bin')
+
+    sys.path.insert(0, str(BENCH_DIR.parent))
+    import demucs_processor
+    from benchmarks.stubs import TINY_MODEL_NAME, build_tiny_demucs
+
+    if args.model is None:
+        args.model = TINY_MODEL_NAME
+        demucs_processor.register_model_factory(TINY_MODEL_NAME, build_tiny_demucs)
+
+    try:
+        if args.warmup > 0:
+            warm_args = argparse.Namespace(**{**vars(args), 'jobs': args.warmup})
+            run_level(1, warm_args, root / 'warmup')
+
+        reports = []
+        for concurrency in args.concurrency:
+            report = run_level(concurrency, args, root)
+            _print_level(report)
+            reports.append(report)
+
+        if args.json:
+            Path(args.json).write_text(json.dumps({
+                'settings': {k: v for k, v in vars(args).items() if k != 'json'},
+                'levels': reports
+            }, indent=2, ensure_ascii=False), encoding='utf-8')
+            print(f"\n결과 저장: {args.json}")
+        return 1 if any(r['failed'] for r in reports) else 0
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+외부 서비스/대형 모델 대역
+- StubLyricsCrawler: Bugs 크롤러 대신 고정 가사 반환 (모의 지연 포함)
+- stub_align: Whisper 정렬 대신 가사 토큰을 균등 분배한 LRC 반환 (압축 가사 단계까지 실행되도록 같은 형식)
+- build_tiny_demucs: 무작위 초기화된 소형 HTDemucs (CPU에서 빠르게 실행, 품질은 의미 없음)
+"""
+
+import time
+
+from benchmarks.fixtures import sample_lyrics
+
+TINY_MODEL_NAME = 'bench_tiny'
+SOURCES = ['drums', 'bass', 'other', 'vocals']
+
+
+class StubLyricsCrawler:
+    def __init__(self, duration: float = 60.0, delay: float = 0.0):
+        self.duration = duration
+        self.delay = delay
+
+    def fetch_lyrics(self, title, artist=None, album=None):
+        time.sleep(self.delay)
+        return {'title': title, 'artist': artist, 'lyrics': sample_lyrics(self.duration)}
+
+
+def make_stub_aligner(duration: float = 60.0, delay: float = 0.0):
+    """
+    align_lyrics와 같은 시그니처/출력 형식의 정렬 대역
+    - 가사 토큰을 곡 길이에 균등 분배한 LRC ([by]/[coverage] 태그, 토큰당 1줄, 이어지는 글자는 '^')
+    """
+    from align_force import format_timestamp, tokenize_lyrics
+
+    def stub_align(audio_path, text, device='cpu', **kwargs):
+        time.sleep(delay)
+        tokens = tokenize_lyrics(text)
+        step = duration / max(len(tokens), 1)
+        lines = ["[by:AiPlugs-TrackSeparation]", "[coverage:1.0000]"]
+        for i, token in enumerate(tokens):
+            prefix = "" if token['is_start'] else "^"
+            lines.append(f"[{format_timestamp(i * step)}] <{format_timestamp((i + 1) * step)}> {prefix}{token['text']}")
+        return '\n'.join(lines)
+    return stub_align
+
+
+def build_tiny_demucs(seed: int = 0):
+    """
+    사전학습 가중치 없이 구성한 HTDemucs (채널 8, 트랜스포머 1층)
+    - 연산 구조(STFT/U-Net/transformer/apply_model 분할)는 실제 모델과 같아 파이프라인 오버헤드 측정용으로 적합
+    """
+    import torch
+    from demucs.htdemucs import HTDemucs
+
+    torch.manual_seed(seed)
+    return HTDemucs(sources=SOURCES, channels=8, t_layers=1)
@@ -6,6 +6,110 @@ BASE_DIR = Path(__file__).resolve().parent
 DOWNLOADS_DIR = BASE_DIR / 'downloads'
 DOWNLOADS_DIR.mkdir(exist_ok=True)
 
+# 작업 큐 설정 (동시 분리 작업 수 = 워커 수)
+SEPARATION_WORKERS = int(os.environ.get('SEPARATION_WORKERS', 1))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 16))
+
+# 모델 캐시 설정 (유휴 TTL 초 - 0이면 만료 없음, 최대 보관 수, 최소 여유 메모리 비율)
+DEMUCS_MODEL_IDLE_TTL = float(os.environ.get('DEMUCS_MODEL_IDLE_TTL', 600))
+DEMUCS_MODEL_CACHE_SIZE = int(os.environ.get('DEMUCS_MODEL_CACHE_SIZE', 1))
+
+# CPU 추론 프로파일 (GPU가 없을 때만 적용, 비교: python -m benchmarks.cpu_profile)
+# 기본값은 변경 없음 (torch 스레드 기본값 + apply_model 그대로), 비교 보고서로 동등성 확인 후 조정
+# DEMUCS_CPU_THREADS: 0이면 torch 기본값, -1이면 코어 수 / SEPARATION_WORKERS
+# DEMUCS_CPU_INTEROP_THREADS: 0이면 torch 기본값 / DEMUCS_CPU_BATCH=1 이면 apply_model 그대로
+DEMUCS_CPU_THREADS = int(os.environ.get('DEMUCS_CPU_THREADS', 0))
+DEMUCS_CPU_INTEROP_THREADS = int(os.environ.get('DEMUCS_CPU_INTEROP_THREADS', 0))
+DEMUCS_CPU_QUANTIZE = os.environ.get('DEMUCS_CPU_QUANTIZE', '0') == '1'
+DEMUCS_CPU_BATCH = int(os.environ.get('DEMUCS_CPU_BATCH', 1))
+# 추론 엔진: eager(기본, pretrained 모델 그대로) / torchscript(1회 내보내 디스크 캐시, inference_engine)
+# 내보낸 모델은 eager 출력 대비 SDR이 DEMUCS_ENGINE_PARITY_DB 이상일 때만 사용
+DEMUCS_ENGINE = os.environ.get('DEMUCS_ENGINE', 'eager')
+DEMUCS_ENGINE_DIR = Path(os.environ.get('DEMUCS_ENGINE_DIR', BASE_DIR / 'engine_cache'))
+DEMUCS_ENGINE_PARITY_DB = float(os.environ.get('DEMUCS_ENGINE_PARITY_DB', 50.0))
+MODEL_MIN_FREE_MEMORY_RATIO = float(os.environ.get('MODEL_MIN_FREE_MEMORY_RATIO', 0.1))
+
+# Whisper 정렬 모델 설정 (WHISPER_PRELOAD=1 이면 서버 시작 시 미리 로드)
+WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'medium')
+WHISPER_MODEL_IDLE_TTL = float(os.environ.get('WHISPER_MODEL_IDLE_TTL', 600))
+WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', '0') == '1'
+
+# 구간별 정렬: 보컬 트랙의 에너지로 노래 구간만 골라 정렬 (ALIGN_VAD=0 이면 곡 전체 1회 정렬)
+# 보컬 비율이 ALIGN_VAD_MAX_VOICED_RATIO를 넘으면 나눠도 이득이 없어 전체 정렬
+# ALIGN_WORKERS > 1 이면 구간을 워커 프로세스로 병렬 정렬 (워커마다 Whisper 모델을 따로 로드, 메모리 x N)
+ALIGN_VAD = os.environ.get('ALIGN_VAD', '1') == '1'
+ALIGN_VAD_MIN_SILENCE = float(os.environ.get('ALIGN_VAD_MIN_SILENCE', 1.5))
+ALIGN_VAD_MAX_VOICED_RATIO = float(os.environ.get('ALIGN_VAD_MAX_VOICED_RATIO', 0.9))
+ALIGN_WORKERS = int(os.environ.get('ALIGN_WORKERS', 1))
+
+# 트랙 MP3 인코딩 동시 실행 수 (전체 작업 공유)
+STEM_ENCODE_WORKERS = int(os.environ.get('STEM_ENCODE_WORKERS', min(4, os.cpu_count() or 1)))
+
+# 점진적(스트리밍) 분리: 구간 길이/겹침(초), HLS 세그먼트 길이(초)
+STREAMING_SEPARATION = os.environ.get('STREAMING_SEPARATION', '0') == '1'
+STREAM_CHUNK_SECONDS = float(os.environ.get('STREAM_CHUNK_SECONDS', 20))
+STREAM_OVERLAP_SECONDS = float(os.environ.get('STREAM_OVERLAP_SECONDS', 2))
+STREAM_SEGMENT_SECONDS = int(os.environ.get('STREAM_SEGMENT_SECONDS', 4))
+
+# 오디오 지문 기반 분리 결과 재사용 (다른 video_id라도 같은 음원이면 재분리 생략)
+FINGERPRINT_ENABLED = os.environ.get('FINGERPRINT_ENABLED', '1') == '1'
+# 이전 형식(fingerprints.json)에는 길이 정보가 없어 사용하지 않음 (새 작업부터 다시 색인)
+FINGERPRINT_INDEX_PATH = DOWNLOADS_DIR / 'fingerprints.jsonl'
+# 재사용 조건: 정렬 오프셋(초)과 전체 길이 차이(초)가 이 값 이내 (영상 타임라인과 트랙 동기 유지)
+FINGERPRINT_MAX_OFFSET_SECONDS = float(os.environ.get('FINGERPRINT_MAX_OFFSET_SECONDS', 0.1))
+FINGERPRINT_DURATION_TOLERANCE = float(os.environ.get('FINGERPRINT_DURATION_TOLERANCE', 1.0))
+
+# downloads/ 용량 관리 (CACHE_MAX_GB=0 이면 무제한, 정책: lru | lfu)
+CACHE_MAX_GB = float(os.environ.get('CACHE_MAX_GB', 20))
+CACHE_POLICY = os.environ.get('CACHE_POLICY', 'lru')
+CACHE_DROP_INPUT = os.environ.get('CACHE_DROP_INPUT', '0') == '1'
+CACHE_JOB_RESERVE_MB = float(os.environ.get('CACHE_JOB_RESERVE_MB', 150))
+
+# 완료 작업 색인 SQLite 영속화 (CACHE_INDEX_PERSIST=0 이면 메모리 전용, 시작 시 디스크 스캔)
+CACHE_INDEX_PATH = DOWNLOADS_DIR / '.cache_index.sqlite3' if os.environ.get('CACHE_INDEX_PERSIST', '1') == '1' else None
+
+# 분리 원본 PCM 저장소 (separated/stems.bin, memmap으로 디코딩 없이 구간 읽기)
+# STEM_STORE_DTYPE: int16 (절반 크기) | float32 (무손실, zero-copy 읽기)
+# 분리 직후에는 전체 트랙을 기록(변환 단계 체크포인트)하고, 변환이 끝나면 STEM_STORE_KEEP 트랙만 남김
+# STEM_STORE_KEEP: vocals (기본, 재개 시 정렬/분석용 보컬만, int16 3분 곡 약 30MB) | all (전체, 약 4배) | none (삭제)
+# 남긴 저장소는 작업 폴더 크기에 포함되어 CACHE_MAX_GB 예산/정리 대상 (all이면 CACHE_JOB_RESERVE_MB도 상향 권장)
+STEM_STORE_DTYPE = os.environ.get('STEM_STORE_DTYPE', 'int16')
+# (이전 설정값 1/0은 all/none으로 해석)
+STEM_STORE_KEEP = os.environ.get('STEM_STORE_KEEP', 'vocals').replace('1', 'all').replace('0', 'none')
+
+# 정렬 가사 전달: 압축 형식(lyrics_url, gzip)과 함께 LRC 원문(lyrics_lrc)도 전송
+# (이전 버전 확장 프로그램은 lyrics_lrc만 읽고, 새 버전도 압축 형식 로드 실패 시 원문으로 대체)
+# 모든 클라이언트가 압축 형식을 지원한 뒤 LYRICS_INLINE_LRC=0 으로 원문 생략 가능
+LYRICS_INLINE_LRC = os.environ.get('LYRICS_INLINE_LRC', '1') == '1'
+
+# 부가 단계(자막/정렬) 재시도 한도 (초과 시 건너뜀 처리)
+STAGE_MAX_RETRIES = int(os.environ.get('STAGE_MAX_RETRIES', 2))
+
+# 트랙 파일 브라우저 캐시 기간 (내용 해시가 URL에 포함되므로 immutable)
+STEM_CACHE_MAX_AGE = int(os.environ.get('STEM_CACHE_MAX_AGE', 31536000))
+
+# yt-dlp 실행 방식: auto (패키지 있으면 라이브러리) | library | subprocess (실행 파일 호출)
+YTDLP_ENGINE = os.environ.get('YTDLP_ENGINE', 'auto')
+# 라이브러리 방식 네트워크 제한(초): 소켓 무응답 타임아웃 / 수락 제어용 정보 조회 전체 제한 (subprocess 방식의 timeout 대응)
+YTDLP_SOCKET_TIMEOUT = float(os.environ.get('YTDLP_SOCKET_TIMEOUT', 30))
+YTDLP_INFO_TIMEOUT = float(os.environ.get('YTDLP_INFO_TIMEOUT', 30))
+
+# 수락 제어: 다운로드 전 영상 길이(메타데이터)로 비용 추정 후 수락/대기/하향/거절 (길이 단위: 초)
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_MAX_DURATION = float(os.environ.get('ADMISSION_MAX_DURATION', 900))
+ADMISSION_DOWNGRADE_DURATION = float(os.environ.get('ADMISSION_DOWNGRADE_DURATION', 480))
+# 워커당 추정 대기 작업량(처리 초) 기준: 하향 / 거절
+ADMISSION_DOWNGRADE_BACKLOG = float(os.environ.get('ADMISSION_DOWNGRADE_BACKLOG', 600))
+ADMISSION_MAX_BACKLOG = float(os.environ.get('ADMISSION_MAX_BACKLOG', 3600))
+# 하향 시 모델 / 분할 겹침 비율, 오디오 1초당 처리 시간 초기 추정치 (완료 작업 실측으로 보정)
+ADMISSION_FALLBACK_MODEL = os.environ.get('ADMISSION_FALLBACK_MODEL', 'htdemucs')
+ADMISSION_FALLBACK_OVERLAP = float(os.environ.get('ADMISSION_FALLBACK_OVERLAP', 0.1))
+ADMISSION_SECONDS_PER_AUDIO_SECOND = float(os.environ.get('ADMISSION_SECONDS_PER_AUDIO_SECOND', 0.3))
+# 길이 조회 제한 시간(초): 소켓 핸들러에서 실행되므로 짧게, 초과 시 길이 미상으로 판단 (조회는 백그라운드에서 계속되어 다운로드가 재사용)
+ADMISSION_PROBE_TIMEOUT = float(os.environ.get('ADMISSION_PROBE_TIMEOUT', 5))
+
 class Config:
     SECRET_KEY = 'youtube-track-separator-secret-key-2026'
     DOWNLOADS_DIR = DOWNLOADS_DIR
+    # nginx/Apache 앞단에서 X-Sendfile로 제로카피 전송 (USE_X_SENDFILE=1)
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '0') == '1'
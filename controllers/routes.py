@@ -1,17 +1,24 @@
 import logging
 from datetime import datetime
-from flask import Blueprint, jsonify, request, send_file, render_template
+from flask import Blueprint, Response, jsonify, request, send_file, render_template
 import torch
-from extensions import downloader # downloader는 가벼워서 유지됨
-from demucs_processor import DemucsProcessor # 클래스 직접 import
-from config import DOWNLOADS_DIR
+from extensions import downloader, job_queue, cache_manager, cache_index, admission # downloader는 가벼워서 유지됨
+from demucs_processor import model_cache as demucs_model_cache
+from align_force import get_align_metrics
+from services.cache_index import TRACK_FILES
+from services.lyrics_format import FILE_NAME as LYRICS_COMPACT_FILE, GZIP_NAME as LYRICS_COMPACT_GZIP
+from services.metrics import registry as metrics_registry
+from config import DOWNLOADS_DIR, STEM_CACHE_MAX_AGE
 
 bp = Blueprint('main', __name__)
 logger = logging.getLogger(__name__)
 
+# 폴링 요청마다 CUDA 확인을 반복하지 않도록 시작 시 1회만 확인
+GPU_AVAILABLE = torch.cuda.is_available()
+
 @bp.route('/')
 def index():
-    gpu_info = "NVIDIA CUDA (활성화됨)" if torch.cuda.is_available() else "CPU 모드"
+    gpu_info = "NVIDIA CUDA (활성화됨)" if GPU_AVAILABLE else "CPU 모드"
     return render_template('index.html', gpu_info=gpu_info)
 
 @bp.route('/api/health', methods=['GET'])
@@ -19,55 +26,163 @@ def healthcheck():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'gpu_available': torch.cuda.is_available()
+        'gpu_available': GPU_AVAILABLE
     })
 
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    info = job.to_dict()
+    info['position'] = job_queue.position(job_id)
+    return jsonify(info)
+
+@bp.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    return jsonify({**job_queue.stats(), 'admission': admission.stats()})
+
+@bp.route('/api/models', methods=['GET'])
+def get_model_cache_stats():
+    return jsonify({
+        'demucs': demucs_model_cache.stats(),
+        'whisper': get_align_metrics()
+    })
+
+@bp.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(cache_manager.stats())
+
+def _runtime_gauges():
+    """요청 시점의 큐/캐시 상태를 Prometheus 지표로 변환"""
+    jobs = job_queue.stats()
+    cache = cache_manager.stats()
+    admitted = admission.stats()
+    model_caches = [demucs_model_cache.stats(), get_align_metrics()['cache']]
+    return [
+        ('job_queue_jobs', 'gauge', 'Jobs in the separation queue by status',
+         [({'status': k}, jobs[k]) for k in ('queued', 'running')]),
+        ('job_queue_workers', 'gauge', 'Separation worker threads', [({}, jobs['workers'])]),
+        ('model_cache_hits_total', 'counter', 'Model cache hits',
+         [({'cache': c['name']}, c['hits']) for c in model_caches]),
+        ('model_cache_misses_total', 'counter', 'Model cache misses (loads)',
+         [({'cache': c['name']}, c['misses']) for c in model_caches]),
+        ('model_cache_load_seconds_total', 'counter', 'Time spent loading models',
+         [({'cache': c['name']}, c['total_load_seconds']) for c in model_caches]),
+        ('download_cache_bytes', 'gauge', 'Bytes used under downloads/', [({}, cache['total_bytes'])]),
+        ('download_cache_evictions_total', 'counter', 'Evicted video directories', [({}, cache['evictions'])]),
+        ('admission_backlog_seconds', 'gauge', 'Estimated processing seconds of admitted jobs',
+         [({}, admitted['backlog_seconds'])]),
+        ('admission_decisions_total', 'counter', 'Admission decisions by action',
+         [({'action': k}, v) for k, v in admitted['decisions'].items()]),
+    ]
+
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics_registry.render(extra=_runtime_gauges()), mimetype='text/plain; version=0.0.4')
+
 @bp.route('/api/video-info/<video_id>', methods=['GET'])
 def get_video_info(video_id):
-    # DemucsProcessor 인스턴스 일시 생성 (상태 확인용, VRAM 사용 안함)
-    processor = DemucsProcessor(str(DOWNLOADS_DIR))
-    output_dir = DOWNLOADS_DIR / video_id
-    
-    # 기존 로직: 분리된 트랙이 있는지 확인
-    tracks = {}
-    separation_dir = output_dir / 'separated'
-    
-    if separation_dir.exists():
-        # processor의 메서드 활용 (MP3 기준 확인)
-        tracks_info = processor.get_separated_tracks(str(separation_dir))
-        # 웹 서빙용 경로로 변환
-        for track_name, info in tracks_info.items():
-            # info['path']는 절대 경로이므로 URL 경로로 변환 필요
-            # 확장자를 .mp3로 통일
-            tracks[track_name] = {
-                'path': f"/downloads/{video_id}/{track_name}.mp3",
-                'size': info['size']
-            }
+    # 색인 조회만 수행 (파일 시스템/torch 접근 없음)
+    tracks = cache_index.get_tracks(video_id)
+    entry = cache_index.get(video_id)
 
     return jsonify({
         'status': 'completed' if tracks else 'not_processed',
         'video_id': video_id,
-        'tracks': tracks
+        'tracks': tracks,
+        'has_lyrics': bool(entry and entry.get('lyrics_file'))
     })
 
+@bp.route('/downloads/<video_id>/stream/<filename>', methods=['GET'])
+def download_stream(video_id, filename):
+    """점진적 분리 결과 (HLS 플레이리스트/세그먼트)"""
+    stream_dir = DOWNLOADS_DIR / video_id / 'separated' / 'stream'
+    file_path = stream_dir / filename
+    if not filename.endswith(('.m3u8', '.ts')) or not file_path.is_file():
+        return jsonify({'error': 'File not found'}), 404
+
+    if filename.endswith('.m3u8'):
+        # EVENT 플레이리스트는 계속 늘어나므로 캐시 금지
+        response = send_file(file_path, mimetype='application/vnd.apple.mpegurl', max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return send_file(file_path, mimetype='video/mp2t')
+
+def _versioned(etag) -> bool:
+    """URL의 ?v=가 현재 내용 해시와 같을 때만 immutable 캐시 허용 (버전 없는 URL은 매번 재검증)"""
+    version = request.args.get('v')
+    return bool(etag and version and version == etag[:12])
+
+def _set_cache_control(response, versioned: bool):
+    if versioned:
+        response.headers['Cache-Control'] = f'public, max-age={STEM_CACHE_MAX_AGE}, immutable'
+    else:
+        # 제거/재분리 후 내용이 바뀔 수 있으므로 ETag로 재검증 (변경 없으면 304)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.expires = None
+
+@bp.route('/downloads/<video_id>/lyrics.json', methods=['GET'])
+def download_lyrics(video_id):
+    """
+    압축 형식 정렬 가사 (services/lyrics_format.py)
+    - gzip 지원 클라이언트에는 미리 압축한 사본을 그대로 전송 (요청마다 압축하지 않음)
+    """
+    entry = cache_index.get(video_id)
+    etag = entry.get('lyrics_etag') if entry else None
+    if not etag:
+        return jsonify({'error': 'File not found'}), 404
+
+    work_dir = DOWNLOADS_DIR / video_id
+    accepts_gzip = 'gzip' in request.accept_encodings
+    file_path = work_dir / (LYRICS_COMPACT_GZIP if accepts_gzip else LYRICS_COMPACT_FILE)
+    versioned = _versioned(etag)
+    try:
+        # 경로에 내용 해시(?v=)가 붙은 경우만 트랙과 같이 immutable 캐시
+        response = send_file(file_path, mimetype='application/json', conditional=True,
+                             etag=etag if accepts_gzip else f"{etag}-identity",
+                             max_age=STEM_CACHE_MAX_AGE if versioned else 0)
+    except FileNotFoundError:
+        cache_index.update(video_id)
+        return jsonify({'error': 'File not found'}), 404
+    if accepts_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    _set_cache_control(response, versioned)
+    return response
+
 @bp.route('/downloads/<video_id>/<filename>', methods=['GET'])
 def download_track(video_id, filename):
     output_dir = DOWNLOADS_DIR / video_id / 'separated'
     
     # 트랙 이름 매핑 (URL filename -> 실제 파일명)
     # 클라이언트가 'vocal.mp3' 또는 'vocals.mp3'를 요청할 수 있음
-    track_mapping = {
-        'vocal.mp3': 'vocals.mp3',
-        'bass.mp3': 'bass.mp3',
-        'drum.mp3': 'drums.mp3',
-        'other.mp3': 'other.mp3'
-    }
+    track_mapping = {f"{track}.mp3": name for track, name in TRACK_FILES.items()}
     
     actual_filename = track_mapping.get(filename, filename)
     file_path = output_dir / actual_filename
     
-    if file_path.exists() and file_path.is_file():
+    track = cache_index.get_track_file(video_id, actual_filename)
+    if track:
+        cache_manager.touch(video_id)
         # MP3 MIME Type 설정
-        return send_file(file_path, mimetype='audio/mpeg')
+        # - conditional: If-None-Match/If-Modified-Since → 304, Range → 206 (탐색 시 필요한 구간만 전송)
+        # - etag: 색인 시 계산한 내용 해시 (강한 ETag)
+        # - 파일 전송은 wsgi.file_wrapper(서버가 지원하면 sendfile) 또는 X-Sendfile 사용
+        versioned = _versioned(track.get('etag'))
+        try:
+            response = send_file(
+                file_path,
+                mimetype='audio/mpeg',
+                conditional=True,
+                etag=track.get('etag', True),
+                max_age=STEM_CACHE_MAX_AGE if versioned else 0
+            )
+        except FileNotFoundError:
+            cache_index.update(video_id)
+            return jsonify({'error': 'File not found'}), 404
+        _set_cache_control(response, versioned)
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
             
     return jsonify({'error': 'File not found'}), 404
\ No newline at end of file
@@ -1,31 +1,123 @@
 # controllers/socket_events.py
-from flask_socketio import emit
+import threading
+from flask_socketio import emit, join_room, leave_room
 from services.workflow import TrackSeparationWorkflow
-from config import DOWNLOADS_DIR
+from extensions import job_queue, cache_manager, cache_index, downloader, admission
+from config import DOWNLOADS_DIR, STREAMING_SEPARATION, ADMISSION_ENABLED, ADMISSION_PROBE_TIMEOUT
 
 def register_socket_events(socketio):
-    workflow = TrackSeparationWorkflow(str(DOWNLOADS_DIR))
-    
+    workflow = TrackSeparationWorkflow(str(DOWNLOADS_DIR), cache_manager=cache_manager, cache_index=cache_index,
+                                      downloader=downloader)
+    job_queue.start()
+
+    # 워커 스레드에서 호출되므로 socketio.emit + room(job_id)으로 라우팅
+    def on_progress(job, progress, message):
+        socketio.emit('progress', {
+            'job_id': job.id,
+            'progress': progress,
+            'message': message
+        }, to=job.id)
+
+    # 완료 알림과 뒤늦은 합류(room 참가 + 상태 확인)를 직렬화 → 알림 누락/중복 없음
+    delivery_lock = threading.Lock()
+
+    def final_event(job, result):
+        if result['success']:
+            return 'complete', {**result, 'job_id': job.id}
+        return 'error', {'job_id': job.id, 'error': result['error']}
+
+    def on_complete(job, result):
+        admission.release(job.id, result)
+        with delivery_lock:
+            socketio.emit(*final_event(job, result), to=job.id)
+            job.notified = True
+
     @socketio.on('process_video')
     def handle_process(data):
         video_id = data.get('video_id')
-        model = data.get('model', 'htdemucs')
+        model = requested_model = data.get('model', 'htdemucs')
         meta = data.get('meta')
-        
-        def progress_callback(progress, message):
-            emit('progress', {
-                'progress': progress,
-                'message': message
-            })
-        
-        result = workflow.process_video(
-            video_id=video_id,
-            model=model,
-            meta=meta,
-            progress_callback=progress_callback
+        streaming = bool(data.get('streaming', STREAMING_SEPARATION))
+
+        if not video_id:
+            emit('error', {'error': 'video_id가 필요합니다'})
+            return None
+
+        # 캐시 적중은 큐를 거치지 않고 즉시 응답
+        cached = workflow.get_cached_result(video_id)
+        if cached:
+            emit('progress', {'progress': 100, 'message': '캐시 데이터 로드 완료'})
+            emit('complete', cached)
+            return {'job_id': None, 'cached': True}
+
+        # 다운로드 전 길이 확인 → 수락/대기/하향/거절 (이미 진행 중인 작업에 합류하는 경우는 생략)
+        decision = None
+        if ADMISSION_ENABLED and not job_queue.find_active(video_id):
+            # 조회 동안 응답이 없어 보이지 않도록 먼저 알림, 조회 시간은 짧게 제한
+            emit('progress', {'progress': 0, 'message': '영상 정보 확인 중...'})
+            info = downloader.get_video_info(video_id, timeout=ADMISSION_PROBE_TIMEOUT)
+            decision = admission.decide(info.get('duration') if info else None, model, job_queue.num_workers)
+            if not decision.admitted:
+                emit('error', {'error': decision.reason, 'admission': decision.to_dict()})
+                return None
+            model = decision.model
+
+        # 워커가 진행률을 보내기 전에 room 참가
+        job_id = job_queue.new_job_id()
+        join_room(job_id)
+        if decision:
+            admission.reserve(job_id, decision)
+
+        # 점진적 분리 시 완료된 구간을 같은 room에 알림
+        def on_chunk(info):
+            socketio.emit('chunk_ready', {**info, 'job_id': job_id}, to=job_id)
+
+        job = job_queue.submit(
+            workflow.process_video,
+            {'video_id': video_id, 'model': model, 'meta': meta,
+             'streaming': streaming, 'chunk_callback': on_chunk,
+             'overlap': decision.overlap if decision else None},
+            on_progress=on_progress,
+            on_complete=on_complete,
+            job_id=job_id,
+            key=video_id,
+            info={'requested_model': requested_model}
         )
-        
-        if result['success']:
-            emit('complete', result)
-        else:
-            emit('error', {'error': result['error']})
+
+        if job is None:
+            admission.release(job_id)
+            leave_room(job_id)
+            emit('error', {'error': '서버 작업 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요.'})
+            return None
+
+        # 같은 video_id 작업이 이미 진행 중이면 해당 room에 합류하고 마지막 진행률 재전송
+        coalesced = job.id != job_id
+        if coalesced:
+            admission.release(job_id)
+            leave_room(job_id)
+            # 출력 폴더가 video_id 단위라 다른 모델 요청은 합류시킬 수 없음 (다른 트랙을 받게 됨)
+            # 비교는 처음 요청된 모델 기준 (수락 제어가 하향한 작업도 같은 요청이면 합류, 실제 모델은 queued로 알림)
+            active_model = job.info.get('requested_model', job.kwargs.get('model'))
+            if active_model != requested_model:
+                emit('error', {'error': f'같은 영상이 다른 모델({active_model})로 처리 중입니다. 완료 후 다시 시도하세요.',
+                               'job_id': job.id, 'model': active_model})
+                return None
+            model = job.kwargs.get('model', model)
+            with delivery_lock:
+                join_room(job.id)
+                finished = job.notified
+            # 조회와 room 참가 사이에 끝난 작업은 room 알림을 놓쳤으므로 결과를 직접 전달
+            if finished:
+                emit(*final_event(job, job.result))
+                return {'job_id': job.id, 'coalesced': True}
+
+        position = job_queue.position(job.id)
+        emit('queued', {'job_id': job.id, 'video_id': video_id, 'model': model, 'requested_model': requested_model,
+                        'position': position, 'coalesced': coalesced,
+                        'admission': decision.to_dict() if decision else None})
+        if position:
+            wait = f", 예상 대기 {decision.wait_seconds / 60:.0f}분" if decision and decision.wait_seconds else ''
+            emit('progress', {'job_id': job.id, 'progress': 0, 'message': f'대기열 등록됨 (순번: {position}{wait})'})
+        elif coalesced and job.progress:
+            emit('progress', {'job_id': job.id, 'progress': job.progress, 'message': job.message})
+        return {'job_id': job.id, 'coalesced': coalesced}
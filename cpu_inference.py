@@ -0,0 +1,193 @@
+"""
+CPU 전용 Demucs 추론 프로파일
+- 스레드 설정: intra-op(연산 내부) / inter-op(연산 간) 스레드 수를 명시 (워커 수만큼 코어를 나눠 과다 구독 방지)
+- int8 동적 양자화: Linear / LSTM 가중치를 int8로 (합성곱은 대상 아님, 활성값은 실행 시 양자화)
+- 분할 구간 배치 처리: apply_model(split=True)은 구간을 1개씩 forward 하므로,
+  같은 분할/가중치 규칙으로 구간을 잘라 여러 개를 쌓아 한 번에 forward (split=False와 동일한 패딩/트림)
+- 내보낸 TorchScript 모델(inference_engine)도 같은 분할 규칙으로 실행
+"""
+
+import functools
+import logging
+import os
+import random
+from typing import Optional
+
+import torch
+from demucs.apply import BagOfModels, TensorChunk, apply_model, tensor_chunk
+from demucs.utils import center_trim
+
+from config import (
+    SEPARATION_WORKERS, DEMUCS_CPU_THREADS, DEMUCS_CPU_INTEROP_THREADS,
+    DEMUCS_CPU_QUANTIZE, DEMUCS_CPU_BATCH
+)
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def configure_cpu_threads(threads: int = DEMUCS_CPU_THREADS, interop_threads: int = DEMUCS_CPU_INTEROP_THREADS) -> dict:
+    """
+    torch CPU 스레드 설정 (프로세스당 1회)
+    Args:
+        threads: intra-op 스레드 수 (0이면 torch 기본값 유지, 음수면 코어 수 / 분리 워커 수)
+        interop_threads: inter-op 스레드 수 (0이면 torch 기본값 유지)
+    """
+    if threads < 0:
+        threads = max(1, (os.cpu_count() or 1) // max(1, SEPARATION_WORKERS))
+    if threads > 0:
+        torch.set_num_threads(threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # 병렬 작업이 이미 시작된 뒤에는 변경 불가 (기본값으로 계속)
+            logger.warning(f"[CPU] inter-op 스레드 설정 불가: {e}")
+    settings = {'threads': torch.get_num_threads(), 'interop_threads': torch.get_num_interop_threads()}
+    logger.info(f"[CPU] torch 스레드 설정: {settings}")
+    return settings
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    int8 동적 양자화 사본 (원본 모델은 그대로)
+    - HTDemucs: 트랜스포머 Linear, HDemucs/Demucs: BLSTM의 LSTM/Linear
+    """
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8, inplace=False
+    )
+    quantized.eval()
+    return quantized
+
+
+def _run_batch(model, chunks, device) -> list:
+    """
+    구간들을 패딩 길이가 같은 것끼리 쌓아 1회 forward, 각 구간 길이로 다시 자름
+    (HTDemucs는 모든 구간이 학습 길이로 패딩되므로 항상 1회)
+    """
+    lengths = [chunk.length for chunk in chunks]
+    valid = [model.valid_length(n) if hasattr(model, 'valid_length') else n for n in lengths]
+    results = [None] * len(chunks)
+    for valid_length in sorted(set(valid)):
+        indices = [i for i, v in enumerate(valid) if v == valid_length]
+        batch = torch.cat([chunks[i].padded(valid_length) for i in indices]).to(device)
+        with torch.no_grad():
+            out = model(batch)
+        per_chunk = out.shape[0] // len(indices)
+        for k, i in enumerate(indices):
+            results[i] = center_trim(out[k * per_chunk:(k + 1) * per_chunk], lengths[i])
+    return results
+
+
+def _apply_split(model, mix, overlap: float, batch_size: int, device, transition_power: float = 1.0):
+    """apply_model(split=True)와 같은 구간/가중치 규칙, forward만 batch_size 구간씩 묶음"""
+    batch, channels, length = mix.shape
+    segment_length = int(model.samplerate * model.segment)
+    stride = int((1 - overlap) * segment_length)
+    weight = torch.cat([torch.arange(1, segment_length // 2 + 1, device=device),
+                        torch.arange(segment_length - segment_length // 2, 0, -1, device=device)])
+    weight = (weight / weight.max()) ** transition_power
+
+    out = torch.zeros(batch, len(model.sources), channels, length, device=mix.device)
+    sum_weight = torch.zeros(length, device=mix.device)
+    offsets = list(range(0, length, stride))
+    for first in range(0, len(offsets), batch_size):
+        group = offsets[first:first + batch_size]
+        results = _run_batch(model, [TensorChunk(mix, offset, segment_length) for offset in group], device)
+        for offset, chunk_out in zip(group, results):
+            chunk_length = chunk_out.shape[-1]
+            out[..., offset:offset + segment_length] += (weight[:chunk_length] * chunk_out).to(mix.device)
+            sum_weight[offset:offset + segment_length] += weight[:chunk_length].to(mix.device)
+    out /= sum_weight
+    return out
+
+
+def apply_model_batched(model, mix, shifts: int = 1, overlap: float = 0.25, batch_size: int = DEMUCS_CPU_BATCH,
+                        device='cpu', transition_power: float = 1.0):
+    """
+    demucs.apply.apply_model(split=True) 대체 (구간 배치 처리)
+    - BagOfModels 가중 평균 / shifts 무작위 이동 규칙은 원본과 동일
+    Args:
+        mix: (batch, channels, samples)
+    """
+    if isinstance(model, BagOfModels):
+        estimates = 0
+        totals = [0] * len(model.sources)
+        for sub_model, model_weights in zip(model.models, model.weights):
+            out = apply_model_batched(sub_model, mix, shifts, overlap, batch_size, device, transition_power)
+            for k, inst_weight in enumerate(model_weights):
+                out[:, k, :, :] *= inst_weight
+                totals[k] += inst_weight
+            estimates += out
+            del out
+        for k in range(estimates.shape[1]):
+            estimates[:, k, :, :] /= totals[k]
+        return estimates
+
+    if shifts:
+        length = mix.shape[-1]
+        max_shift = int(0.5 * model.samplerate)
+        padded_mix = tensor_chunk(mix).padded(length + 2 * max_shift)
+        out = 0
+        for _ in range(shifts):
+            offset = random.randint(0, max_shift)
+            shifted = TensorChunk(padded_mix, offset, length + max_shift - offset)
+            shifted_out = _apply_split(model, shifted.padded(shifted.length), overlap, batch_size, device,
+                                       transition_power)
+            out += shifted_out[..., max_shift - offset:]
+        out /= shifts
+        return out
+
+    return _apply_split(model, mix, overlap, batch_size, device, transition_power)
+
+
+class CpuInferenceProfile:
+    """DemucsProcessor가 CPU에서 사용하는 추론 설정 묶음"""
+
+    def __init__(self, quantize: bool = DEMUCS_CPU_QUANTIZE, batch_size: int = DEMUCS_CPU_BATCH,
+                 threads: Optional[int] = None, interop_threads: Optional[int] = None):
+        """
+        Args:
+            quantize: int8 동적 양자화 사용 (품질 저하 가능, benchmarks.cpu_profile로 확인)
+            batch_size: forward 1회에 묶는 분할 구간 수 (1이면 apply_model 그대로 사용)
+            threads / interop_threads: None이면 설정값 (DEMUCS_CPU_THREADS / DEMUCS_CPU_INTEROP_THREADS)
+        """
+        self.quantize = quantize
+        self.batch_size = max(1, batch_size)
+        self.threads = DEMUCS_CPU_THREADS if threads is None else threads
+        self.interop_threads = DEMUCS_CPU_INTEROP_THREADS if interop_threads is None else interop_threads
+
+    @property
+    def cache_tag(self) -> str:
+        """모델 캐시 키 구분 (양자화 모델은 원본과 별도 보관)"""
+        return 'int8' if self.quantize else 'fp32'
+
+    def configure(self) -> dict:
+        """스레드 설정만 적용 (디스크에서 로드한 내보낸 모델용)"""
+        return configure_cpu_threads(self.threads, self.interop_threads)
+
+    def prepare(self, model):
+        """로드된 모델에 프로파일 적용 (스레드 설정 + 선택적 양자화)"""
+        self.configure()
+        if self.quantize:
+            model = quantize_model(model)
+            logger.info("[CPU] int8 동적 양자화 모델 준비 완료")
+        return model
+
+    def apply(self, model, mix, shifts: int = 1, overlap: float = 0.25, progress: bool = False):
+        """
+        (batch, channels, samples) → (batch, sources, channels, samples)
+        - 내보낸 모델(inference_engine)은 파라미터가 없어 apply_model을 쓸 수 없으므로 항상 배치 경로
+        """
+        if self.batch_size <= 1 and getattr(model, 'engine', None) is None:
+            return apply_model(model, mix, device='cpu', shifts=shifts, split=True, overlap=overlap,
+                               progress=progress)
+        return apply_model_batched(model, mix, shifts=shifts, overlap=overlap, batch_size=self.batch_size)
+
+    def to_dict(self) -> dict:
+        return {
+            'quantize': self.quantize,
+            'batch_size': self.batch_size,
+            'threads': torch.get_num_threads(),
+            'interop_threads': torch.get_num_interop_threads()
+        }
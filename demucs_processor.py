@@ -2,106 +2,281 @@
 Demucs를 이용한 오디오 트랙 분리 (Stateless)
 - 모델 생명주기를 외부(workflow)에서 제어하도록 수정
 - [수정] 결과물을 WAV 대신 MP3로 저장 (용량 최적화)
+- [수정] 모델은 공유 캐시(model_cache)에서 재사용, 유휴 시 자동 해제
+- [수정] 임시 WAV 없이 PCM을 ffmpeg stdin으로 직접 전달, 트랙 병렬 인코딩 (stem_encoder)
+- [추가] 점진적 분리 모드: 겹치는 구간 단위로 분리하여 첫 구간부터 HLS로 즉시 제공
+- [수정] 원본 컨테이너(opus/aac 등)를 ffmpeg 1회 호출로 모델 샘플레이트 PCM으로 직접 디코딩
+- [추가] CPU 추론 프로파일: 스레드 설정, 선택적 int8 동적 양자화, 분할 구간 배치 처리 (cpu_inference)
+- [추가] 선택적 TorchScript 추론 엔진: 1회 내보내 디스크 캐시, 이후 그래프만 로드 (inference_engine)
 """
 
 import logging
 import subprocess
+from contextlib import contextmanager
 from pathlib import Path
+import numpy as np
 import torch
 from demucs import pretrained
 from demucs.apply import apply_model
-from demucs.audio import AudioFile, save_audio
+from config import (
+    DEMUCS_MODEL_IDLE_TTL, DEMUCS_MODEL_CACHE_SIZE, MODEL_MIN_FREE_MEMORY_RATIO, DEMUCS_ENGINE,
+    STREAM_CHUNK_SECONDS, STREAM_OVERLAP_SECONDS, STEM_STORE_DTYPE
+)
+from cpu_inference import CpuInferenceProfile, apply_model_batched
+from inference_engine import DemucsEngine
+from services.model_cache import ModelCache
+from services.metrics import measure
+from services.stem_store import StemStore
+from stem_encoder import StemEncoder, StreamingStemEncoder
 
 logger = logging.getLogger(__name__)
 
+# 프로세스 전역 Demucs 모델 캐시 (모든 작업/워커가 공유)
+model_cache = ModelCache(
+    'demucs',
+    idle_ttl=DEMUCS_MODEL_IDLE_TTL,
+    max_entries=DEMUCS_MODEL_CACHE_SIZE,
+    min_free_ratio=MODEL_MIN_FREE_MEMORY_RATIO
+)
+
+# 사전학습 모델 대신 사용할 모델 생성 함수 (벤치마크 등 오프라인 실행용 등록 지점)
+_model_factories = {}
+
+def register_model_factory(name: str, factory):
+    """load_model(name) 호출 시 pretrained.get_model 대신 factory()로 모델 생성"""
+    _model_factories[name] = factory
+
+def decode_audio(input_file: Path, samplerate: int, channels: int) -> torch.Tensor:
+    """
+    오디오 파일의 첫 오디오 스트림을 (channels, samples) float32 텐서로 디코딩
+    - ffprobe 없이 ffmpeg 한 번으로 디코딩 + 리샘플 + 채널 변환 (stdout PCM 파이프)
+    """
+    cmd = [
+        'ffmpeg', '-v', 'error', '-nostdin',
+        '-i', str(input_file),
+        '-map', '0:a:0', '-vn',
+        '-ac', str(channels), '-ar', str(samplerate),
+        '-f', 'f32le', 'pipe:1'
+    ]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0 or not proc.stdout:
+        raise RuntimeError(f"오디오 디코딩 실패 ({Path(input_file).name}): {proc.stderr.decode(errors='ignore')[-300:]}")
+    pcm = np.frombuffer(proc.stdout, dtype='<f4').reshape(-1, channels).T
+    return torch.from_numpy(np.ascontiguousarray(pcm))
+
 class DemucsProcessor:
     def __init__(self, download_dir: str):
         self.download_dir = Path(download_dir)
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.cpu_profile = CpuInferenceProfile() if self.device == 'cpu' else None
+        self.engine = None
+        if DEMUCS_ENGINE == 'torchscript':
+            self.engine = DemucsEngine(
+                self.device,
+                batch_size=self.cpu_profile.batch_size if self.cpu_profile else 1,
+                profile_tag=self.cpu_profile.cache_tag if self.cpu_profile else 'fp32'
+            )
+        elif DEMUCS_ENGINE != 'eager':
+            logger.warning(f"[Demucs] 알 수 없는 추론 엔진 '{DEMUCS_ENGINE}', eager로 실행")
+        self.encoder = StemEncoder()
+        self.last_encode_report = {}
+        # 작업 단위 계측 (workflow가 설정, 없으면 전역 통계에만 기록)
+        self.job_metrics = None
 
     def load_model(self, name: str = 'htdemucs'):
         """
-        모델을 메모리에 로드하고 반환 (Workflow에서 호출 후 사용 끝나면 해제 필수)
+        모델을 메모리에 로드하고 반환 (캐시를 거치지 않음, 호출 측에서 해제 책임)
+        - TorchScript 엔진 사용 시 디스크에 내보낸 모델이 있으면 그것을 로드, 없으면 내보낸 뒤 반환
         """
         logger.info(f"[Demucs] 모델 로드 중: {name} (Device: {self.device})")
-        # VRAM 확보를 위해 캐시 비우기
-        torch.cuda.empty_cache()
-        
-        model = pretrained.get_model(name)
+        if self.engine:
+            model = self.engine.load(name)
+            if model is not None:
+                if self.cpu_profile:
+                    self.cpu_profile.configure()
+                return model
+        factory = _model_factories.get(name)
+        model = factory() if factory else pretrained.get_model(name)
         model.to(self.device)
+        model.eval()
+        if self.cpu_profile:
+            model = self.cpu_profile.prepare(model)
+        if self.engine:
+            model = self.engine.export(name, model)
         return model
 
-    def process_with_model(
+    @contextmanager
+    def acquire_model(self, name: str = 'htdemucs'):
+        """
+        캐시된 모델을 빌려 사용 (없으면 로드). 블록 종료 후에도 모델은 캐시에 유지됨
+        """
+        key = (name, self.device, self.cpu_profile.cache_tag) if self.cpu_profile else (name, self.device)
+        if self.engine:
+            key += ('torchscript',)
+        with model_cache.acquire(key, lambda: self.load_model(name), self.device) as model:
+            yield model
+
+    def apply(self, model, mix: torch.Tensor, overlap: float = 0.25, progress: bool = False) -> torch.Tensor:
+        """
+        (batch, channels, samples) 분리 (shifts=1로 속도 최적화)
+        - CPU에서는 추론 프로파일(구간 배치 처리) 사용
+        - 내보낸 모델(GPU)은 파라미터가 없어 apply_model 대신 같은 분할 규칙의 배치 경로 사용
+        """
+        if self.cpu_profile:
+            return self.cpu_profile.apply(model, mix, shifts=1, overlap=overlap, progress=progress)
+        if getattr(model, 'engine', None):
+            return apply_model_batched(model, mix, shifts=1, overlap=overlap, batch_size=1, device=self.device)
+        return apply_model(model, mix, device=self.device, shifts=1, split=True, overlap=overlap, progress=progress)
+
+    def separate(self, model, input_file: Path, overlap: float = 0.25) -> torch.Tensor:
+        """
+        오디오를 분리하여 (sources, channels, samples) 텐서 반환 (CPU)
+        Args:
+            overlap: 분할 구간 겹침 비율 (낮출수록 빠르지만 구간 경계 품질 저하)
+        """
+        input_file = Path(input_file)
+        logger.info(f"[Demucs] 분리 시작: {input_file.name}")
+
+        with measure('demucs_separate', self.job_metrics, self.device) as m:
+            # 오디오 로드
+            wav = decode_audio(input_file, model.samplerate, model.audio_channels)
+            m.audio_seconds = wav.shape[-1] / model.samplerate
+            ref = wav.mean(0)
+            wav = (wav - ref.mean()) / ref.std()
+            wav = wav.to(self.device)
+
+            # 분리 수행
+            sources = self.apply(model, wav[None], overlap=overlap, progress=True)[0]
+            sources = sources * ref.std() + ref.mean()
+            return sources.cpu()
+
+    def encode_stems(self, sources: torch.Tensor, track_names, output_dir: Path, samplerate: int):
+        """분리된 트랙을 MP3로 병렬 인코딩 (실패 트랙이 있으면 예외)"""
+        with measure('demucs_encode', self.job_metrics) as m:
+            m.audio_seconds = sources.shape[-1] / samplerate
+            report = self.encoder.encode_all(dict(zip(track_names, sources)), Path(output_dir), samplerate)
+        self.last_encode_report = report
+
+        failed = [n for n, r in report.items() if not r['ok']]
+        if failed:
+            raise RuntimeError(f"MP3 변환 실패: {failed}")
+        return report
+
+    @staticmethod
+    def save_stem_store(sources: torch.Tensor, track_names, samplerate: int, store_path: Path,
+                        dtype: str = STEM_STORE_DTYPE) -> StemStore:
+        """
+        분리 결과를 memmap 저장소로 기록 (분리 단계 체크포인트 겸 후처리용 원본)
+        """
+        return StemStore.write(store_path, sources.detach().cpu().numpy(), list(track_names), samplerate, dtype)
+
+    @staticmethod
+    def load_stem_store(store: StemStore) -> torch.Tensor:
+        return torch.from_numpy(store.read_all())
+
+    def process_streaming(
         self,
         model,
         input_file: Path,
         output_dir: Path,
-        progress_callback=None
+        progress_callback=None,
+        chunk_callback=None,
+        chunk_seconds: float = STREAM_CHUNK_SECONDS,
+        overlap_seconds: float = STREAM_OVERLAP_SECONDS,
+        store_path: Path = None,
+        overlap: float = 0.25
     ) -> bool:
         """
-        외부에서 주입된 모델 객체를 사용하여 분리 수행 후 MP3 변환
+        점진적 분리: 겹치는 구간(window) 단위로 분리하고, 확정된 구간을 즉시 HLS로 인코딩
+        - overlap: 구간 안 모델 분할 겹침 비율 (separate와 동일, 수락 제어 하향 시 낮은 값)
+        - 겹침 구간은 선형 크로스페이드로 이어 붙임 (구간 경계 클릭 방지)
+        - 구간마다 chunk_callback({'index', 'start', 'end', 'duration'}) 호출
+        - 전체 완료 후 기존과 동일하게 트랙별 MP3 생성 (store_path 지정 시 StemStore도 저장)
         """
+        stream = None
         try:
             input_file = Path(input_file)
             output_dir = Path(output_dir)
             output_dir.mkdir(parents=True, exist_ok=True)
 
-            logger.info(f"[Demucs] 분리 시작: {input_file.name}")
-            
-            # 오디오 로드
-            wav = AudioFile(input_file).read(streams=0, samplerate=model.samplerate, channels=model.audio_channels)
-            ref = wav.mean(0)
-            wav = (wav - ref.mean()) / ref.std()
-            wav = wav.to(self.device)
-            
-            # 분리 수행 (shifts=1로 속도 최적화)
-            sources = apply_model(model, wav[None], device=self.device, shifts=1, split=True, overlap=0.25, progress=True)[0]
-            sources = sources * ref.std() + ref.mean()
+            logger.info(f"[Demucs] 점진적 분리 시작: {input_file.name} (구간 {chunk_seconds}s, 겹침 {overlap_seconds}s)")
+
+            # 분리 구간(디코딩 + 구간별 추론/HLS 전달) 계측 (일괄 분리의 demucs_separate와 같은 단계 이름)
+            with measure('demucs_separate', self.job_metrics, self.device) as m:
+                wav = decode_audio(input_file, model.samplerate, model.audio_channels)
+                ref = wav.mean(0)
+                mean, std = ref.mean(), ref.std()
+                wav = (wav - mean) / std
+
+                sr = model.samplerate
+                total = wav.shape[-1]
+                m.audio_seconds = total / sr
+                chunk = int(chunk_seconds * sr)
+                window_overlap = int(overlap_seconds * sr)
+                if chunk <= window_overlap:
+                    raise ValueError("구간 길이는 겹침보다 길어야 합니다")
+                stride = chunk - window_overlap
+
+                stream = StreamingStemEncoder(output_dir / 'stream', model.sources, sr, model.audio_channels)
+                stream.start()
+
+                pieces = []
+                tail = None
+                pos = 0
+                index = 0
+                while pos < total:
+                    end = min(pos + chunk, total)
+                    window = wav[:, pos:end].to(self.device)
+                    out = self.apply(model, window[None], overlap=overlap)[0]
+                    out = (out * std + mean).cpu()
+
+                    # 이전 구간의 꼬리와 크로스페이드
+                    if tail is not None:
+                        n = min(tail.shape[-1], out.shape[-1])
+                        fade = torch.linspace(0, 1, n)
+                        out[..., :n] = tail[..., :n] * (1 - fade) + out[..., :n] * fade
+
+                    if end >= total:
+                        ready, tail = out, None
+                    else:
+                        ready, tail = out[..., :-window_overlap], out[..., -window_overlap:]
+
+                    pieces.append(ready)
+                    stream.write(dict(zip(model.sources, ready)))
+
+                    ready_end = pos + ready.shape[-1]
+                    if chunk_callback:
+                        chunk_callback({
+                            'index': index,
+                            'start': pos / sr,
+                            'end': ready_end / sr,
+                            'duration': total / sr
+                        })
+                    if progress_callback:
+                        progress_callback(20 + int(40 * ready_end / total), f'AI 오디오 분리 중... ({ready_end / sr:.0f}s / {total / sr:.0f}s)')
+
+                    index += 1
+                    if end >= total:
+                        break
+                    pos += stride
+
+            # 인코더 실패(ffmpeg 비정상 종료)면 플레이리스트가 잘렸으므로 실패 처리 (workflow가 stream/ 정리)
+            closed = stream.close()
+            stream = None
+            if not closed:
+                raise RuntimeError("HLS 스트리밍 인코딩 실패")
+
+            sources = torch.cat(pieces, dim=-1)
+            # 구간 중복/누락이 있으면 스트림과 영상 타임라인이 어긋나므로 저장하지 않음
+            if sources.shape[-1] != total:
+                raise RuntimeError(f"점진적 분리 길이 불일치: 입력 {total} / 출력 {sources.shape[-1]} 샘플")
 
-            # 저장 및 MP3 변환
             if progress_callback: progress_callback(60, '트랙 저장 및 MP3 변환 중...')
-            
-            kwargs = {
-                'samplerate': model.samplerate,
-                'bitrate': 320,
-                'clip': 'rescale',
-                'as_float': False,
-                'bits_per_sample': 16
-            }
-            
-            track_names = model.sources
-            for source, name in zip(sources, track_names):
-                wav_stem = output_dir / f"{name}.wav"
-                mp3_stem = output_dir / f"{name}.mp3"
-                
-                # 1. 임시 WAV 저장
-                save_audio(source.cpu(), str(wav_stem), **kwargs)
-                
-                # 2. ffmpeg로 MP3 변환 (VBR 품질 설정)
-                try:
-                    cmd = [
-                        'ffmpeg', '-y', 
-                        '-i', str(wav_stem),
-                        '-codec:a', 'libmp3lame', 
-                        '-qscale:a', '2',  # VBR High Quality (~190kbps average)
-                        str(mp3_stem)
-                    ]
-                    subprocess.run(
-                        cmd, 
-                        check=True, 
-                        stdout=subprocess.DEVNULL, 
-                        stderr=subprocess.DEVNULL
-                    )
-                    
-                    # 3. 변환 성공 시 WAV 삭제
-                    if mp3_stem.exists() and mp3_stem.stat().st_size > 0:
-                        wav_stem.unlink()
-                        
-                except Exception as conv_e:
-                    logger.error(f"[Demucs] MP3 변환 실패 ({name}): {conv_e}")
-                    # 변환 실패 시 WAV 유지 (Fallback 없음, 클라이언트는 MP3를 기대하므로 에러로 이어질 수 있음)
-
-            logger.info("[Demucs] 분리 및 변환 완료")
+            self.encode_stems(sources, model.sources, output_dir, sr)
+            if store_path:
+                self.save_stem_store(sources, model.sources, sr, store_path)
+
+            logger.info(f"[Demucs] 점진적 분리 및 변환 완료 ({index}개 구간)")
             return True
 
         except Exception as e:
@@ -110,6 +285,10 @@ class DemucsProcessor:
             logger.error(traceback.format_exc())
             return False
 
+        finally:
+            if stream is not None:
+                stream.close(timeout=5)
+
     def get_separated_tracks(self, output_dir_str: str) -> dict:
         """분리된 트랙 파일 확인 (MP3 기준)"""
         output_dir = Path(output_dir_str)
@@ -1,68 +1,218 @@
 """
-yt-dlp를 이용한 YouTube MP3 다운로드
-
-최고 음질 MP3 변환 및 메타데이터 처리
+yt-dlp를 이용한 YouTube 오디오 다운로드
+
+최고 음질 오디오를 원본 컨테이너(opus/webm, m4a 등) 그대로 저장 (MP3 재인코딩 없음)
+- 분리 단계에서 PCM으로 한 번만 디코딩하므로 손실 압축 세대 손실/추가 인코딩 비용 없음
+- 원본 컨테이너는 MP3보다 작고 디코딩 비용도 비슷하여 캐시 보관 형식으로도 가장 저렴
+- yt-dlp 패키지가 있으면 라이브러리로 사용 (프로세스 생성/인터프리터 기동 없음)
+  · YoutubeDL 인스턴스(세션)를 풀에 보관하여 재사용
+  · 영상 페이지 추출은 1회만 수행하고 정보/오디오/자막이 결과를 공유 (짧은 TTL 캐시)
+- 패키지가 없으면 기존 방식(yt-dlp 실행 파일 subprocess)으로 동작
 """
 
+import copy
+import functools
+import json
+import queue
 import subprocess
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 
+from config import YTDLP_ENGINE, YTDLP_SOCKET_TIMEOUT, YTDLP_INFO_TIMEOUT
+
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
+
 logger = logging.getLogger(__name__)
 
+# 자막 언어 우선순위
+SUBTITLE_LANGS = ['ko', 'en']
+
+# 다운로드 결과로 인정하는 오디오 확장자 (.part 등 미완성 파일 제외)
+AUDIO_EXTENSIONS = {'.webm', '.opus', '.ogg', '.m4a', '.mp4', '.aac', '.mp3', '.mka', '.flac', '.wav'}
+
+
+def find_input_audio(work_dir):
+    """작업 폴더의 원본 오디오(input.*) 경로 (없으면 None, 이전 버전의 input.mp3 포함)"""
+    for path in sorted(Path(work_dir).glob('input.*')):
+        if path.suffix.lower() in AUDIO_EXTENSIONS and path.is_file():
+            return path
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def check_dependencies():
+    """
+    필수 도구 설치 확인 (프로세스당 1회만 실행)
+    Returns: {'yt-dlp': bool, 'ffmpeg': bool}
+    """
+    tools = {
+        'yt-dlp': 'pip install yt-dlp',
+        'ffmpeg': 'ffmpeg를 설치하세요 (https://ffmpeg.org/download.html)'
+    }
+    found = {}
+
+    for tool, install_cmd in tools.items():
+        if tool == 'yt-dlp' and yt_dlp is not None:
+            found[tool] = True
+            logger.info(f"✓ {tool} 설치됨 (라이브러리 {yt_dlp.version.__version__})")
+            continue
+        try:
+            subprocess.run(
+                [tool, '-version' if tool == 'ffmpeg' else '--version'],
+                capture_output=True,
+                check=True,
+                timeout=5
+            )
+            found[tool] = True
+            logger.info(f"✓ {tool} 설치됨")
+
+        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
+            found[tool] = False
+            logger.warning(f"⚠ {tool}을 설치해야 합니다: {install_cmd}")
+
+    return found
+
 
 class YouTubeDownloader:
-    """YouTube 비디오를 MP3로 다운로드"""
+    """YouTube 비디오의 오디오를 원본 형식으로 다운로드"""
 
-    def __init__(self, download_dir):
+    # 추출 결과 캐시 (스트림 URL 만료 전까지만 재사용)
+    INFO_CACHE_SIZE = 64
+    INFO_CACHE_TTL = 1800
+
+    def __init__(self, download_dir, engine=None, info_timeout=None):
         """
         Args:
             download_dir: 다운로드 저장 디렉토리
+            engine: 'library' | 'subprocess' | 'auto' (None이면 YTDLP_ENGINE 설정값)
+            info_timeout: get_video_info 전체 제한 시간(초, None이면 YTDLP_INFO_TIMEOUT)
         """
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
-        self._check_dependencies()
-
-    def _check_dependencies(self):
-        """필수 도구 설치 확인"""
-        tools = {
-            'yt-dlp': 'pip install yt-dlp',
-            'ffmpeg': 'ffmpeg를 설치하세요 (https://ffmpeg.org/download.html)'
-        }
-
-        for tool, install_cmd in tools.items():
-            try:
-                if tool == 'ffmpeg':
-                    subprocess.run(
-                        ['ffmpeg', '-version'],
-                        capture_output=True,
-                        check=True,
-                        timeout=5
-                    )
-                else:
-                    subprocess.run(
-                        ['yt-dlp', '--version'],
-                        capture_output=True,
-                        check=True,
-                        timeout=5
-                    )
+        check_dependencies()
+
+        engine = engine or YTDLP_ENGINE
+        if engine == 'library' and yt_dlp is None:
+            logger.warning("yt-dlp 패키지가 없어 subprocess 방식으로 동작합니다")
+        self.use_library = yt_dlp is not None and engine in ('auto', 'library')
+
+        self._sessions = queue.LifoQueue()
+        self._info_cache = OrderedDict()
+        self._info_lock = threading.Lock()
+        self.info_timeout = YTDLP_INFO_TIMEOUT if info_timeout is None else info_timeout
+        # 정보 조회(수락 제어)를 호출 스레드와 분리하여 제한 시간 후 포기 (멈춘 추출은 소켓 타임아웃으로 종료)
+        self._probe_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ytdlp-probe')
+
+    # ----- 라이브러리 세션 -----
+    def _new_session(self):
+        return yt_dlp.YoutubeDL({
+            'format': 'bestaudio/best',
+            'quiet': True,
+            'no_warnings': True,
+            'noplaylist': True,
+            'noprogress': True,
+            'subtitleslangs': SUBTITLE_LANGS,
+            'subtitlesformat': 'vtt',
+            # 응답 없는 연결에서 워커가 무한 대기하지 않도록 (subprocess 방식의 timeout 대응)
+            'socket_timeout': YTDLP_SOCKET_TIMEOUT,
+        })
+
+    @contextmanager
+    def _session(self, **overrides):
+        """
+        풀에서 YoutubeDL 세션을 빌려 사용 (없으면 생성)
+        - 호출별 설정(출력 경로, 자막 여부 등)은 사용 후 원래대로 복원
+        """
+        try:
+            ydl = self._sessions.get_nowait()
+        except queue.Empty:
+            ydl = self._new_session()
 
-                logger.info(f"✓ {tool} 설치됨")
+        saved = {key: copy.deepcopy(ydl.params.get(key)) for key in overrides}
+        ydl.params.update(overrides)
+        try:
+            yield ydl
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    ydl.params.pop(key, None)
+                else:
+                    ydl.params[key] = value
+            self._sessions.put(ydl)
+
+    def _extract(self, video_id):
+        """영상 페이지 추출 (캐시 적중 시 네트워크 없음). 반환값은 호출자 전용 복사본"""
+        now = time.time()
+        with self._info_lock:
+            cached = self._info_cache.get(video_id)
+            if cached and now - cached[0] < self.INFO_CACHE_TTL:
+                self._info_cache.move_to_end(video_id)
+                return copy.deepcopy(cached[1])
 
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                logger.warning(f"⚠ {tool}을 설치해야 합니다: {install_cmd}")
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        with self._session() as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+
+        with self._info_lock:
+            self._info_cache[video_id] = (now, info)
+            self._info_cache.move_to_end(video_id)
+            while len(self._info_cache) > self.INFO_CACHE_SIZE:
+                self._info_cache.popitem(last=False)
+        return copy.deepcopy(info)
+
+    def _download_library(self, video_id, output_dir):
+        info = self._extract(video_id)
+        with self._session(outtmpl={'default': str(output_dir / 'input.%(ext)s')},
+                           skip_download=False, writesubtitles=False, writeautomaticsub=False) as ydl:
+            ydl.process_ie_result(info, download=True)
+        return find_input_audio(output_dir)
+
+    def _download_subprocess(self, video_id, url, output_dir):
+        # yt-dlp 명령어로 최고 음질 오디오를 원본 컨테이너 그대로 다운로드 (재인코딩 없음)
+        cmd = [
+            'yt-dlp',
+            '-f', 'bestaudio/best',  # 최고 음질 선택
+                '--js-runtimes', 'deno',  # ← 이 줄만 추가!
+
+            '-o', str(output_dir / 'input.%(ext)s'),  # 출력 경로 (확장자는 원본 형식)
+            url
+        ]
+
+        logger.info(f"[{video_id}] yt-dlp 실행 중...")
+        logger.info(f"[{video_id}] 명령어: {' '.join(cmd)}")
+
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=300  # 5분 타임아웃
+        )
+
+        if result.returncode != 0:
+            logger.error(f"[{video_id}] yt-dlp 오류: {result.stderr}")
+            logger.error(f"[{video_id}] 표준출력: {result.stdout}")
+            return None
+        return find_input_audio(output_dir)
 
     def download(self, video_id, output_dir=None):
         """
-        YouTube 비디오를 MP3로 다운로드
+        YouTube 비디오의 오디오를 원본 형식으로 다운로드
 
         Args:
             video_id: YouTube video ID
             output_dir: 저장할 디렉토리 (None이면 self.download_dir 사용)
 
         Returns:
-            Path: 다운로드한 MP3 파일 경로, 실패 시 None
+            Path: 다운로드한 오디오 파일 경로 (input.webm, input.m4a 등), 실패 시 None
         """
 
         if output_dir is None:
@@ -74,51 +224,27 @@ class YouTubeDownloader:
 
         # 유튜브 URL 구성
         url = f"https://www.youtube.com/watch?v={video_id}"
-        output_path = output_dir / "input.mp3"
-
         # 이미 존재하면 사용
-        if output_path.exists():
-            logger.info(f"[{video_id}] MP3 파일이 이미 존재합니다: {output_path}")
-            return output_path
+        existing = find_input_audio(output_dir)
+        if existing:
+            logger.info(f"[{video_id}] 오디오 파일이 이미 존재합니다: {existing}")
+            return existing
 
         logger.info(f"[{video_id}] 다운로드 시작: {url}")
 
         try:
-            # yt-dlp 명령어로 최고 음질 MP3 다운로드
-            # Windows 호환성: --audio-quality 제거하고 ffmpeg-acodec로 최고음질 유지
-            cmd = [
-                'yt-dlp',
-                '-f', 'bestaudio/best',  # 최고 음질 선택
-                '-x',  # 오디오만 추출
-                '--audio-format', 'mp3',  # MP3 형식
-                    '--js-runtimes', 'deno',  # ← 이 줄만 추가!
-
-                '-o', str(output_path),  # 출력 경로 (절대 경로)
-                url
-            ]
-
-            logger.info(f"[{video_id}] yt-dlp 실행 중...")
-            logger.info(f"[{video_id}] 명령어: {' '.join(cmd)}")
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5분 타임아웃
-            )
-
-            if result.returncode != 0:
-                logger.error(f"[{video_id}] yt-dlp 오류: {result.stderr}")
-                logger.error(f"[{video_id}] 표준출력: {result.stdout}")
-                return None
+            if self.use_library:
+                downloaded = self._download_library(video_id, output_dir)
+            else:
+                downloaded = self._download_subprocess(video_id, url, output_dir)
 
-            if output_path.exists():
-                file_size = output_path.stat().st_size / (1024 * 1024)  # MB
+            if downloaded:
+                file_size = downloaded.stat().st_size / (1024 * 1024)  # MB
                 logger.info(f"[{video_id}] ✓ 다운로드 완료: {file_size:.1f} MB")
-                return output_path
+                return downloaded
 
             else:
-                logger.error(f"[{video_id}] MP3 파일이 생성되지 않았습니다")
+                logger.error(f"[{video_id}] 오디오 파일이 생성되지 않았습니다")
                 return None
 
         except subprocess.TimeoutExpired:
@@ -129,32 +255,94 @@ class YouTubeDownloader:
             logger.error(f"[{video_id}] 다운로드 오류: {str(e)}")
             return None
 
-    def get_video_info(self, video_id):
-        """비디오 정보 조회"""
+    def download_subtitles(self, video_id, output_dir, allow_auto=False):
+        """
+        자막(VTT) 다운로드 (한국어 우선)
+
+        Args:
+            allow_auto: 수동 자막이 없을 때 자동 생성 자막 허용
+
+        Returns:
+            str: 자막 파일 경로, 없으면 None
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # 기존 자막 삭제
+        for old_file in output_dir.glob("*.vtt"):
+            try: old_file.unlink()
+            except OSError: pass
+
+        attempts = [False, True] if allow_auto else [False]
+        for is_auto in attempts:
+            if self.use_library:
+                self._subtitles_library(video_id, output_dir, is_auto)
+            else:
+                self._subtitles_subprocess(video_id, output_dir, is_auto)
+
+            candidates = list(output_dir.glob('*.vtt'))
+            if candidates:
+                for f in candidates:
+                    if '.ko' in f.name: return str(f)
+                return str(candidates[0])
+        return None
+
+    def _subtitles_library(self, video_id, output_dir, is_auto):
+        info = self._extract(video_id)
+        # 추출 결과에 해당 언어 자막이 없으면 추가 요청 없이 종료
+        available = info.get('automatic_captions' if is_auto else 'subtitles') or {}
+        if not any(lang in available for lang in SUBTITLE_LANGS):
+            return
+        with self._session(outtmpl={'default': str(output_dir / '%(title)s.%(ext)s')},
+                           skip_download=True, writesubtitles=not is_auto, writeautomaticsub=is_auto) as ydl:
+            ydl.process_ie_result(info, download=True)
+
+    @staticmethod
+    def _subtitles_subprocess(video_id, output_dir, is_auto):
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        cmd = [
+            'yt-dlp',
+            '--write-auto-sub' if is_auto else '--write-sub',
+            '--sub-lang', ','.join(SUBTITLE_LANGS),
+            '--skip-download',
+            '-o', str(output_dir / '%(title)s.%(ext)s'),
+            url
+        ]
+        subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+
+    def get_video_info(self, video_id, timeout=None):
+        """비디오 정보 조회 (timeout: 전체 제한 시간(초), None이면 self.info_timeout)"""
         url = f"https://www.youtube.com/watch?v={video_id}"
+        timeout = self.info_timeout if timeout is None else timeout
 
         try:
-            cmd = [
-                'yt-dlp',
-                '--dump-json',
-                url
-            ]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            if result.returncode == 0:
-                import json
+            if self.use_library:
+                info = self._probe_pool.submit(self._extract, video_id).result(timeout=timeout)
+            else:
+                cmd = [
+                    'yt-dlp',
+                    '--dump-json',
+                    url
+                ]
+
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
+                if result.returncode != 0:
+                    return None
                 info = json.loads(result.stdout)
-                return {
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Unknown')
-                }
+
+            return {
+                'title': info.get('title', 'Unknown'),
+                'duration': info.get('duration', 0),
+                'uploader': info.get('uploader', 'Unknown')
+            }
+
+        except (FutureTimeoutError, subprocess.TimeoutExpired):
+            logger.error(f"[{video_id}] 정보 조회 타임아웃 ({timeout:.0f}초)")
 
         except Exception as e:
             logger.error(f"[{video_id}] 정보 조회 오류: {str(e)}")
@@ -140,6 +140,7 @@
             this.socket = io(this.serverUrl, { transports: ['websocket'] });
             this.socket.on('progress', data => this.handleProgress(data));
             this.socket.on('complete', data => this.handleComplete(data));
+            this.socket.on('chunk_ready', data => this.handleChunkReady(data));
             this.socket.on('error', data => {
                 alert('Error: ' + (data.error || 'Unknown'));
                 this.isProcessing = false;
@@ -169,12 +170,21 @@
         }
     }
 
+    handleChunkReady(data) {
+        // 점진적 분리: 완료된 구간 진행 상황만 표시
+        // (플레이어는 완성된 MP3 트랙으로 시작, data.playlists의 HLS 재생은 아직 지원하지 않음)
+        const statusText = document.getElementById('sep-status-text');
+        if (statusText) {
+            statusText.textContent = `구간 ${data.index + 1} 준비됨 (${Math.round(data.end)}s / ${Math.round(data.duration)}s)`;
+        }
+    }
+
     async handleComplete(data) {
         this.isProcessing = false;
         document.getElementById('yt-sep-setup-panel')?.remove();
         
         // 1. 자막 엔진 초기화 (오버레이 생성)
-        this.initLyricsEngine(data.lyrics_lrc);
+        this.initLyricsEngine(data.lyrics_lrc, data.lyrics_url);
         
         // 2. 플레이어 생성 및 초기화 (UI 생성)
         if (window.AiPlugsAudioPlayer) {
@@ -190,7 +200,7 @@
         }
     }
 
-    initLyricsEngine(lrcContent) {
+    initLyricsEngine(lrcContent, lyricsUrl) {
         if (window.AiPlugsLyricsOverlay) {
             let overlay = document.getElementById('aiplugs-lyrics-overlay');
             if (overlay) overlay.remove();
@@ -202,11 +212,27 @@
 
             this.lyricsEngine = new window.AiPlugsLyricsOverlay();
             this.lyricsEngine.init(overlay);
-            if (lrcContent) {
+            if (lyricsUrl) {
+                // 압축 형식 (gzip 전송, 해석 없이 바로 적용), 실패 시 LRC 원문 사용
+                this.loadCompactLyrics(this.lyricsEngine, lyricsUrl, lrcContent);
+            } else if (lrcContent) {
                 this.lyricsEngine.parseLrc(lrcContent);
             }
         }
     }
+
+    async loadCompactLyrics(engine, lyricsUrl, lrcContent) {
+        try {
+            const res = await fetch(`${this.serverUrl.replace(/\/$/, '')}${lyricsUrl}`, {
+                headers: { 'ngrok-skip-browser-warning': 'true' }
+            });
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            if (engine.loadCompact(await res.json())) return;
+        } catch (e) {
+            console.warn('[Lyrics] 압축 가사 로드 실패:', e);
+        }
+        if (lrcContent) engine.parseLrc(lrcContent);
+    }
   }
 
   setTimeout(() => { new YouTubeTrackSeparator(); }, 2000);
@@ -5,7 +5,7 @@
 (function (root) {
     class LyricsEngine {
         constructor() {
-            this.rawLyrics = [];
+            this.tokens = null; // { start, end, text, wordStart, lines, gap } 열 배열
             this.lyrics = [];
             this.container = null;
             this.lyricsBox = null;
@@ -219,6 +219,7 @@
         }
 
         parseLrc(lrcContent) {
+            // 이전 형식(LRC 텍스트) 호환 경로: 서버가 압축 형식을 주지 않은 경우에만 사용
             if (!lrcContent) return;
             const lines = lrcContent.split('\n');
             const patternFull = /\[(\d+:\d+(?:\.\d+)?)\]\s*<(\d+:\d+(?:\.\d+)?)>\s*(.*)/;
@@ -266,73 +267,84 @@
                     else parsed[i].endTime = parsed[i].time + 3.0;
                 }
             }
-            this.rawLyrics = parsed;
+            this.tokens = {
+                start: parsed.map(p => p.time),
+                end: parsed.map(p => p.endTime),
+                text: parsed.map(p => p.text),
+                wordStart: parsed.map(p => !p.isContinuation),
+                lines: null,
+                gap: null
+            };
+            this.processLyrics();
+        }
+
+        /**
+         * 서버 압축 형식(aligned.v1.json) 적용: 열 배열 + 미리 계산된 줄 그룹
+         * @returns {boolean} 지원하는 버전이면 true (아니면 호출자가 LRC 경로로 대체)
+         */
+        loadCompact(data) {
+            if (!data || data.v !== 1 || !Array.isArray(data.start)) return false;
+            const scale = data.scale || 100;
+            this.tokens = {
+                start: data.start.map(t => t / scale),
+                end: data.end.map(t => t / scale),
+                text: data.text,
+                wordStart: data.word_start.map(Boolean),
+                lines: data.lines || null,
+                gap: data.gap
+            };
             this.processLyrics();
+            return true;
+        }
+
+        // 모드별 줄 첫 토큰 인덱스 (서버 형식/ lyrics_format.py group_lines와 같은 규칙)
+        groupStarts(mode) {
+            const tk = this.tokens;
+            const count = tk.start.length;
+            if (mode === 'sentence' && tk.lines && tk.gap === this.config.gapThreshold) return tk.lines;
+
+            const starts = [];
+            let size = 0, lineEnd = null;
+            for (let i = 0; i < count; i++) {
+                let joins = false;
+                if (i > 0 && size < 50 && mode !== 'char') {
+                    if (!tk.wordStart[i]) joins = true;
+                    else if (mode === 'sentence') joins = (tk.start[i] - lineEnd) <= this.config.gapThreshold;
+                }
+                if (joins) size++;
+                else { starts.push(i); size = 1; }
+                lineEnd = tk.end[i];
+            }
+            return starts;
         }
 
         processLyrics() {
-            if (!this.rawLyrics.length) return;
+            if (!this.tokens || !this.tokens.start.length) return;
 
             const mode = this.config.viewMode;
-            let merged = [];
-            let i = 0;
-
-            while (i < this.rawLyrics.length) {
-                let current = JSON.parse(JSON.stringify(this.rawLyrics[i]));
-                
-                // [Modified] 하이브리드 모드: 첫 글자 정보(endTime) 저장
-                if (mode === 'hybrid') {
-                    current.subTimings = [{ 
-                        text: current.text, 
-                        time: current.time, 
-                        endTime: current.endTime, // 첫 글자의 끝나는 시간 저장
-                        isFirst: true             // 첫 글자 플래그
-                    }];
+            const tk = this.tokens;
+            const starts = this.groupStarts(mode);
+            const merged = new Array(starts.length);
+
+            for (let g = 0; g < starts.length; g++) {
+                const first = starts[g];
+                const last = (g + 1 < starts.length ? starts[g + 1] : tk.start.length) - 1;
+                let text = '';
+                for (let k = first; k <= last; k++) {
+                    text += (k > first && tk.wordStart[k] ? ' ' : '') + tk.text[k];
                 }
+                const line = { time: tk.start[first], endTime: tk.end[last], text: text };
 
-                let j = 1;
-                while (i + j < this.rawLyrics.length && j < 50) { 
-                    let nextItem = this.rawLyrics[i + j];
-                    let shouldMerge = false;
-                    let joinWithSpace = true;
-
-                    if (mode === 'char') {
-                        shouldMerge = false;
-                    } else if (mode === 'word' || mode === 'hybrid') {
-                        if (nextItem.isContinuation) {
-                            shouldMerge = true;
-                            joinWithSpace = false;
-                        }
-                    } else {
-                        const gap = nextItem.time - current.endTime;
-                        if (nextItem.isContinuation) {
-                            shouldMerge = true;
-                            joinWithSpace = false;
-                        } else if (gap <= this.config.gapThreshold) {
-                            shouldMerge = true;
-                            joinWithSpace = true;
-                        }
-                    }
-
-                    if (shouldMerge) {
-                        current.text += (joinWithSpace ? " " : "") + nextItem.text;
-                        current.endTime = nextItem.endTime;
-                        
-                        if (mode === 'hybrid') {
-                            current.subTimings.push({ 
-                                text: nextItem.text, 
-                                time: nextItem.time,
-                                isFirst: false 
-                            });
-                        }
-
-                        j++;
-                    } else {
-                        break;
+                // 하이브리드 모드: 첫 글자 정보(endTime) 저장
+                if (mode === 'hybrid') {
+                    line.subTimings = [];
+                    for (let k = first; k <= last; k++) {
+                        line.subTimings.push(k === first
+                            ? { text: tk.text[k], time: tk.start[k], endTime: tk.end[k], isFirst: true }
+                            : { text: tk.text[k], time: tk.start[k], isFirst: false });
                     }
                 }
-                merged.push(current);
-                i += j;
+                merged[g] = line;
             }
 
             this.lyrics = merged;
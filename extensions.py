@@ -5,12 +5,48 @@ Flask Extensions 초기화
 
 from flask_socketio import SocketIO
 from download import YouTubeDownloader
-from config import DOWNLOADS_DIR
+from config import (
+    DOWNLOADS_DIR, SEPARATION_WORKERS, JOB_QUEUE_SIZE,
+    CACHE_MAX_GB, CACHE_POLICY, CACHE_DROP_INPUT, CACHE_INDEX_PATH,
+    ADMISSION_MAX_DURATION, ADMISSION_DOWNGRADE_DURATION, ADMISSION_DOWNGRADE_BACKLOG,
+    ADMISSION_MAX_BACKLOG, ADMISSION_FALLBACK_MODEL, ADMISSION_FALLBACK_OVERLAP,
+    ADMISSION_SECONDS_PER_AUDIO_SECOND
+)
+from services.job_queue import JobQueue
+from services.cache_manager import CacheManager
+from services.cache_index import CacheIndex
+from services.admission import AdmissionController
 
 socketio = SocketIO()
 
 # 다운로더는 가벼워서 미리 초기화 가능
 downloader = YouTubeDownloader(str(DOWNLOADS_DIR))
 
+# 분리 작업 큐 (워커는 register_socket_events에서 기동)
+job_queue = JobQueue(num_workers=SEPARATION_WORKERS, max_queue_size=JOB_QUEUE_SIZE)
+
+# downloads/ 용량 관리자 (라우트와 워크플로우가 공유)
+cache_manager = CacheManager(
+    DOWNLOADS_DIR,
+    max_bytes=int(CACHE_MAX_GB * 1024 ** 3),
+    policy=CACHE_POLICY,
+    drop_input=CACHE_DROP_INPUT
+)
+
+# 완료 작업 색인 (요청마다 파일 시스템을 확인하지 않기 위함)
+cache_index = CacheIndex(DOWNLOADS_DIR, CACHE_INDEX_PATH)
+cache_manager.on_evict.append(cache_index.remove)
+
+# 다운로드 전 길이 기반 수락 제어 (큐 등록 시 예약, 작업 종료 시 해제)
+admission = AdmissionController(
+    max_duration=ADMISSION_MAX_DURATION,
+    downgrade_duration=ADMISSION_DOWNGRADE_DURATION,
+    downgrade_backlog=ADMISSION_DOWNGRADE_BACKLOG,
+    max_backlog=ADMISSION_MAX_BACKLOG,
+    fallback_model=ADMISSION_FALLBACK_MODEL,
+    fallback_overlap=ADMISSION_FALLBACK_OVERLAP,
+    seconds_per_audio_second=ADMISSION_SECONDS_PER_AUDIO_SECOND
+)
+
 # active_jobs 등 상태 관리용 변수
-active_jobs = {}
\ No newline at end of file
+active_jobs = {}
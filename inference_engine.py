@@ -0,0 +1,223 @@
+"""
+Demucs 내보내기(TorchScript) 추론 엔진
+- 선택한 모델을 고정 입력 형태(학습 구간 길이 × 배치)로 1회 trace → freeze 하여 디스크에 캐시
+- 다음 로드부터는 pretrained.get_model(파이썬 모델 구성 + 체크포인트 적용) 없이 그래프만 로드
+- 실행 시 레이어/구간마다의 파이썬 디스패치 비용 제거
+- 내보내기 직후 eager 출력과 비교(parity)하여 기준 미달이면 폐기하고 eager로 동작
+- 형태가 고정되어야 하므로 구간 길이가 일정한 모델(HTDemucs 계열)만 대상, 그 외는 eager 유지
+
+디스크 구조:
+    <DEMUCS_ENGINE_DIR>/<model>-<device>-<profile>-b<batch>-torch<ver>-demucs<ver>/
+        manifest.json   (sources/samplerate/channels/구간 길이/배치/모델별 가중치)
+        model0.pt ...   (BagOfModels 구성 모델별 TorchScript)
+"""
+
+import json
+import logging
+import os
+import shutil
+from fractions import Fraction
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+import demucs
+from demucs.apply import BagOfModels
+
+from config import DEMUCS_ENGINE_DIR, DEMUCS_ENGINE_PARITY_DB
+
+logger = logging.getLogger(__name__)
+
+ENGINE_NAME = 'torchscript'
+MANIFEST = 'manifest.json'
+
+
+class ExportedModel(torch.nn.Module):
+    """
+    TorchScript 모델을 Demucs 모델처럼 사용하기 위한 래퍼
+    - samplerate / audio_channels / sources / segment / valid_length 제공 (apply_model_batched 호환)
+    - 내보낸 배치보다 작은 입력은 0으로 채워 실행, 큰 입력은 나눠 실행
+    """
+
+    engine = ENGINE_NAME
+
+    def __init__(self, module, sources: List[str], samplerate: int, audio_channels: int,
+                 segment_length: int, batch_size: int):
+        super().__init__()
+        self.module = module
+        self.sources = list(sources)
+        self.samplerate = samplerate
+        self.audio_channels = audio_channels
+        self.segment_length = segment_length
+        self.segment = Fraction(segment_length, samplerate)
+        self.batch_size = batch_size
+
+    def valid_length(self, length: int) -> int:
+        if length > self.segment_length:
+            raise ValueError(f"입력 길이 {length}가 내보낸 구간 길이 {self.segment_length}보다 깁니다")
+        return self.segment_length
+
+    def forward(self, mix: torch.Tensor) -> torch.Tensor:
+        outputs = []
+        for first in range(0, mix.shape[0], self.batch_size):
+            part = mix[first:first + self.batch_size]
+            count = part.shape[0]
+            if count < self.batch_size:
+                part = torch.cat([part, part.new_zeros((self.batch_size - count,) + tuple(part.shape[1:]))])
+            outputs.append(self.module(part)[:count])
+        return torch.cat(outputs)
+
+
+def is_exported(model) -> bool:
+    return getattr(model, 'engine', None) == ENGINE_NAME
+
+
+def _fixed_segment_length(model) -> Optional[int]:
+    """구간 길이가 입력과 무관하게 고정이면 그 길이 (HTDemucs), 아니면 None"""
+    if not hasattr(model, 'valid_length') or getattr(model, 'segment', None) is None:
+        return None
+    segment_length = int(model.samplerate * model.segment)
+    try:
+        fixed = model.valid_length(segment_length)
+        if model.valid_length(segment_length // 2) != fixed:
+            return None
+    except Exception:
+        return None
+    return fixed
+
+
+def parity_db(reference: torch.Tensor, estimate: torch.Tensor) -> float:
+    """기준 출력 대비 SDR (dB, 클수록 일치)"""
+    reference = reference.detach().double().cpu()
+    noise = torch.sum((reference - estimate.detach().double().cpu()) ** 2).item()
+    signal = torch.sum(reference ** 2).item()
+    if noise == 0:
+        return float('inf')
+    return float(10 * np.log10(max(signal, 1e-12) / noise))
+
+
+def check_parity(eager, exported, device='cpu', seed: int = 0) -> Dict[str, Any]:
+    """
+    같은 무작위 입력(내보낸 배치 × 구간 길이)에 대한 eager / 내보낸 모델 출력 비교
+    Returns: {'sdr_db', 'max_abs_diff', 'ok'}
+    """
+    generator = torch.Generator().manual_seed(seed)
+    shape = (exported.batch_size, exported.audio_channels, exported.segment_length)
+    mix = torch.randn(shape, generator=generator).to(device)
+    with torch.no_grad():
+        expected = eager(mix)
+        actual = exported(mix)
+    sdr_db = parity_db(expected, actual)
+    return {
+        'sdr_db': round(sdr_db, 2) if np.isfinite(sdr_db) else sdr_db,
+        'max_abs_diff': float((expected - actual).abs().max().item()),
+        'ok': sdr_db >= DEMUCS_ENGINE_PARITY_DB
+    }
+
+
+class DemucsEngine:
+    """모델 이름별 TorchScript 내보내기/로드 (디스크 캐시)"""
+
+    def __init__(self, device: str = 'cpu', batch_size: int = 1, profile_tag: str = 'fp32',
+                 cache_dir=DEMUCS_ENGINE_DIR):
+        self.device = device
+        self.batch_size = max(1, batch_size)
+        self.profile_tag = profile_tag
+        self.cache_dir = Path(cache_dir)
+
+    def artifact_dir(self, name: str) -> Path:
+        torch_version = torch.__version__.split('+')[0]
+        return self.cache_dir / (f"{name}-{self.device}-{self.profile_tag}-b{self.batch_size}"
+                                 f"-torch{torch_version}-demucs{demucs.__version__}")
+
+    # ----- 로드 -----
+    def load(self, name: str):
+        """캐시된 엔진 로드 (없거나 손상되었으면 None)"""
+        path = self.artifact_dir(name)
+        try:
+            manifest = json.loads((path / MANIFEST).read_text(encoding='utf-8'))
+            models = [
+                ExportedModel(torch.jit.load(str(path / file), map_location=self.device),
+                              manifest['sources'], manifest['samplerate'], manifest['audio_channels'],
+                              manifest['segment_lengths'][i], manifest['batch_size'])
+                for i, file in enumerate(manifest['models'])
+            ]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"[Engine] 캐시된 엔진 로드 실패, 다시 내보냄 ({path.name}): {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        logger.info(f"[Engine] 내보낸 모델 로드: {path.name}")
+        return self._assemble(models, manifest.get('weights'))
+
+    @staticmethod
+    def _assemble(models: List[ExportedModel], weights):
+        if weights is None:
+            return models[0]
+        bag = BagOfModels(models, weights)
+        bag.engine = ENGINE_NAME
+        return bag
+
+    # ----- 내보내기 -----
+    def _trace(self, model, segment_length: int):
+        example = torch.randn(self.batch_size, model.audio_channels, segment_length, device=self.device)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example, check_trace=False)
+        try:
+            traced = torch.jit.freeze(traced.eval())
+        except Exception as e:
+            logger.info(f"[Engine] freeze 생략: {e}")
+        return traced
+
+    def export(self, name: str, model):
+        """
+        eager 모델을 내보내고 디스크에 저장 (parity 통과 시에만)
+        Returns: 내보낸 모델, 대상이 아니거나 실패하면 입력 eager 모델 그대로
+        """
+        sub_models = list(model.models) if isinstance(model, BagOfModels) else [model]
+        weights = [list(w) for w in model.weights] if isinstance(model, BagOfModels) else None
+        lengths = [_fixed_segment_length(m) for m in sub_models]
+        if any(length is None for length in lengths):
+            logger.info(f"[Engine] {name}: 구간 길이가 고정되지 않은 모델이라 eager로 실행")
+            return model
+
+        path = self.artifact_dir(name)
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            tmp_path.mkdir(parents=True)
+            exported, files = [], []
+            for i, (sub_model, length) in enumerate(zip(sub_models, lengths)):
+                traced = self._trace(sub_model, length)
+                wrapped = ExportedModel(traced, sub_model.sources, sub_model.samplerate,
+                                        sub_model.audio_channels, length, self.batch_size)
+                report = check_parity(sub_model, wrapped, self.device)
+                if not report['ok']:
+                    raise RuntimeError(f"parity 미달 (model{i}: {report})")
+                logger.info(f"[Engine] {name} model{i} parity: {report}")
+                files.append(f"model{i}.pt")
+                torch.jit.save(traced, str(tmp_path / files[-1]))
+                exported.append(wrapped)
+
+            (tmp_path / MANIFEST).write_text(json.dumps({
+                'name': name,
+                'sources': list(model.sources),
+                'samplerate': model.samplerate,
+                'audio_channels': model.audio_channels,
+                'segment_lengths': lengths,
+                'batch_size': self.batch_size,
+                'weights': weights,
+                'models': files
+            }, indent=2), encoding='utf-8')
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"[Engine] {name} 내보내기 실패, eager로 실행: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return model
+
+        logger.info(f"[Engine] 내보내기 완료: {path}")
+        return self._assemble(exported, weights)
@@ -0,0 +1,170 @@
+"""
+길이 기반 작업 수락 제어 (Admission Control)
+- 다운로드 전에 메타데이터만 조회한 영상 길이로 분리 비용(처리 초)을 추정
+- 현재 대기/실행 중인 작업의 추정 비용 합(backlog)과 비교하여 수락 / 대기 / 하향 / 거절 결정
+- 완료된 작업의 분리 단계(demucs_separate) 실측 시간으로 오디오 1초당 처리 시간을 지수 평균으로 보정
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 기본 분할 겹침 비율 (DemucsProcessor.separate와 동일)
+DEFAULT_OVERLAP = 0.25
+
+# 모델별 상대 비용 (htdemucs = 1, bag-of-models 계열은 구성 모델 수만큼)
+MODEL_COST = {
+    'htdemucs': 1.0,
+    'hdemucs_mmi': 1.0,
+    'htdemucs_6s': 1.2,
+    'htdemucs_ft': 4.0,
+    'mdx': 4.0,
+    'mdx_q': 4.0,
+    'mdx_extra': 4.0,
+    'mdx_extra_q': 4.0
+}
+
+ACCEPT, QUEUE, DOWNGRADE, REJECT = 'accept', 'queue', 'downgrade', 'reject'
+
+
+class AdmissionDecision:
+    def __init__(self, action: str, model: str, duration: Optional[float], cost_seconds: float,
+                 wait_seconds: float, reason: str = '', overlap: Optional[float] = None):
+        self.action = action
+        self.model = model
+        self.overlap = overlap  # None이면 기본 분할 겹침 사용
+        self.duration = duration
+        self.cost_seconds = cost_seconds
+        self.wait_seconds = wait_seconds
+        self.reason = reason
+
+    @property
+    def admitted(self) -> bool:
+        return self.action != REJECT
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'action': self.action,
+            'model': self.model,
+            'overlap': self.overlap,
+            'duration': self.duration,
+            'estimated_seconds': round(self.cost_seconds, 1),
+            'estimated_wait_seconds': round(self.wait_seconds, 1),
+            'reason': self.reason
+        }
+
+
+class AdmissionController:
+    def __init__(self, max_duration: float = 900, downgrade_duration: float = 480,
+                 downgrade_backlog: float = 600, max_backlog: float = 3600,
+                 fallback_model: str = 'htdemucs', fallback_overlap: float = 0.1,
+                 seconds_per_audio_second: float = 0.3, unknown_duration: float = 300):
+        """
+        Args:
+            max_duration: 이보다 긴 영상은 거절 (초)
+            downgrade_duration: 이보다 긴 영상은 저비용 설정으로 처리 (초)
+            downgrade_backlog: 워커당 추정 대기 작업량이 이를 넘으면 저비용 설정으로 처리 (초)
+            max_backlog: 워커당 추정 대기 작업량이 이를 넘으면 거절 (초)
+            fallback_model / fallback_overlap: 하향 시 사용할 모델 / 분할 겹침 비율
+            seconds_per_audio_second: 초기 추정치 (htdemucs 기준, 실측으로 보정됨)
+            unknown_duration: 길이 조회 실패 시 가정할 길이 (다운로드 크기 제한은 그대로 적용)
+        """
+        self.max_duration = max_duration
+        self.downgrade_duration = downgrade_duration
+        self.downgrade_backlog = downgrade_backlog
+        self.max_backlog = max_backlog
+        self.fallback_model = fallback_model
+        self.fallback_overlap = fallback_overlap
+        self.unknown_duration = unknown_duration
+
+        self._rate = seconds_per_audio_second
+        self._samples = 0
+        self._reserved: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._decisions = {ACCEPT: 0, QUEUE: 0, DOWNGRADE: 0, REJECT: 0}
+
+    # ----- 비용 추정 -----
+    def estimate(self, duration: Optional[float], model: str) -> float:
+        """예상 처리 시간 (초)"""
+        seconds = duration if duration else self.unknown_duration
+        return seconds * self._rate * MODEL_COST.get(model, 1.0)
+
+    def backlog_seconds(self) -> float:
+        with self._lock:
+            return sum(r['cost'] for r in self._reserved.values())
+
+    # ----- 결정 -----
+    def decide(self, duration: Optional[float], model: str, workers: int = 1) -> AdmissionDecision:
+        workers = max(1, workers)
+        with self._lock:
+            backlog = sum(r['cost'] for r in self._reserved.values())
+            running = len(self._reserved)
+        wait = backlog / workers if running >= workers else 0.0
+        cost = self.estimate(duration, model)
+
+        if duration and duration > self.max_duration:
+            decision = AdmissionDecision(REJECT, model, duration, cost, wait,
+                                         f'영상이 너무 깁니다 ({duration / 60:.0f}분 > {self.max_duration / 60:.0f}분)')
+        elif backlog / workers > self.max_backlog:
+            decision = AdmissionDecision(REJECT, model, duration, cost, wait,
+                                         f'서버 부하가 높습니다 (예상 대기 {wait / 60:.0f}분)')
+        elif (duration and duration > self.downgrade_duration) or backlog / workers > self.downgrade_backlog:
+            # 분할 겹침 비율 o일 때 처리량은 1/(1-o)배 (기본 겹침 대비)
+            fallback_cost = self.estimate(duration, self.fallback_model) * (1 - DEFAULT_OVERLAP) / (1 - self.fallback_overlap)
+            reason = '긴 영상' if duration and duration > self.downgrade_duration else '서버 부하'
+            decision = AdmissionDecision(DOWNGRADE, self.fallback_model, duration, min(cost, fallback_cost), wait,
+                                         f'{reason}: 빠른 설정으로 처리', overlap=self.fallback_overlap)
+        elif wait > 0:
+            decision = AdmissionDecision(QUEUE, model, duration, cost, wait, '대기열에서 순서를 기다립니다')
+        else:
+            decision = AdmissionDecision(ACCEPT, model, duration, cost, wait)
+
+        with self._lock:
+            self._decisions[decision.action] += 1
+        if decision.action != ACCEPT:
+            logger.info(f"[Admission] {decision.action}: duration={duration}, model={model} -> "
+                        f"{decision.model}, backlog={backlog:.0f}s ({decision.reason})")
+        return decision
+
+    # ----- 작업량 추적 -----
+    def reserve(self, job_id: str, decision: AdmissionDecision):
+        with self._lock:
+            self._reserved[job_id] = {'cost': decision.cost_seconds, 'duration': decision.duration,
+                                      'model': decision.model, 'overlap': decision.overlap}
+
+    def release(self, job_id: str, result: Optional[Dict[str, Any]] = None):
+        """
+        작업 종료 시 호출. 실제 분리가 수행된 작업이면 오디오 1초당 처리 시간 보정
+        - 분리 단계 시간만 사용 (다운로드/자막/정렬 시간은 길이와 무관하므로 제외, 스트리밍 분리도 같은 단계 이름)
+        """
+        with self._lock:
+            reserved = self._reserved.pop(job_id, None)
+            if not reserved or not result or not result.get('success') or result.get('cached'):
+                return
+            separate = (result.get('metrics') or {}).get('demucs_separate') or {}
+            audio_seconds = separate.get('audio_seconds')
+            wall = separate.get('wall_seconds')
+            if not audio_seconds or not wall or result.get('reused_from'):
+                return
+            observed = wall / audio_seconds / MODEL_COST.get(reserved['model'], 1.0)
+            # 하향(낮은 겹침)으로 처리된 작업은 기본 겹침 기준으로 환산 (estimate와 같은 비율)
+            if reserved.get('overlap') is not None:
+                observed *= (1 - reserved['overlap']) / (1 - DEFAULT_OVERLAP)
+            # 처음 몇 건은 빠르게, 이후에는 완만하게 반영
+            alpha = max(0.1, 1.0 / (self._samples + 1))
+            self._rate = (1 - alpha) * self._rate + alpha * observed
+            self._samples += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'reserved_jobs': len(self._reserved),
+                'backlog_seconds': round(sum(r['cost'] for r in self._reserved.values()), 1),
+                'seconds_per_audio_second': round(self._rate, 4),
+                'calibration_samples': self._samples,
+                'decisions': dict(self._decisions),
+                'max_duration': self.max_duration,
+                'downgrade_duration': self.downgrade_duration
+            }
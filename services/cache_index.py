@@ -0,0 +1,192 @@
+"""
+완료된 작업 색인 (In-memory + 선택적 SQLite 영속화)
+- 트랙 구성/크기/가사 유무를 메모리에 보관하여 요청마다 파일 시스템을 확인하지 않음
+- 작업 완료/삭제 시점에만 갱신, 서버 시작 시 SQLite(없으면 디스크 스캔)로 복원
+- 트랙별 내용 해시(ETag)를 색인 시점에 1회 계산 (요청 시 재계산 없음)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from services.checkpoint import StageCheckpoint
+from services.lyrics_format import ensure_compact
+
+logger = logging.getLogger(__name__)
+
+# 클라이언트 트랙 이름 -> MP3 파일명
+TRACK_FILES = {
+    'vocal': 'vocals.mp3',
+    'drum': 'drums.mp3',
+    'bass': 'bass.mp3',
+    'other': 'other.mp3'
+}
+
+# 가사 캐시 파일 (앞쪽 우선)
+LYRICS_FILES = ['aligned.json', 'aligned.lrc']
+
+
+def file_etag(path: Path) -> str:
+    """파일 내용 기반 강한 ETag (blake2b 128bit)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CacheIndex:
+    def __init__(self, downloads_dir, db_path=None):
+        """
+        Args:
+            db_path: SQLite 파일 경로 (None이면 메모리에만 유지하고 시작 시 디스크 스캔)
+        """
+        self.downloads_dir = Path(downloads_dir)
+        self.db_path = Path(db_path) if db_path else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # 연결 1개를 워커/라우트/정리 스레드가 공유하므로 모든 DB 사용은 이 락 안에서 (트랜잭션 섞임 방지)
+        self._db_lock = threading.Lock()
+        self._db = None
+
+        if self.db_path:
+            self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS jobs (video_id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            self._db.commit()
+
+        if not self._load_db():
+            self.rebuild()
+
+    # ----- 영속화 -----
+    def _load_db(self) -> bool:
+        if self._db is None:
+            return False
+        with self._db_lock:
+            rows = self._db.execute('SELECT video_id, data FROM jobs').fetchall()
+        if not rows:
+            return False
+        with self._lock:
+            self._entries = {vid: json.loads(data) for vid, data in rows}
+        logger.info(f"[CacheIndex] SQLite에서 {len(rows)}건 복원")
+        return True
+
+    def _persist(self, video_id: str, entry: Optional[Dict[str, Any]]):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                if entry is None:
+                    self._db.execute('DELETE FROM jobs WHERE video_id = ?', (video_id,))
+                else:
+                    self._db.execute('INSERT OR REPLACE INTO jobs (video_id, data) VALUES (?, ?)',
+                                     (video_id, json.dumps(entry)))
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"[CacheIndex] SQLite 저장 실패 ({video_id}): {e}")
+
+    # ----- 갱신 -----
+    def _scan_dir(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """video_id 폴더를 1회 확인하여 색인 항목 생성 (완료된 작업만)"""
+        work_dir = self.downloads_dir / video_id
+        separated = work_dir / 'separated'
+        tracks = {}
+        for track, filename in TRACK_FILES.items():
+            path = separated / filename
+            if path.is_file():
+                tracks[track] = {
+                    'file': filename,
+                    'size': path.stat().st_size / (1024 * 1024),
+                    'etag': file_etag(path)
+                }
+        if len(tracks) < len(TRACK_FILES):
+            return None
+
+        lyrics_file = next((name for name in LYRICS_FILES if (work_dir / name).is_file()), None)
+        # 압축 가사 형식 (이전 버전 캐시는 이 시점에 1회 생성)
+        lyrics_gz = ensure_compact(work_dir, lyrics_file) if lyrics_file else None
+        return {
+            'tracks': tracks,
+            'lyrics_file': lyrics_file,
+            'lyrics_etag': file_etag(lyrics_gz) if lyrics_gz else None,
+            'complete': StageCheckpoint(work_dir).is_complete(),
+            'updated_at': time.time()
+        }
+
+    def rebuild(self):
+        """디스크 전체 스캔 (영속화된 색인이 없을 때만)"""
+        entries = {}
+        if self.downloads_dir.exists():
+            for child in self.downloads_dir.iterdir():
+                if child.is_dir() and not child.name.startswith('.'):
+                    entry = self._scan_dir(child.name)
+                    if entry:
+                        entries[child.name] = entry
+        with self._lock:
+            self._entries = entries
+        for video_id, entry in entries.items():
+            self._persist(video_id, entry)
+        logger.info(f"[CacheIndex] 디스크 스캔으로 {len(entries)}건 색인")
+
+    def update(self, video_id: str):
+        """작업 완료 후 호출: 해당 폴더만 다시 확인하여 색인 갱신"""
+        entry = self._scan_dir(video_id)
+        with self._lock:
+            if entry:
+                self._entries[video_id] = entry
+            else:
+                self._entries.pop(video_id, None)
+        self._persist(video_id, entry)
+
+    def remove(self, video_id: str):
+        with self._lock:
+            self._entries.pop(video_id, None)
+        self._persist(video_id, None)
+
+    # ----- 조회 (파일 시스템 접근 없음) -----
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(video_id)
+            return json.loads(json.dumps(entry)) if entry else None
+
+    def get_track_file(self, video_id: str, filename: str) -> Optional[Dict[str, Any]]:
+        """파일명으로 트랙 정보 조회 (file, size, etag)"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if not entry:
+                return None
+            for info in entry['tracks'].values():
+                if info['file'] == filename:
+                    return dict(info)
+        return None
+
+    def get_lyrics_url(self, video_id: str) -> Optional[str]:
+        """압축 가사 경로 (/downloads/<id>/lyrics.json?v=내용해시), 없으면 None"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            etag = entry.get('lyrics_etag') if entry else None
+        return f"/downloads/{video_id}/lyrics.json?v={etag[:12]}" if etag else None
+
+    def get_tracks(self, video_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        API 응답 형식의 트랙 정보 ({'vocal': {'path': '/downloads/...', 'size': MB}})
+        - 경로에 내용 해시(?v=)를 붙여 재분리 시 URL이 바뀌도록 함 (immutable 캐시 안전)
+        """
+        entry = self.get(video_id)
+        if not entry:
+            return {}
+        tracks = {}
+        for track, info in entry['tracks'].items():
+            path = f"/downloads/{video_id}/{track}.mp3"
+            if info.get('etag'):
+                path += f"?v={info['etag'][:12]}"
+            tracks[track] = {'path': path, 'size': info['size']}
+        return tracks
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
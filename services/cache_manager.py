@@ -0,0 +1,223 @@
+"""
+downloads/ 디스크 용량 관리
+- video_id 폴더별 크기/마지막 접근/적중 수 추적 (JSON으로 영속화)
+- 용량 예산 초과 시 LRU 또는 LFU 순으로 폴더 삭제 (처리 중인 폴더는 제외)
+- 선택적으로 트랙 생성 후 원본 오디오(input.*) 삭제
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class CacheManager:
+    STATE_FILE = '.cache_state.json'
+
+    def __init__(self, downloads_dir, max_bytes: int = 0, policy: str = 'lru',
+                 drop_input: bool = False, save_interval: float = 30):
+        """
+        Args:
+            max_bytes: 용량 예산 (0이면 무제한)
+            policy: 'lru' (마지막 접근이 오래된 순) 또는 'lfu' (적중 수가 적은 순)
+            drop_input: 트랙 생성이 끝나면 input.* 원본 삭제
+        """
+        self.downloads_dir = Path(downloads_dir)
+        self.max_bytes = max_bytes
+        self.policy = policy if policy in ('lru', 'lfu') else 'lru'
+        self.drop_input = drop_input
+        self.save_interval = save_interval
+
+        self.state_path = self.downloads_dir / self.STATE_FILE
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._pinned: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._last_save = 0.0
+        self.on_evict: List[Callable[[str], None]] = []
+
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+        self._load()
+        self.scan()
+
+    # ----- 상태 영속화 -----
+    def _load(self):
+        if not self.state_path.exists():
+            return
+        try:
+            self._entries = json.loads(self.state_path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"[Cache] 상태 파일 로드 실패: {e}")
+            self._entries = {}
+
+    def _save(self, force: bool = False):
+        with self._lock:
+            if not force and time.time() - self._last_save < self.save_interval:
+                return
+            self._last_save = time.time()
+            tmp_path = self.state_path.with_name(self.STATE_FILE + '.tmp')
+            try:
+                tmp_path.write_text(json.dumps(self._entries), encoding='utf-8')
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                logger.warning(f"[Cache] 상태 파일 저장 실패: {e}")
+
+    # ----- 크기 추적 -----
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.stat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def scan(self):
+        """디스크의 video_id 폴더와 상태를 동기화 (시작 시 1회)"""
+        with self._lock:
+            found = set()
+            for child in self.downloads_dir.iterdir():
+                if not child.is_dir() or child.name.startswith('.'):
+                    continue
+                found.add(child.name)
+                entry = self._entries.setdefault(child.name, {
+                    'last_access': child.stat().st_mtime, 'hits': 0, 'size': 0
+                })
+                entry['size'] = self._dir_size(child)
+            for video_id in list(self._entries.keys()):
+                if video_id not in found:
+                    del self._entries[video_id]
+        self._save(force=True)
+
+    def refresh(self, video_id: str):
+        """작업 완료 후 폴더 크기 재계산"""
+        path = self.downloads_dir / video_id
+        if not path.is_dir():
+            return
+        with self._lock:
+            entry = self._entries.setdefault(video_id, {'last_access': time.time(), 'hits': 0, 'size': 0})
+            entry['size'] = self._dir_size(path)
+            entry['last_access'] = time.time()
+        self._save()
+
+    def touch(self, video_id: str):
+        """캐시 적중 / 파일 서빙 시 접근 기록"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                return
+            entry['last_access'] = time.time()
+            entry['hits'] += 1
+        self._save()
+
+    # ----- 처리 중 보호 -----
+    @contextmanager
+    def pin(self, video_id: str):
+        """처리 중인 폴더는 삭제 대상에서 제외"""
+        with self._lock:
+            self._pinned[video_id] = self._pinned.get(video_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pinned[video_id] -= 1
+                if self._pinned[video_id] <= 0:
+                    del self._pinned[video_id]
+
+    # ----- 정리 -----
+    def drop_input_audio(self, video_id: str):
+        """트랙이 모두 생성된 경우 원본 오디오 삭제"""
+        work_dir = self.downloads_dir / video_id
+        separated = work_dir / 'separated'
+        required = ['vocals.mp3', 'drums.mp3', 'bass.mp3', 'other.mp3']
+        if not all((separated / name).exists() for name in required):
+            return
+        for audio in work_dir.glob('input.*'):
+            try:
+                audio.unlink()
+                logger.info(f"[Cache] 원본 오디오 삭제: {audio}")
+            except OSError as e:
+                logger.warning(f"[Cache] 원본 오디오 삭제 실패: {e}")
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(e['size'] for e in self._entries.values())
+
+    def enforce(self, reserve_bytes: int = 0) -> List[str]:
+        """
+        예산 초과 시 정책 순서대로 폴더 삭제
+        Args:
+            reserve_bytes: 곧 기록될 용량 (새 작업 시작 전 미리 확보)
+        Returns:
+            삭제된 video_id 목록
+        """
+        if self.max_bytes <= 0:
+            return []
+
+        evicted = []
+        with self._lock:
+            total = self.total_bytes()
+            if total + reserve_bytes <= self.max_bytes:
+                return []
+
+            if self.policy == 'lfu':
+                order_key = lambda item: (item[1]['hits'], item[1]['last_access'])
+            else:
+                order_key = lambda item: item[1]['last_access']
+            candidates = sorted(
+                ((vid, e) for vid, e in self._entries.items() if vid not in self._pinned),
+                key=order_key
+            )
+
+            for video_id, entry in candidates:
+                if total + reserve_bytes <= self.max_bytes:
+                    break
+                try:
+                    shutil.rmtree(self.downloads_dir / video_id)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"[Cache] 삭제 실패 ({video_id}): {e}")
+                    continue
+                total -= entry['size']
+                self.evictions += 1
+                self.evicted_bytes += entry['size']
+                del self._entries[video_id]
+                evicted.append(video_id)
+                logger.info(f"[Cache] 삭제({self.policy}): {video_id} ({entry['size'] / (1024 * 1024):.1f}MB)")
+
+        for video_id in evicted:
+            for callback in self.on_evict:
+                try:
+                    callback(video_id)
+                except Exception as e:
+                    logger.warning(f"[Cache] 삭제 콜백 실패 ({video_id}): {e}")
+
+        if evicted:
+            self._save(force=True)
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.total_bytes()
+            return {
+                'policy': self.policy,
+                'max_bytes': self.max_bytes,
+                'total_bytes': total,
+                'usage_ratio': (total / self.max_bytes) if self.max_bytes else None,
+                'entries': len(self._entries),
+                'pinned': sorted(self._pinned.keys()),
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'drop_input': self.drop_input
+            }
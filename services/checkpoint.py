@@ -0,0 +1,119 @@
+"""
+파이프라인 단계별 체크포인트
+- 작업 폴더의 .stages/<단계>.done 에 완료 정보(JSON)를 원자적으로 기록
+- 재시도 시 첫 번째 미완료 단계부터 재개
+- 부가 단계(자막/정렬)는 실패 횟수를 기록하고 한도를 넘으면 건너뜀 처리 (무한 재시도 방지)
+"""
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 실행 순서
+STAGES = ['download', 'separate', 'encode', 'text', 'align']
+
+# 단계별 결과에 의존하는 단계 (invalidate 시 함께 제거)
+# - 텍스트는 오디오와 무관하게 병렬 실행되므로 오디오 단계를 다시 해도 지우지 않음
+# - 정렬은 같은 영상의 가사/타임라인 결과라 오디오를 다시 분리해도 유효
+STAGE_DEPENDENTS = {
+    'download': ['separate', 'encode'],
+    'separate': ['encode'],
+    'encode': [],
+    'text': ['align'],
+    'align': []
+}
+
+
+def direct_dependents(stage: str) -> list:
+    """stage 결과를 직접 읽는 단계 (다른 의존 단계를 거쳐서만 의존하는 단계 제외)"""
+    dependents = STAGE_DEPENDENTS[stage]
+    return [s for s in dependents if not any(s in STAGE_DEPENDENTS[d] for d in dependents)]
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = 'utf-8'):
+    """임시 파일에 쓴 뒤 교체 (중간에 실패해도 반쯤 쓰인 파일이 남지 않음)"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding=encoding) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class StageCheckpoint:
+    STAGE_DIR = '.stages'
+
+    def __init__(self, work_dir, max_retries: int = 2):
+        self.work_dir = Path(work_dir)
+        self.stage_dir = self.work_dir / self.STAGE_DIR
+        self.max_retries = max_retries
+
+    def _done_path(self, stage: str) -> Path:
+        return self.stage_dir / f"{stage}.done"
+
+    def _failed_path(self, stage: str) -> Path:
+        return self.stage_dir / f"{stage}.failed"
+
+    def is_done(self, stage: str) -> bool:
+        return self._done_path(stage).exists()
+
+    def get(self, stage: str) -> Optional[Dict[str, Any]]:
+        """완료 정보 (미완료면 None)"""
+        try:
+            return json.loads(self._done_path(stage).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def mark_done(self, stage: str, data: Optional[Dict[str, Any]] = None):
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self._done_path(stage), json.dumps(data or {}, ensure_ascii=False))
+        try: self._failed_path(stage).unlink()
+        except OSError: pass
+        logger.info(f"[Checkpoint] {self.work_dir.name}: '{stage}' 완료")
+
+    def is_needed(self, stage: str) -> bool:
+        """stage 결과를 직접 읽는 단계 중 미완료가 있는지 (없으면 재개 시 stage를 다시 할 필요 없음)"""
+        return any(not self.is_done(s) for s in direct_dependents(stage))
+
+    def invalidate(self, stage: str):
+        """해당 단계와 그 결과에 의존하는 단계(STAGE_DEPENDENTS)의 완료 표시 제거"""
+        for s in [stage] + STAGE_DEPENDENTS[stage]:
+            try: self._done_path(s).unlink()
+            except OSError: pass
+
+    def record_failure(self, stage: str, error: str) -> bool:
+        """
+        부가 단계 실패 기록. 한도 초과 시 건너뜀으로 완료 처리
+        Returns: True면 건너뜀 처리됨 (더 이상 재시도하지 않음)
+        """
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            count = int(self._failed_path(stage).read_text(encoding='utf-8')) + 1
+        except (OSError, ValueError):
+            count = 1
+        atomic_write_text(self._failed_path(stage), str(count))
+
+        if count >= self.max_retries:
+            logger.warning(f"[Checkpoint] {self.work_dir.name}: '{stage}' {count}회 실패, 건너뜀")
+            self.mark_done(stage, {'skipped': True, 'error': error})
+            return True
+        logger.warning(f"[Checkpoint] {self.work_dir.name}: '{stage}' 실패 ({count}/{self.max_retries}): {error}")
+        return False
+
+    def is_complete(self) -> bool:
+        """
+        모든 단계 완료 여부
+        - 체크포인트 도입 이전 폴더(.stages 없음)는 완료로 간주
+        """
+        if not self.stage_dir.exists():
+            return True
+        return all(self.is_done(s) for s in STAGES)
+
+    def clear(self):
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
@@ -0,0 +1,221 @@
+"""
+오디오 지문(Fingerprint) 기반 분리 결과 재사용
+- 다운로드한 오디오의 앞부분을 저음질 모노로 디코딩하여 스펙트럼 대역 에너지 변화로 32bit 서브 지문 생성
+  (Haitsma-Kalker 방식: 재인코딩/음량 차이에 강하고 비교는 비트 오류율로 수행)
+- video_id가 달라도 같은 음원(재업로드, 가사 영상, 공식 오디오)이면 기존 트랙을 재사용
+- 플레이어는 영상 시간(currentTime)으로 트랙을 재생하므로 정렬 오프셋 ≈ 0, 전체 길이 일치인 경우만 재사용
+- 색인은 추가/삭제 기록을 덧붙이는 JSONL 로그 (작업마다 전체 재기록하지 않고, 기록이 쌓이면 압축)
+"""
+
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 5512
+FRAME_SIZE = 2048
+HOP_SIZE = 256  # ~46ms (프레임 0.37s)
+NUM_BANDS = 33
+MIN_FREQ, MAX_FREQ = 300, 2000
+
+
+def _decode_mono(audio_path: Path) -> Optional[np.ndarray]:
+    """전체 길이를 저음질 모노로 디코딩 (길이 비교에도 사용, 5512Hz 16bit라 3분에 약 2MB)"""
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-i', str(audio_path),
+        '-ac', '1', '-ar', str(SAMPLE_RATE),
+        '-f', 's16le', 'pipe:1'
+    ]
+    proc = subprocess.run(cmd, capture_output=True, timeout=60)
+    if proc.returncode != 0 or not proc.stdout:
+        logger.warning(f"[Fingerprint] 디코딩 실패: {proc.stderr.decode(errors='ignore')[-300:]}")
+        return None
+    return np.frombuffer(proc.stdout, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def compute_fingerprint(audio_path, seconds: float = 120) -> Optional[Tuple[np.ndarray, float]]:
+    """
+    오디오 앞부분(seconds)의 서브 지문 배열(uint32)과 전체 길이(초) 계산
+    Returns: (지문, 길이) 또는 None
+    """
+    samples = _decode_mono(Path(audio_path))
+    if samples is None or len(samples) < FRAME_SIZE * 2:
+        return None
+    duration = len(samples) / SAMPLE_RATE
+    samples = samples[:int(seconds * SAMPLE_RATE)]
+
+    num_frames = 1 + (len(samples) - FRAME_SIZE) // HOP_SIZE
+    idx = np.arange(FRAME_SIZE)[None, :] + HOP_SIZE * np.arange(num_frames)[:, None]
+    frames = samples[idx] * np.hanning(FRAME_SIZE).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    # 로그 간격 대역 에너지 (NUM_BANDS개 → 인접 차분 32bit)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    edges = np.geomspace(MIN_FREQ, MAX_FREQ, NUM_BANDS + 1)
+    bins = np.searchsorted(freqs, edges)
+    energy = np.add.reduceat(power, bins, axis=1)[:, :NUM_BANDS]
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = (1 << np.arange(31, -1, -1, dtype=np.uint64)).astype(np.uint64)
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32), duration
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray) -> float:
+    n = min(len(a), len(b))
+    if n == 0:
+        return 1.0
+    diff = np.bitwise_xor(a[:n], b[:n])
+    return float(np.unpackbits(diff.view(np.uint8)).sum()) / (n * 32)
+
+
+class FingerprintIndex:
+    """
+    지문 → video_id 색인 (JSONL 추가 기록으로 영속화)
+    - 서브 지문 값의 역색인으로 후보를 찾고, 정렬 오프셋을 맞춘 비트 오류율로 최종 판정
+    - 기록: {"id", "duration", "fp"} (추가) / {"id", "removed": true} (삭제), 마지막 기록이 유효
+    """
+
+    def __init__(self, index_path, max_ber: float = 0.35, min_votes: int = 8,
+                 max_offset_seconds: float = 0.1, duration_tolerance: float = 1.0):
+        """
+        Args:
+            max_offset_seconds: 허용하는 최다 득표 정렬 오프셋 (영상 타임라인 기준 시작점이 같아야 함)
+            duration_tolerance: 허용하는 전체 길이 차이 (초, 인트로/아웃트로가 다른 영상 제외)
+        """
+        self.index_path = Path(index_path)
+        self.max_ber = max_ber
+        self.min_votes = min_votes
+        self.max_offset_frames = int(round(max_offset_seconds * SAMPLE_RATE / HOP_SIZE))
+        self.duration_tolerance = duration_tolerance
+        self._fingerprints: Dict[str, np.ndarray] = {}
+        self._durations: Dict[str, float] = {}
+        self._inverted: Dict[int, List[tuple]] = defaultdict(list)
+        self._records = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 기록 도중 중단된 마지막 줄
+                        continue
+                    self._records += 1
+                    video_id = record['id']
+                    if video_id in self._fingerprints:
+                        self._remove_locked(video_id)
+                    if not record.get('removed'):
+                        self._add_locked(video_id, np.asarray(record['fp'], dtype=np.uint32), record['duration'])
+            logger.info(f"[Fingerprint] 색인 로드: {len(self._fingerprints)}곡")
+        except Exception as e:
+            logger.warning(f"[Fingerprint] 색인 로드 실패: {e}")
+        if self._records > 2 * len(self._fingerprints) + 100:
+            self._compact_locked()
+
+    @staticmethod
+    def _record(video_id: str, fp: np.ndarray, duration: float) -> str:
+        return json.dumps({'id': video_id, 'duration': round(duration, 3), 'fp': fp.tolist()})
+
+    def _append_locked(self, line: str):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+        self._records += 1
+        # 삭제/갱신으로 무효 기록이 유효 항목보다 많아지면 한 번에 다시 기록
+        if self._records > 2 * len(self._fingerprints) + 100:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for video_id, fp in self._fingerprints.items():
+                f.write(self._record(video_id, fp, self._durations[video_id]) + '\n')
+        os.replace(tmp_path, self.index_path)
+        self._records = len(self._fingerprints)
+
+    def _add_locked(self, video_id: str, fp: np.ndarray, duration: float):
+        self._fingerprints[video_id] = fp
+        self._durations[video_id] = float(duration)
+        for frame, value in enumerate(fp.tolist()):
+            if value:  # 무음 구간(0)은 후보 검색에서 제외
+                self._inverted[value].append((video_id, frame))
+
+    def add(self, video_id: str, fp: np.ndarray, duration: float):
+        with self._lock:
+            if video_id in self._fingerprints:
+                self._remove_locked(video_id)
+            self._add_locked(video_id, fp, duration)
+            self._append_locked(self._record(video_id, fp, duration))
+
+    def remove(self, video_id: str):
+        with self._lock:
+            if video_id in self._fingerprints:
+                self._remove_locked(video_id)
+                self._append_locked(json.dumps({'id': video_id, 'removed': True}))
+
+    def _remove_locked(self, video_id: str):
+        fp = self._fingerprints.pop(video_id)
+        self._durations.pop(video_id, None)
+        for value in set(fp.tolist()):
+            entries = self._inverted.get(value)
+            if entries:
+                entries[:] = [e for e in entries if e[0] != video_id]
+                if not entries:
+                    del self._inverted[value]
+
+    def lookup(self, fp: np.ndarray, duration: float, exclude: Optional[str] = None) -> Optional[str]:
+        """
+        일치하는 기존 video_id 반환 (없으면 None)
+        - 곡별 최다 득표 오프셋이 max_offset 이내이고 전체 길이 차이가 duration_tolerance 이내여야 함
+        """
+        with self._lock:
+            votes = defaultdict(int)
+            for q_frame, value in enumerate(fp.tolist()):
+                if not value:
+                    continue
+                for video_id, frame in self._inverted.get(value, ()):
+                    if video_id != exclude:
+                        votes[(video_id, frame - q_frame)] += 1
+
+            best = {}
+            for (video_id, offset), count in votes.items():
+                if count > best.get(video_id, (None, 0))[1]:
+                    best[video_id] = (offset, count)
+
+            candidates = sorted(best.items(), key=lambda kv: kv[1][1], reverse=True)[:5]
+            for video_id, (offset, count) in candidates:
+                if count < self.min_votes:
+                    break
+                if abs(offset) > self.max_offset_frames:
+                    logger.info(f"[Fingerprint] {video_id}: 시작 위치가 달라 재사용 불가 (offset={offset})")
+                    continue
+                if abs(self._durations[video_id] - duration) > self.duration_tolerance:
+                    logger.info(f"[Fingerprint] {video_id}: 길이가 달라 재사용 불가 "
+                                f"({self._durations[video_id]:.1f}s / {duration:.1f}s)")
+                    continue
+                ref = self._fingerprints[video_id]
+                if offset >= 0:
+                    ber = bit_error_rate(ref[offset:], fp)
+                else:
+                    ber = bit_error_rate(ref, fp[-offset:])
+                if ber <= self.max_ber:
+                    logger.info(f"[Fingerprint] 일치: {video_id} (offset={offset}, BER={ber:.3f}, votes={count})")
+                    return video_id
+        return None
@@ -0,0 +1,195 @@
+"""
+백그라운드 작업 큐 & 워커 풀
+- Socket.IO 핸들러 스레드에서 파이프라인을 직접 실행하지 않도록 분리
+- 큐 크기 제한 (과부하 시 즉시 거절) + 워커 수 제한 (동시 Demucs 실행 수 제한)
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """큐에 등록된 단일 작업"""
+
+    def __init__(self, job_id: str, func: Callable, kwargs: Dict[str, Any],
+                 on_progress: Optional[Callable] = None,
+                 on_complete: Optional[Callable] = None, key: Optional[str] = None,
+                 info: Optional[Dict[str, Any]] = None):
+        self.id = job_id
+        self.key = key
+        self.info = info or {}  # 호출 측 부가 정보 (작업 함수에는 전달하지 않음)
+        self.func = func
+        self.kwargs = kwargs
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+
+        self.status = 'queued'  # queued -> running -> completed / failed
+        self.progress = 0
+        self.message = '대기 중...'
+        self.result = None
+        self.notified = False  # 완료/오류 알림 전송 여부 (on_complete 측에서 기록)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'key': self.key,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobQueue:
+    """
+    제한된 크기의 작업 큐와 고정 크기 워커 풀
+    - func(progress_callback=..., **kwargs) 형태로 호출되며 결과 dict를 반환해야 함
+    """
+
+    def __init__(self, num_workers: int = 1, max_queue_size: int = 16, history_size: int = 100):
+        self.num_workers = max(1, num_workers)
+        self.history_size = history_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def start(self):
+        """워커 스레드 기동 (여러 번 호출해도 한 번만 실행)"""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                t = threading.Thread(target=self._worker_loop, name=f"separation-worker-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+        logger.info(f"[JobQueue] 워커 {self.num_workers}개 시작 (큐 크기: {self._queue.maxsize})")
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    def submit(self, func: Callable, kwargs: Dict[str, Any],
+               on_progress: Optional[Callable] = None,
+               on_complete: Optional[Callable] = None,
+               job_id: Optional[str] = None, key: Optional[str] = None,
+               info: Optional[Dict[str, Any]] = None) -> Optional[Job]:
+        """
+        작업 등록. 큐가 가득 차면 None 반환 (호출 측에서 거절 처리)
+        - key가 같은 작업이 대기/실행 중이면 새로 등록하지 않고 기존 작업을 반환 (single-flight)
+        """
+        job = Job(job_id or self.new_job_id(), func, kwargs, on_progress, on_complete, key, info)
+        with self._lock:
+            if key is not None:
+                existing = self._find_active_locked(key)
+                if existing:
+                    logger.info(f"[JobQueue] 동일 작업 합류: {key} -> {existing.id}")
+                    return existing
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            logger.warning(f"[JobQueue] 큐 가득 참 ({self._queue.maxsize}), 작업 거절")
+            return None
+
+        logger.info(f"[JobQueue] 작업 등록: {job.id} (대기: {self._queue.qsize()})")
+        return job
+
+    def find_active(self, key: str) -> Optional[Job]:
+        with self._lock:
+            return self._find_active_locked(key)
+
+    def _find_active_locked(self, key: str) -> Optional[Job]:
+        for j in self._jobs.values():
+            if j.key == key and j.status in ('queued', 'running'):
+                return j
+        return None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> int:
+        """대기열 내 순번 (0이면 실행 중이거나 종료됨)"""
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j.status == 'queued']
+        queued.sort(key=lambda j: j.created_at)
+        for i, j in enumerate(queued):
+            if j.id == job_id:
+                return i + 1
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {
+            'workers': self.num_workers,
+            'queue_size': self._queue.maxsize,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'completed': statuses.count('completed'),
+            'failed': statuses.count('failed')
+        }
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+                self._prune()
+
+    def _run(self, job: Job):
+        job.status = 'running'
+        job.started_at = time.time()
+        logger.info(f"[JobQueue] 작업 시작: {job.id}")
+
+        def progress_callback(progress, message):
+            job.progress = progress
+            job.message = message
+            if job.on_progress:
+                try:
+                    job.on_progress(job, progress, message)
+                except Exception as e:
+                    logger.warning(f"[JobQueue] 진행률 전달 실패 ({job.id}): {e}")
+
+        try:
+            result = job.func(progress_callback=progress_callback, **job.kwargs)
+        except Exception as e:
+            logger.error(f"[JobQueue] 작업 오류 ({job.id}): {e}")
+            result = {'success': False, 'error': str(e)}
+
+        job.result = result
+        job.status = 'completed' if result and result.get('success') else 'failed'
+        job.finished_at = time.time()
+        logger.info(f"[JobQueue] 작업 종료: {job.id} ({job.status}, {job.finished_at - job.started_at:.1f}s)")
+
+        if job.on_complete:
+            try:
+                job.on_complete(job, result)
+            except Exception as e:
+                logger.warning(f"[JobQueue] 완료 전달 실패 ({job.id}): {e}")
+
+    def _prune(self):
+        """종료된 작업 이력은 history_size 개까지만 유지"""
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.status in ('completed', 'failed')]
+            if len(finished) <= self.history_size:
+                return
+            finished.sort(key=lambda j: j.finished_at)
+            for j in finished[:len(finished) - self.history_size]:
+                del self._jobs[j.id]
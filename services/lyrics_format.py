@@ -0,0 +1,179 @@
+"""
+정렬 가사 압축 형식 (aligned.v1.json)
+- align_lyrics의 LRC 텍스트(글자당 1줄)를 서버에서 1회 해석하여 열(column) 단위 배열로 저장
+- 클라이언트는 정규식 해석/항목별 깊은 복사 없이 배열 인덱스로 바로 줄을 구성
+- 같은 내용을 gzip으로 미리 압축(.gz)해 두고 그대로 전송
+
+형식 (version 1):
+    {
+      "v": 1,
+      "scale": 100,              # 시간 단위 (start/end 정수 / scale = 초)
+      "start": [int, ...],       # 토큰 시작 시간
+      "end": [int, ...],         # 토큰 종료 시간
+      "text": [str, ...],        # 토큰 텍스트 ('^' 접두어 제거)
+      "word_start": [0|1, ...],  # 단어 첫 토큰 여부 (0이면 앞 토큰에 붙여 씀)
+      "gap": 2.0,                # 줄 구분에 사용한 공백 기준 (초)
+      "lines": [int, ...],       # 각 줄(구절)의 첫 토큰 인덱스
+      "coverage": 0.97           # (선택) 원본 가사 토큰 중 Whisper 단어와 일치한 비율
+    }
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.checkpoint import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+FILE_NAME = f'aligned.v{FORMAT_VERSION}.json'
+GZIP_NAME = FILE_NAME + '.gz'
+TIME_SCALE = 100
+
+# 클라이언트(lyrics_overlay.js)와 같은 줄 구분 기준
+LINE_GAP_SECONDS = 2.0
+MAX_GROUP_TOKENS = 50
+
+_PATTERN_FULL = re.compile(r'\[(\d+):(\d+(?:\.\d+)?)\]\s*<(\d+):(\d+(?:\.\d+)?)>\s*(.*)')
+_PATTERN_STD = re.compile(r'\[(\d+):(\d+(?:\.\d+)?)\](.*)')
+_PATTERN_TAG = re.compile(r'\[([a-z]+):([^\]]*)\]$')
+
+
+def parse_tags(lrc_text: str) -> Dict[str, str]:
+    """LRC 헤더 태그 ([by:...], [coverage:...] 등)"""
+    tags = {}
+    for line in (lrc_text or '').splitlines():
+        m = _PATTERN_TAG.match(line.strip())
+        if m:
+            tags[m.group(1)] = m.group(2).strip()
+    return tags
+
+
+def parse_aligned(lrc_text: str) -> List[Dict[str, Any]]:
+    """
+    LRC 텍스트 → 토큰 목록 [{'start', 'end', 'text', 'word_start'}] (시작 시간 순)
+    - 종료 시간이 없는 줄은 다음 토큰 시작(마지막은 +3초)으로 채움 (클라이언트 기존 동작과 동일)
+    """
+    tokens = []
+    for line in (lrc_text or '').splitlines():
+        line = line.strip()
+        m = _PATTERN_FULL.match(line)
+        if m:
+            start = int(m.group(1)) * 60 + float(m.group(2))
+            end = int(m.group(3)) * 60 + float(m.group(4))
+            text = m.group(5).strip()
+        else:
+            m = _PATTERN_STD.match(line)
+            if not m:
+                continue
+            start = int(m.group(1)) * 60 + float(m.group(2))
+            end = None
+            text = m.group(3).strip()
+        if not text:
+            continue
+        word_start = not text.startswith('^')
+        if not word_start:
+            text = text[1:]
+        tokens.append({'start': start, 'end': end, 'text': text, 'word_start': word_start})
+
+    tokens.sort(key=lambda t: t['start'])
+    for i, token in enumerate(tokens):
+        if token['end'] is None:
+            token['end'] = tokens[i + 1]['start'] if i + 1 < len(tokens) else token['start'] + 3.0
+    return tokens
+
+
+def group_lines(tokens: List[Dict[str, Any]], gap: float = LINE_GAP_SECONDS) -> List[int]:
+    """
+    줄(구절) 첫 토큰 인덱스: 이어지는 글자이거나 직전 줄 끝과의 간격이 gap 이하면 같은 줄
+    (lyrics_overlay.js 'sentence' 모드와 같은 규칙, 줄당 최대 MAX_GROUP_TOKENS)
+    """
+    lines = []
+    line_end = None
+    count = 0
+    for i, token in enumerate(tokens):
+        joins = line_end is not None and count < MAX_GROUP_TOKENS and (
+            not token['word_start'] or token['start'] - line_end <= gap)
+        if joins:
+            count += 1
+        else:
+            lines.append(i)
+            count = 1
+        line_end = token['end']
+    return lines
+
+
+def build_compact(lrc_text: str, gap: float = LINE_GAP_SECONDS) -> Optional[Dict[str, Any]]:
+    """LRC 텍스트 → 압축 형식 dict (토큰이 없으면 None)"""
+    tokens = parse_aligned(lrc_text)
+    if not tokens:
+        return None
+    compact = {
+        'v': FORMAT_VERSION,
+        'scale': TIME_SCALE,
+        'start': [int(round(t['start'] * TIME_SCALE)) for t in tokens],
+        'end': [int(round(t['end'] * TIME_SCALE)) for t in tokens],
+        'text': [t['text'] for t in tokens],
+        'word_start': [1 if t['word_start'] else 0 for t in tokens],
+        'gap': gap,
+        'lines': group_lines(tokens, gap)
+    }
+    coverage = parse_tags(lrc_text).get('coverage')
+    if coverage:
+        try:
+            compact['coverage'] = float(coverage)
+        except ValueError:
+            pass
+    return compact
+
+
+def write_compact(work_dir, lrc_text: str) -> Optional[Path]:
+    """
+    aligned.json 옆에 압축 형식(.json)과 gzip 사본(.json.gz)을 원자적으로 기록
+    Returns: gzip 파일 경로 (토큰이 없으면 None)
+    """
+    compact = build_compact(lrc_text)
+    if compact is None:
+        return None
+    work_dir = Path(work_dir)
+    body = json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
+    atomic_write_text(work_dir / FILE_NAME, body)
+
+    gz_path = work_dir / GZIP_NAME
+    tmp_path = gz_path.with_name(gz_path.name + '.tmp')
+    # mtime=0: 같은 내용이면 같은 바이트 (ETag 안정)
+    with open(tmp_path, 'wb') as f:
+        f.write(gzip.compress(body.encode('utf-8'), compresslevel=9, mtime=0))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, gz_path)
+    return gz_path
+
+
+def ensure_compact(work_dir, source_name: str = 'aligned.json') -> Optional[Path]:
+    """
+    압축 형식이 없거나 원본보다 오래되었으면 다시 생성 (이전 버전 캐시 호환)
+    Returns: gzip 파일 경로 (원본이 없거나 비어 있으면 None)
+    """
+    work_dir = Path(work_dir)
+    source = work_dir / source_name
+    gz_path = work_dir / GZIP_NAME
+    try:
+        source_mtime = source.stat().st_mtime
+    except OSError:
+        return None
+    try:
+        if gz_path.stat().st_mtime >= source_mtime and (work_dir / FILE_NAME).is_file():
+            return gz_path
+    except OSError:
+        pass
+    try:
+        return write_compact(work_dir, source.read_text(encoding='utf-8'))
+    except OSError as e:
+        logger.warning(f"[Lyrics] 압축 형식 생성 실패 ({work_dir.name}): {e}")
+        return None
@@ -0,0 +1,301 @@
+"""
+파이프라인 단계별 계측
+- 단계마다 wall time, CPU time(프로세스 + 종료된 자식 프로세스), RSS(종료 시점/단계 중 최대), 디바이스 메모리 최대치,
+  처리량(오디오초/초) 기록
+- 작업 단위(JobMetrics) 결과는 응답에 포함, 전체 누적치는 Prometheus 텍스트 형식으로 노출
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import torch
+
+try:
+    import resource  # Unix 전용
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 단계 소요 시간 히스토그램 구간 (초)
+WALL_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# 단계 진행 중 RSS 샘플링 간격 (초)
+RSS_SAMPLE_INTERVAL = 0.2
+
+
+def _current_rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _cpu_seconds() -> float:
+    """
+    프로세스 CPU 시간 (모든 스레드 + 종료/회수된 자식 프로세스, user + sys)
+    - torch intra-op 스레드, 인코더 풀, ffmpeg 자식 프로세스 사용량 포함
+    """
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class _RssSampler:
+    """
+    진행 중인 단계들의 RSS 최대치를 주기적으로 갱신하는 공유 스레드 1개
+    (ru_maxrss는 프로세스 생애 최대치라 단계별 값으로 쓸 수 없음)
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active: Set['StageRecord'] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, record: 'StageRecord'):
+        record.peak_rss_bytes = _current_rss_bytes()
+        with self._lock:
+            self._active.add(record)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, record: 'StageRecord'):
+        with self._lock:
+            self._active.discard(record)
+        record.observe_rss(_current_rss_bytes())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            rss = _current_rss_bytes()
+            for record in active:
+                record.observe_rss(rss)
+            time.sleep(self.interval)
+
+
+_rss_sampler = _RssSampler()
+
+
+class StageRecord:
+    """단계 1회 실행 측정값 (audio_seconds는 단계 안에서 설정 가능)"""
+
+    def __init__(self, stage: str, origin: float):
+        self.stage = stage
+        self.origin = origin
+        self.audio_seconds = None
+        self.thread = threading.current_thread().name
+        self.start = self.end = None
+        self.wall_seconds = self.cpu_seconds = None
+        self.rss_bytes = self.peak_rss_bytes = self.peak_device_bytes = None
+        self.ok = True
+
+    def observe_rss(self, rss: Optional[int]):
+        if rss is not None:
+            self.peak_rss_bytes = rss if self.peak_rss_bytes is None else max(self.peak_rss_bytes, rss)
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """실시간 배수 (오디오 초 / 처리 초)"""
+        if self.audio_seconds and self.wall_seconds:
+            return self.audio_seconds / self.wall_seconds
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage,
+            'start': round(self.start - self.origin, 3),
+            'end': round(self.end - self.origin, 3),
+            'thread': self.thread,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'cpu_seconds': round(self.cpu_seconds, 3),
+            'rss_bytes': self.rss_bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'peak_device_bytes': self.peak_device_bytes,
+            'audio_seconds': self.audio_seconds,
+            'throughput': round(self.throughput, 3) if self.throughput else None,
+            'ok': self.ok
+        }
+
+
+class MetricsRegistry:
+    """전체 누적 단계 통계 (Prometheus 텍스트 렌더링)"""
+
+    def __init__(self, prefix: str = 'yts'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._jobs: Dict[str, int] = {}
+
+    def observe(self, record: StageRecord):
+        with self._lock:
+            s = self._stages.setdefault(record.stage, {
+                'count': 0, 'errors': 0, 'wall_sum': 0.0, 'cpu_sum': 0.0, 'audio_sum': 0.0,
+                'buckets': [0] * len(WALL_BUCKETS), 'peak_rss': 0, 'peak_device': 0
+            })
+            s['count'] += 1
+            s['errors'] += 0 if record.ok else 1
+            s['wall_sum'] += record.wall_seconds
+            s['cpu_sum'] += record.cpu_seconds
+            s['audio_sum'] += record.audio_seconds or 0.0
+            for i, le in enumerate(WALL_BUCKETS):
+                if record.wall_seconds <= le:
+                    s['buckets'][i] += 1
+            s['peak_rss'] = max(s['peak_rss'], record.peak_rss_bytes or 0)
+            s['peak_device'] = max(s['peak_device'], record.peak_device_bytes or 0)
+
+    def count_job(self, status: str):
+        with self._lock:
+            self._jobs[status] = self._jobs.get(status, 0) + 1
+
+    def render(self, extra: Optional[List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]] = None) -> str:
+        """
+        Prometheus text exposition format (0.0.4)
+        Args:
+            extra: 추가 지표 [(이름, 타입, 설명, [(라벨, 값), ...]), ...] (큐 길이, 캐시 적중 등 런타임 값)
+        """
+        p = self.prefix
+        lines = []
+
+        def header(name, mtype, help_text):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {mtype}")
+
+        def fmt_labels(labels):
+            if not labels:
+                return ''
+            inner = ','.join(f'{k}="{v}"' for k, v in labels.items())
+            return '{' + inner + '}'
+
+        with self._lock:
+            stages = {k: dict(v, buckets=list(v['buckets'])) for k, v in self._stages.items()}
+            jobs = dict(self._jobs)
+
+        header('stage_wall_seconds', 'histogram', 'Wall time per pipeline stage')
+        for stage, s in stages.items():
+            for le, count in zip(WALL_BUCKETS, s['buckets']):
+                lines.append(f'{p}_stage_wall_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{p}_stage_wall_seconds_bucket{{stage="{stage}",le="+Inf"}} {s["count"]}')
+            lines.append(f'{p}_stage_wall_seconds_sum{{stage="{stage}"}} {s["wall_sum"]:.6f}')
+            lines.append(f'{p}_stage_wall_seconds_count{{stage="{stage}"}} {s["count"]}')
+
+        header('stage_cpu_seconds_total', 'counter', 'Process CPU time (all threads and reaped child processes) during each pipeline stage')
+        for stage, s in stages.items():
+            lines.append(f'{p}_stage_cpu_seconds_total{{stage="{stage}"}} {s["cpu_sum"]:.6f}')
+
+        header('stage_audio_seconds_total', 'counter', 'Seconds of audio processed per pipeline stage')
+        for stage, s in stages.items():
+            lines.append(f'{p}_stage_audio_seconds_total{{stage="{stage}"}} {s["audio_sum"]:.3f}')
+
+        header('stage_errors_total', 'counter', 'Failed executions per pipeline stage')
+        for stage, s in stages.items():
+            lines.append(f'{p}_stage_errors_total{{stage="{stage}"}} {s["errors"]}')
+
+        header('stage_peak_rss_bytes', 'gauge', 'Highest process RSS sampled while a stage was running')
+        for stage, s in stages.items():
+            lines.append(f'{p}_stage_peak_rss_bytes{{stage="{stage}"}} {s["peak_rss"]}')
+
+        header('stage_peak_device_bytes', 'gauge', 'Highest CUDA memory allocated during a stage')
+        for stage, s in stages.items():
+            lines.append(f'{p}_stage_peak_device_bytes{{stage="{stage}"}} {s["peak_device"]}')
+
+        header('jobs_total', 'counter', 'Finished pipeline jobs by status')
+        for status, count in jobs.items():
+            lines.append(f'{p}_jobs_total{{status="{status}"}} {count}')
+
+        for name, mtype, help_text, samples in extra or []:
+            header(name, mtype, help_text)
+            for labels, value in samples:
+                lines.append(f'{p}_{name}{fmt_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# 프로세스 전역 레지스트리
+registry = MetricsRegistry()
+
+
+class JobMetrics:
+    """작업 1건의 단계별 측정 기록 (스레드 안전, 병렬 단계 포함)"""
+
+    def __init__(self):
+        self.origin = time.time()
+        self._records: List[StageRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: StageRecord):
+        with self._lock:
+            self._records.append(record)
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = sorted(self._records, key=lambda r: r.start)
+        return [r.to_dict() for r in records]
+
+    def summary(self) -> Dict[str, Any]:
+        """단계 이름별 합산 (응답 첨부용)"""
+        out = {}
+        for r in self.timeline():
+            s = out.setdefault(r['stage'], {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'audio_seconds': None,
+                                            'throughput': None, 'peak_rss_bytes': None, 'peak_device_bytes': None})
+            s['wall_seconds'] = round(s['wall_seconds'] + r['wall_seconds'], 3)
+            s['cpu_seconds'] = round(s['cpu_seconds'] + r['cpu_seconds'], 3)
+            for key in ('audio_seconds', 'throughput', 'peak_rss_bytes', 'peak_device_bytes'):
+                if r[key] is not None:
+                    s[key] = r[key] if s[key] is None else max(s[key], r[key])
+        out['total_wall_seconds'] = round(time.time() - self.origin, 3)
+        return out
+
+
+@contextmanager
+def measure(stage: str, job: Optional[JobMetrics] = None, device: Optional[str] = None):
+    """
+    단계 측정 컨텍스트
+    Usage:
+        with measure('separate', job_metrics, device='cuda') as m:
+            ...
+            m.audio_seconds = duration
+    - CPU time은 프로세스 전체 기준 (torch 스레드/인코더 풀/ffmpeg 자식 포함, 동시에 도는 다른 작업 사용량도 포함)
+    - RSS 최대치는 단계 진행 중 RSS_SAMPLE_INTERVAL마다 측정한 값 중 최대 (이 프로세스만, 자식 프로세스 제외)
+    - 디바이스 메모리 최대치는 디바이스 전역 값이라 동시 작업이 있으면 합산되어 보일 수 있음
+    """
+    record = StageRecord(stage, job.origin if job else time.time())
+    use_cuda = bool(device) and str(device).startswith('cuda') and torch.cuda.is_available()
+    if use_cuda:
+        torch.cuda.reset_peak_memory_stats()
+
+    record.start = time.time()
+    cpu_start = _cpu_seconds()
+    _rss_sampler.start(record)
+    try:
+        yield record
+    except Exception:
+        record.ok = False
+        raise
+    finally:
+        record.end = time.time()
+        record.wall_seconds = record.end - record.start
+        record.cpu_seconds = _cpu_seconds() - cpu_start
+        _rss_sampler.stop(record)
+        record.rss_bytes = _current_rss_bytes()
+        if use_cuda:
+            record.peak_device_bytes = torch.cuda.max_memory_allocated()
+
+        registry.observe(record)
+        if job is not None:
+            job.add(record)
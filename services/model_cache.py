@@ -0,0 +1,210 @@
+"""
+모델 레지스트리 (Warm Cache)
+- (모델 이름, 디바이스) 키로 로드된 모델을 재사용하여 작업마다 반복되는 로드 비용 제거
+- 유휴 TTL 초과 / 메모리 부족 시 사용 중이 아닌 모델부터 해제 (LRU)
+- 적중/실패 카운터 및 로드 시간 통계 제공
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    def __init__(self, model: Any, device: str, load_seconds: float):
+        self.model = model
+        self.device = device
+        self.load_seconds = load_seconds
+        self.last_used = time.time()
+        self.in_use = 0
+        self.hits = 0
+
+
+def is_memory_pressure(device: str, min_free_ratio: float) -> bool:
+    """디바이스의 여유 메모리 비율이 기준 미만인지 확인"""
+    if min_free_ratio <= 0:
+        return False
+    try:
+        if str(device).startswith('cuda'):
+            if not torch.cuda.is_available():
+                return False
+            free, total = torch.cuda.mem_get_info()
+        else:
+            page_size = os.sysconf('SC_PAGE_SIZE')
+            free = os.sysconf('SC_AVPHYS_PAGES') * page_size
+            total = os.sysconf('SC_PHYS_PAGES') * page_size
+        return total > 0 and free / total < min_free_ratio
+    except (AttributeError, ValueError, OSError, RuntimeError):
+        # sysconf 미지원 플랫폼(Windows 등)은 판단 불가 → 압박 없음으로 간주
+        return False
+
+
+class ModelCache:
+    """
+    스레드 안전한 모델 캐시
+    - acquire() 컨텍스트 동안에는 해당 모델이 해제되지 않음
+    """
+
+    def __init__(self, name: str, idle_ttl: float = 600, max_entries: int = 2,
+                 min_free_ratio: float = 0.1, sweep_interval: float = 30):
+        self.name = name
+        self.idle_ttl = idle_ttl
+        self.max_entries = max(1, max_entries)
+        self.min_free_ratio = min_free_ratio
+        self.sweep_interval = sweep_interval
+
+        self._entries: Dict[Hashable, _CacheEntry] = {}
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self._sweeper = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_load_seconds = 0.0
+
+    @contextmanager
+    def acquire(self, key: Hashable, loader: Callable[[], Any], device: str = 'cpu'):
+        """
+        캐시된 모델을 빌려 사용. 없으면 loader()로 로드 후 등록
+        Usage:
+            with cache.acquire(('htdemucs', 'cuda'), lambda: load(...), 'cuda') as model:
+                ...
+        """
+        entry = self._checkout(key, loader, device)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+
+    def _checkout(self, key: Hashable, loader: Callable[[], Any], device: str) -> _CacheEntry:
+        self._ensure_sweeper()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry.in_use += 1
+                entry.hits += 1
+                self.hits += 1
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # 같은 키를 동시에 두 번 로드하지 않도록 키 단위 잠금
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    entry.in_use += 1
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry
+
+            self._make_room(device)
+
+            logger.info(f"[ModelCache:{self.name}] 모델 로드: {key}")
+            start = time.time()
+            model = loader()
+            load_seconds = time.time() - start
+            logger.info(f"[ModelCache:{self.name}] 로드 완료: {key} ({load_seconds:.1f}s)")
+
+            with self._lock:
+                entry = _CacheEntry(model, device, load_seconds)
+                entry.in_use = 1
+                self._entries[key] = entry
+                self.misses += 1
+                self.total_load_seconds += load_seconds
+                return entry
+
+    def _make_room(self, device: str):
+        """엔트리 수 제한 / 메모리 압박 시 유휴 모델을 LRU 순으로 해제"""
+        while True:
+            with self._lock:
+                idle = [(k, e) for k, e in self._entries.items() if e.in_use == 0]
+                over_limit = len(self._entries) >= self.max_entries
+            if not idle:
+                return
+            if not over_limit and not is_memory_pressure(device, self.min_free_ratio):
+                return
+            idle.sort(key=lambda item: item[1].last_used)
+            self.evict(idle[0][0], reason='메모리 확보')
+
+    def evict(self, key: Hashable, reason: str = '') -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry.in_use > 0:
+                return False
+            del self._entries[key]
+            self.evictions += 1
+            device = entry.device
+            entry.model = None
+
+        logger.info(f"[ModelCache:{self.name}] 모델 해제: {key} ({reason})")
+        gc.collect()
+        if str(device).startswith('cuda') and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return True
+
+    def evict_idle(self):
+        """유휴 TTL 초과 모델 해제"""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._entries.items()
+                       if e.in_use == 0 and now - e.last_used > self.idle_ttl]
+        for key in expired:
+            self.evict(key, reason=f'유휴 {self.idle_ttl:.0f}s 초과')
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries.keys())
+        for key in keys:
+            self.evict(key, reason='전체 해제')
+
+    def _ensure_sweeper(self):
+        with self._lock:
+            if self._sweeper is not None or self.idle_ttl <= 0:
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name=f"model-cache-{self.name}", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"[ModelCache:{self.name}] 정리 실패: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'name': self.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / requests) if requests else 0.0,
+                'evictions': self.evictions,
+                'total_load_seconds': round(self.total_load_seconds, 3),
+                'idle_ttl': self.idle_ttl,
+                'entries': [
+                    {
+                        'key': str(k),
+                        'device': e.device,
+                        'in_use': e.in_use,
+                        'hits': e.hits,
+                        'load_seconds': round(e.load_seconds, 3),
+                        'idle_seconds': round(time.time() - e.last_used, 1)
+                    }
+                    for k, e in self._entries.items()
+                ]
+            }
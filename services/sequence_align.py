@@ -0,0 +1,141 @@
+"""
+토큰 시퀀스 정렬 (Whisper 단어 ↔ 원본 가사 토큰)
+- 편집 거리(일치 0, 치환/삽입/삭제 1) 최소 정렬을 Hirschberg 분할 정복으로 계산
+  · 메모리 O(m) (m: 원본 토큰 수), 시간 O(n·m) — 각 DP 행은 numpy로 한 번에 계산
+  · 삽입(같은 행 왼쪽에서 오는 경우)은 비용이 1로 같으므로 누적 최솟값으로 벡터화
+- 앞뒤 공통 구간은 DP 없이 바로 대응 (대부분의 곡은 일부 토큰만 어긋남)
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 이 크기 이하 블록은 전체 행렬로 역추적 (분할 재귀 비용이 더 큼)
+FULL_MATRIX_CELLS = 4096
+
+_NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def normalize_token(text: str) -> str:
+    """비교용 정규화 (문장부호/공백 제거, 소문자)"""
+    return _NON_WORD.sub('', text or '').lower()
+
+
+def _encode(a: Sequence[str], b: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """문자열 토큰 → 정수 ID (numpy 비교용)"""
+    vocab: Dict[str, int] = {}
+    encode = lambda seq: np.array([vocab.setdefault(t, len(vocab)) for t in seq], dtype=np.int64)
+    return encode(a), encode(b)
+
+
+def _last_row(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a 전체와 b의 각 접두어 사이 편집 거리 (DP 마지막 행, 메모리 O(len(b)))"""
+    m = len(b)
+    cols = np.arange(m + 1, dtype=np.int64)
+    row = cols.copy()
+    for i, token in enumerate(a, start=1):
+        diag = row[:-1] + (b != token)
+        cur = np.empty_like(row)
+        cur[0] = i
+        cur[1:] = np.minimum(row[1:] + 1, diag)
+        # cur[j] = min(cur[j], cur[j-1] + 1) 을 누적 최솟값으로 계산
+        row = np.minimum.accumulate(cur - cols) + cols
+    return row
+
+
+def _full_alignment(a: np.ndarray, b: np.ndarray, a0: int, b0: int, out: List[Tuple[Optional[int], Optional[int]]]):
+    """작은 블록: 전체 DP 행렬 후 역추적"""
+    a, b = a.tolist(), b.tolist()
+    n, m = len(a), len(b)
+    dp = [list(range(m + 1))]
+    for i in range(1, n + 1):
+        prev, row = dp[-1], [i] * (m + 1)
+        for j in range(1, m + 1):
+            row[j] = min(prev[j - 1] + (a[i - 1] != b[j - 1]), prev[j] + 1, row[j - 1] + 1)
+        dp.append(row)
+
+    pairs = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and dp[i][j] == dp[i - 1][j - 1] + (a[i - 1] != b[j - 1]):
+            pairs.append((a0 + i - 1, b0 + j - 1))
+            i, j = i - 1, j - 1
+        elif i > 0 and dp[i][j] == dp[i - 1][j] + 1:
+            pairs.append((a0 + i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, b0 + j - 1))
+            j -= 1
+    out.extend(reversed(pairs))
+
+
+def _hirschberg(a: np.ndarray, b: np.ndarray, a0: int, b0: int, out: List[Tuple[Optional[int], Optional[int]]]):
+    n, m = len(a), len(b)
+    if n == 0:
+        out.extend((None, b0 + j) for j in range(m))
+        return
+    if m == 0:
+        out.extend((a0 + i, None) for i in range(n))
+        return
+    if n == 1 or m == 1 or n * m <= FULL_MATRIX_CELLS:
+        _full_alignment(a, b, a0, b0, out)
+        return
+
+    mid = n // 2
+    left = _last_row(a[:mid], b)
+    right = _last_row(a[mid:][::-1], b[::-1])[::-1]
+    split = int(np.argmin(left + right))
+    _hirschberg(a[:mid], b[:split], a0, b0, out)
+    _hirschberg(a[mid:], b[split:], a0 + mid, b0 + split, out)
+
+
+def align_sequences(a: Sequence[str], b: Sequence[str]) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    편집 거리 최소 정렬
+    Returns: (a 인덱스 | None, b 인덱스 | None) 쌍 목록 (순서 유지, None은 삽입/삭제)
+    """
+    n, m = len(a), len(b)
+    # 앞뒤 공통 구간
+    head = 0
+    while head < min(n, m) and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < min(n, m) - head and a[n - 1 - tail] == b[m - 1 - tail]:
+        tail += 1
+
+    out: List[Tuple[Optional[int], Optional[int]]] = [(i, i) for i in range(head)]
+    ea, eb = _encode(a[head:n - tail], b[head:m - tail])
+    _hirschberg(ea, eb, head, head, out)
+    out.extend((n - tail + k, m - tail + k) for k in range(tail))
+    return out
+
+
+def map_tokens(words: Sequence[str], tokens: Sequence[str]) -> Tuple[List[Optional[int]], Dict[str, Any]]:
+    """
+    Whisper 단어 → 원본 토큰 인덱스 대응
+    Returns:
+        mapping: 단어별 원본 토큰 인덱스 (대응 없음은 None)
+        stats: {'matched': 정확히 일치, 'substituted': 위치만 대응, 'coverage': 일치 / 원본 토큰 수, ...}
+    """
+    norm_words = [normalize_token(w) for w in words]
+    norm_tokens = [normalize_token(t) for t in tokens]
+    mapping: List[Optional[int]] = [None] * len(words)
+    matched = substituted = 0
+    for i, j in align_sequences(norm_words, norm_tokens):
+        if i is None or j is None:
+            continue
+        mapping[i] = j
+        if norm_words[i] == norm_tokens[j]:
+            matched += 1
+        else:
+            substituted += 1
+
+    stats = {
+        'words': len(words),
+        'tokens': len(tokens),
+        'matched': matched,
+        'substituted': substituted,
+        'coverage': round(matched / len(tokens), 4) if tokens else 0.0
+    }
+    return mapping, stats
@@ -0,0 +1,177 @@
+"""
+분리 결과(원본 PCM) 저장소
+- 트랙별 파형을 디코딩 없이 다시 읽기 위한 단일 파일 (MP3는 전송용으로만 사용)
+- 고정 헤더(샘플레이트/채널/길이/트랙 이름) + (트랙, 채널, 샘플) 순서의 연속 배열
+- np.memmap으로 열어 임의 시간 구간을 복사 없이 읽음 (float32 저장 시 완전 zero-copy,
+  int16 저장 시 요청 구간만 float로 변환)
+
+파일 구조 (little-endian):
+    magic(8) version(u16) dtype(u8) channels(u16) stems(u16) samplerate(u32) length(u64) scale(f32) names_len(u32)
+    names(JSON, UTF-8) ... 데이터 시작 위치는 4096 바이트 경계로 정렬
+"""
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+MAGIC = b'YTSTEMS1'
+VERSION = 1
+HEADER = struct.Struct('<8sHBHHIQfI')
+DATA_ALIGN = 4096
+
+DTYPES = {1: np.dtype('<i2'), 2: np.dtype('<f4')}
+DTYPE_CODES = {'int16': 1, 'float32': 2}
+
+
+class StemStore:
+    FILE_NAME = 'stems.bin'
+
+    def __init__(self, path):
+        """저장된 파일을 읽기 전용 memmap으로 열기"""
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            head = f.read(HEADER.size)
+            if len(head) < HEADER.size:
+                raise ValueError(f"손상된 트랙 저장소: {self.path}")
+            magic, version, dtype_code, channels, stems, samplerate, length, scale, names_len = HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION or dtype_code not in DTYPES:
+                raise ValueError(f"지원하지 않는 트랙 저장소 형식: {self.path}")
+            self.names: List[str] = json.loads(f.read(names_len).decode('utf-8'))
+
+        self.samplerate = samplerate
+        self.channels = channels
+        self.length = length
+        self.scale = scale
+        self.dtype = DTYPES[dtype_code]
+        offset = _data_offset(names_len)
+        self._data = np.memmap(self.path, dtype=self.dtype, mode='r', offset=offset,
+                               shape=(stems, channels, length))
+
+    @classmethod
+    def write(cls, path, sources: np.ndarray, names: List[str], samplerate: int,
+              dtype: str = 'int16') -> 'StemStore':
+        """
+        (stems, channels, samples) float 배열 저장 (임시 파일 → 교체로 원자적 기록)
+        Args:
+            dtype: 'int16' (피크 기준 스케일 보존, 절반 크기) 또는 'float32' (무손실)
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sources = np.asarray(sources, dtype=np.float32)
+        if sources.ndim != 3 or sources.shape[0] != len(names):
+            raise ValueError(f"트랙 배열 형태 오류: {sources.shape} / {names}")
+        stems, channels, length = sources.shape
+
+        if dtype == 'int16':
+            scale = max(float(np.abs(sources).max()), 1.0)
+            data = np.round(sources / scale * 32767).clip(-32768, 32767).astype('<i2')
+        elif dtype == 'float32':
+            scale = 1.0
+            data = sources.astype('<f4', copy=False)
+        else:
+            raise ValueError(f"지원하지 않는 dtype: {dtype}")
+
+        _write_raw(path, data, names, samplerate, DTYPE_CODES[dtype], scale)
+        return cls(path)
+
+    @property
+    def duration(self) -> float:
+        return self.length / self.samplerate if self.samplerate else 0.0
+
+    def _index(self, name: str) -> int:
+        try:
+            return self.names.index(name)
+        except ValueError:
+            raise KeyError(f"저장소에 없는 트랙: {name} ({self.names})")
+
+    def raw(self, name: str) -> np.ndarray:
+        """트랙 전체 memmap 뷰 (channels, samples), 저장 dtype 그대로"""
+        return self._data[self._index(name)]
+
+    def read(self, name: str, start: float = 0.0, end: Optional[float] = None) -> np.ndarray:
+        """
+        시간 구간 [start, end) 초를 (channels, samples) float32로 반환
+        - float32 저장소는 memmap 뷰 그대로 (복사 없음, 읽기 전용)
+        """
+        first = max(0, int(round(start * self.samplerate)))
+        last = self.length if end is None else min(self.length, int(round(end * self.samplerate)))
+        window = self._data[self._index(name), :, first:max(first, last)]
+        if self.dtype == DTYPES[2]:
+            return window
+        return window.astype(np.float32) * (self.scale / 32767)
+
+    def read_all(self) -> np.ndarray:
+        """(stems, channels, samples) float32 전체 (복사)"""
+        if self.dtype == DTYPES[2]:
+            return np.array(self._data)
+        return self._data.astype(np.float32) * (self.scale / 32767)
+
+    def close(self):
+        """memmap 참조 해제 (반환된 뷰가 남아 있으면 해당 뷰가 사라질 때 매핑 해제)"""
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _write_raw(path: Path, data: np.ndarray, names: List[str], samplerate: int, dtype_code: int, scale: float):
+    """저장 dtype으로 변환된 (stems, channels, samples) 배열 기록 (임시 파일 → 교체)"""
+    stems, channels, length = data.shape
+    names_bytes = json.dumps(list(names)).encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, dtype_code, channels, stems,
+                         int(samplerate), length, scale, len(names_bytes))
+    offset = _data_offset(len(names_bytes))
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(names_bytes)
+        f.write(b'\0' * (offset - len(header) - len(names_bytes)))
+        f.write(np.ascontiguousarray(data).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _data_offset(names_len: int) -> int:
+    used = HEADER.size + names_len
+    return (used + DATA_ALIGN - 1) // DATA_ALIGN * DATA_ALIGN
+
+
+def open_stem_store(separation_dir) -> Optional[StemStore]:
+    """separated/ 폴더의 저장소 열기 (없거나 손상되었으면 None)"""
+    path = Path(separation_dir) / StemStore.FILE_NAME
+    if not path.is_file():
+        return None
+    try:
+        return StemStore(path)
+    except (OSError, ValueError):
+        return None
+
+
+def keep_stems(path, names: List[str]) -> bool:
+    """
+    저장소에서 지정한 트랙만 남기고 다시 기록 (저장 dtype/스케일 그대로, 재양자화 없음)
+    Returns: 남길 트랙이 하나도 없어 파일을 삭제했으면 False
+    """
+    path = Path(path)
+    with StemStore(path) as store:
+        kept = [name for name in store.names if name in names]
+        if kept == store.names:
+            return True
+        # 교체 전에 매핑을 놓도록 남길 트랙은 메모리로 복사
+        data = np.stack([store.raw(name) for name in kept]) if kept else None
+        samplerate, scale = store.samplerate, store.scale
+        dtype_code = DTYPE_CODES['float32' if store.dtype == DTYPES[2] else 'int16']
+    if data is None:
+        path.unlink()
+        return False
+    _write_raw(path, data, kept, samplerate, dtype_code, scale)
+    return True
@@ -0,0 +1,98 @@
+"""
+보컬 구간 검출 (에너지 기반 VAD)
+- 분리된 보컬 트랙은 반주가 제거되어 있으므로 프레임 RMS 에너지만으로 충분히 구분됨
+- 곡마다 음량이 다르므로 임계값은 상위 에너지(percentile) 기준 상대 dB
+- 짧은 쉼은 합치고 짧은 잡음 구간은 버린 뒤 앞뒤 여유(pad)를 둠
+- 가사(줄/단어)를 구간 길이에 비례하여 나눔 (구간별 정렬 입력)
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+Region = Tuple[float, float]
+
+
+def frame_energy_db(audio: np.ndarray, samplerate: int, frame_seconds: float = 0.05) -> np.ndarray:
+    """(samples,) 또는 (channels, samples) 파형 → 프레임별 RMS (dB)"""
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim == 2:
+        audio = audio.mean(axis=0)
+    hop = max(1, int(samplerate * frame_seconds))
+    frames = len(audio) // hop
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    power = np.square(audio[:frames * hop].reshape(frames, hop), dtype=np.float32).mean(axis=1)
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def detect_vocal_regions(audio: np.ndarray, samplerate: int, frame_seconds: float = 0.05,
+                         range_db: float = 35.0, floor_db: float = -60.0, min_silence: float = 1.5,
+                         min_region: float = 0.5, pad: float = 0.3) -> List[Region]:
+    """
+    보컬 활성 구간 [(start, end), ...] (초, 시간 순)
+    Args:
+        range_db: 상위 5% 프레임 에너지보다 이만큼 낮은 프레임까지 활성으로 인정
+        floor_db: 절대 하한 (이보다 작은 프레임은 항상 무음)
+        min_silence: 이보다 짧은 쉼은 앞뒤 구간과 합침 (초)
+        min_region: 합친 뒤에도 이보다 짧은 구간은 버림 (초)
+        pad: 구간 앞뒤 여유 (초, 자음/숨소리 보존)
+    """
+    energy = frame_energy_db(audio, samplerate, frame_seconds)
+    if energy.size == 0:
+        return []
+    threshold = max(float(np.percentile(energy, 95)) - range_db, floor_db)
+    active = energy > threshold
+    if not active.any():
+        return []
+
+    # 활성 프레임의 연속 구간 (시작/끝 인덱스)
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    regions: List[List[float]] = []
+    for s, e in zip((starts * frame_seconds).tolist(), (ends * frame_seconds).tolist()):
+        if regions and s - regions[-1][1] < min_silence:
+            regions[-1][1] = e
+        else:
+            regions.append([s, e])
+
+    duration = len(energy) * frame_seconds
+    padded: List[Region] = []
+    for s, e in regions:
+        if e - s < min_region:
+            continue
+        s, e = max(0.0, s - pad), min(duration, e + pad)
+        if padded and s <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], e)
+        else:
+            padded.append((s, e))
+    return padded
+
+
+def split_by_regions(weights: Sequence[float], regions: Sequence[Region]) -> List[Tuple[int, int]]:
+    """
+    단위(줄/단어) 목록을 구간 길이에 비례하여 연속으로 나눔
+    - 각 단위의 누적 무게 중앙이 속하는 구간에 배정 (순서 유지)
+    Returns: 구간별 [first, last) 단위 인덱스 범위 (단위가 없는 구간은 first == last)
+    """
+    durations = np.array([e - s for s, e in regions], dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(regions) == 0:
+        return []
+    if weights.size == 0 or weights.sum() <= 0 or durations.sum() <= 0:
+        return [(0, 0)] * (len(regions) - 1) + [(0, int(weights.size))]
+
+    # 구간 경계를 단위 무게 축으로 환산
+    bounds = np.cumsum(durations) / durations.sum() * weights.sum()
+    centers = np.cumsum(weights) - weights / 2
+    assigned = np.minimum(np.searchsorted(bounds, centers, side='right'), len(regions) - 1)
+
+    ranges = []
+    first = 0
+    for k in range(len(regions)):
+        last = first + int(np.count_nonzero(assigned == k))
+        ranges.append((first, last))
+        first = last
+    return ranges
@@ -4,13 +4,15 @@ VRAM 메모리 안전성 보장 & 스마트 캐싱 & 로직 통합
 """
 
 import logging
-import gc
 import torch
-import time
-import subprocess
+import numpy as np
 import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, Tuple
 
 # 로컬 모듈
 from download import YouTubeDownloader
@@ -18,30 +20,146 @@ from demucs_processor import DemucsProcessor
 from extract_lyrics import BugsLyricsCrawler
 from align_force import align_lyrics
 from services.text_utils import TextCleaner
+from services.fingerprint import FingerprintIndex, compute_fingerprint
+from services.cache_index import CacheIndex
+from services.checkpoint import StageCheckpoint, STAGES, atomic_write_text
+from services.metrics import JobMetrics, measure, registry as metrics_registry
+from services.stem_store import StemStore, keep_stems, open_stem_store
+from services.lyrics_format import ensure_compact, parse_tags, write_compact
+from config import (
+    FINGERPRINT_ENABLED, FINGERPRINT_INDEX_PATH, FINGERPRINT_MAX_OFFSET_SECONDS, FINGERPRINT_DURATION_TOLERANCE,
+    CACHE_JOB_RESERVE_MB, STAGE_MAX_RETRIES, STEM_STORE_KEEP, LYRICS_INLINE_LRC
+)
 
 logger = logging.getLogger(__name__)
 
+class _InflightRun:
+    """진행 중인 video_id 처리 1건 (후속 요청자는 여기에 합류)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.subscribers = []
+        self.last_progress = None
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback: Optional[Callable]):
+        with self.lock:
+            if callback:
+                self.subscribers.append(callback)
+            return self.last_progress
+
+    def broadcast(self, progress, message):
+        with self.lock:
+            self.last_progress = (progress, message)
+            subscribers = list(self.subscribers)
+        for cb in subscribers:
+            try:
+                cb(progress, message)
+            except Exception as e:
+                logger.warning(f"[Workflow] 진행률 전달 실패: {e}")
+
 class TrackSeparationWorkflow:
-    def __init__(self, download_dir: str):
+    # 클라이언트 트랙 이름 -> Demucs 출력 이름 (스트리밍 플레이리스트 경로용)
+    STREAM_TRACKS = {'vocal': 'vocals', 'drum': 'drums', 'bass': 'bass', 'other': 'other'}
+
+    def __init__(self, download_dir: str, cache_manager=None, cache_index: Optional[CacheIndex] = None,
+                 downloader: Optional[YouTubeDownloader] = None, fingerprint_index_path: Optional[Path] = None):
+        """
+        fingerprint_index_path: 오디오 지문 색인 파일 (None이면 FINGERPRINT_INDEX_PATH, 벤치마크 등은 별도 경로 지정)
+        """
         self.download_dir = Path(download_dir)
-        self.downloader = YouTubeDownloader(str(download_dir))
+        self.cache_manager = cache_manager
+        self.cache_index = cache_index or CacheIndex(download_dir)
+        # 정보 조회(수락 제어)와 같은 인스턴스를 공유하면 영상 페이지 추출 결과를 재사용
+        self.downloader = downloader or YouTubeDownloader(str(download_dir))
         self.lyrics_crawler = BugsLyricsCrawler()
         self.text_cleaner = TextCleaner()
+        self.aligner = align_lyrics
         self.MAX_FILE_SIZE_MB = 30
         self.REQUIRE_MANUAL_SUBTITLES = True 
+        self.fingerprints = FingerprintIndex(
+            fingerprint_index_path or FINGERPRINT_INDEX_PATH,
+            max_offset_seconds=FINGERPRINT_MAX_OFFSET_SECONDS,
+            duration_tolerance=FINGERPRINT_DURATION_TOLERANCE
+        ) if FINGERPRINT_ENABLED else None
+        if self.cache_manager and self.fingerprints:
+            self.cache_manager.on_evict.append(self.fingerprints.remove)
+
+        # 체크포인트 기록 등 보조 I/O용
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='workflow-io')
+        # 가사/자막 수집 (네트워크 대기 위주, 분리와 동시에 실행)
+        self._text_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='workflow-text')
+
+        # video_id별 진행 중 작업 (single-flight)
+        self._inflight: Dict[str, _InflightRun] = {}
+        self._inflight_lock = threading.Lock()
 
     def process_video(
         self,
         video_id: str,
         model: str = 'htdemucs',
         meta: Optional[Dict[str, Any]] = None,
-        progress_callback: Optional[Callable] = None
+        progress_callback: Optional[Callable] = None,
+        streaming: bool = False,
+        chunk_callback: Optional[Callable] = None,
+        overlap: Optional[float] = None
     ) -> Dict[str, Any]:
+        """
+        overlap: 분할 구간 겹침 비율 (수락 제어가 하향 처리할 때 지정, None이면 기본값)
+        streaming=True 이면 구간 단위로 분리하여 완료된 구간마다 chunk_callback 호출 (HLS 재생 가능)
+        같은 video_id가 이미 처리 중이면 새로 실행하지 않고 해당 작업에 합류하여
+        동일한 진행률 스트림과 결과를 받음 (중복 다운로드/분리 및 파일 경합 방지)
+        """
+        with self._inflight_lock:
+            run = self._inflight.get(video_id)
+            is_owner = run is None
+            if is_owner:
+                run = _InflightRun()
+                self._inflight[video_id] = run
+        last_progress = run.subscribe(progress_callback)
+
+        if not is_owner:
+            logger.info(f"[Workflow] 진행 중인 작업에 합류: {video_id}")
+            if progress_callback and last_progress:
+                progress_callback(*last_progress)
+            run.done.wait()
+            return {**run.result, 'coalesced': True}
+
+        result = {'success': False, 'video_id': video_id, 'error': '처리 중단됨'}
+        try:
+            if self.cache_manager:
+                with self.cache_manager.pin(video_id):
+                    result = self._run_pipeline(video_id, model, meta, run.broadcast, streaming, chunk_callback, overlap)
+            else:
+                result = self._run_pipeline(video_id, model, meta, run.broadcast, streaming, chunk_callback, overlap)
+            return result
+        finally:
+            metrics_registry.count_job('cached' if result.get('cached') else 'success' if result.get('success') else 'failed')
+            with self._inflight_lock:
+                run.result = result
+                self._inflight.pop(video_id, None)
+            run.done.set()
+
+    def _run_pipeline(
+        self,
+        video_id: str,
+        model: str,
+        meta: Optional[Dict[str, Any]],
+        progress_callback: Callable,
+        streaming: bool = False,
+        chunk_callback: Optional[Callable] = None,
+        overlap: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        단계별 실행: download → separate → encode → text → align
+        각 단계는 완료 표시(.stages/*.done)를 남기며, 재시도 시 첫 미완료 단계부터 재개
+        """
         
         logger.info(f"\n{'='*70}\n[Workflow] 영상 처리: {video_id}\n{'='*70}")
 
         # [0단계] 캐시 확인 (JSON 우선)
-        cached = self._check_cache(video_id)
+        cached = self.get_cached_result(video_id)
         if cached:
             if progress_callback: progress_callback(100, '캐시 데이터 로드 완료')
             return cached
@@ -57,43 +175,58 @@ class TrackSeparationWorkflow:
             'error': None
         }
 
-        demucs_model = None
-
+        job_metrics = JobMetrics()
+        text_future = None
         try:
             work_dir = self.download_dir / video_id
             work_dir.mkdir(parents=True, exist_ok=True)
+            checkpoint = StageCheckpoint(work_dir, max_retries=STAGE_MAX_RETRIES)
+            separation_dir = work_dir / 'separated'
+            processor = DemucsProcessor(str(self.download_dir))
+            processor.job_metrics = job_metrics
 
-            # [1단계] 오디오 다운로드
-            if progress_callback: progress_callback(5, '오디오 다운로드 중...')
-            audio_file = self.downloader.download(video_id, output_dir=work_dir)
-            if not audio_file: raise Exception("오디오 다운로드 실패")
+            resumed = [s for s in STAGES if checkpoint.is_done(s)]
+            if resumed:
+                logger.info(f"[Workflow] 체크포인트에서 재개 (완료: {resumed})")
+                result['resumed_stages'] = resumed
 
-            file_size_mb = audio_file.stat().st_size / (1024 * 1024)
-            if file_size_mb > self.MAX_FILE_SIZE_MB:
-                try: audio_file.unlink()
-                except: pass
-                raise Exception(f"파일 크기 초과 ({file_size_mb:.1f}MB > 30MB)")
+            # [4단계] 텍스트 확보는 오디오와 무관하므로 다운로드/분리와 동시에 시작 (네트워크 지연 은닉)
+            def run_text_stage():
+                with measure('text', job_metrics):
+                    return self._stage_text(checkpoint, video_id, work_dir, meta)
+            text_future = self._text_pool.submit(run_text_stage)
 
-            # [2단계] Demucs 분리 (VRAM 관리)
-            if progress_callback: progress_callback(20, 'AI 오디오 분리 및 MP3 변환 중 (GPU)...')
-            
-            processor = DemucsProcessor(str(self.download_dir))
-            separation_dir = work_dir / 'separated'
-            
-            # 모델 로드 및 처리
-            demucs_model = processor.load_model(model)
-            success = processor.process_with_model(demucs_model, audio_file, separation_dir, progress_callback)
-            
-            # 모델 즉시 해제
-            del demucs_model
-            demucs_model = None
-            gc.collect()
-            torch.cuda.empty_cache()
-            time.sleep(2)
+            # 변환 완료 표시가 있어도 트랙이 빠져 있으면 해당 단계부터 다시 수행
+            if checkpoint.is_done('encode') and len(processor.get_separated_tracks(str(separation_dir))) < len(self.STREAM_TRACKS):
+                checkpoint.invalidate('encode')
 
-            if not success: raise Exception("Demucs 분리 실패")
+            # 기록 도중 디스크 부족으로 실패하지 않도록 미리 공간 확보
+            if self.cache_manager and not checkpoint.is_done('encode'):
+                self.cache_manager.enforce(reserve_bytes=int(CACHE_JOB_RESERVE_MB * 1024 * 1024))
 
-            # [3단계] 트랙 정보 수집
+            # [1~3단계] 다운로드 → 분리 → MP3 변환
+            # 이번 실행에서 분리한 보컬 파형 (정렬 단계에 MP3 대신 직접 전달)
+            vocal_audio = None
+            if not checkpoint.is_done('encode'):
+                # 분리 저장소가 남아 있으면 원본 오디오(input.*)를 읽는 단계가 모두 끝났으므로 다운로드 생략
+                # (drop_input으로 원본이 지워진 작업도 재다운로드 없이 변환부터 재개)
+                if checkpoint.is_done('separate'):
+                    store = self._checkpoint_store(separation_dir)
+                    if store is None:
+                        checkpoint.invalidate('separate')
+                    else:
+                        store.close()
+                audio_file = None
+                if checkpoint.is_needed('download'):
+                    with measure('download', job_metrics):
+                        audio_file = self._stage_download(checkpoint, video_id, work_dir, progress_callback)
+                with measure('separate_encode', job_metrics):
+                    vocal_audio = self._stage_separate_encode(
+                        checkpoint, processor, model, audio_file, video_id, separation_dir,
+                        result, progress_callback, streaming, chunk_callback, overlap
+                    )
+
+            # 트랙 정보 수집
             tracks = processor.get_separated_tracks(str(separation_dir))
             if not tracks: raise Exception("분리된 트랙 없음")
             
@@ -103,125 +236,403 @@ class TrackSeparationWorkflow:
                 info['path'] = f"/downloads/{video_id}/{t}.mp3"
             result['tracks'] = tracks
 
-            # [4단계] 텍스트 리소스 확보
-            lyrics_text = None
-            source_type = meta.get('sourceType', 'general')
-
-            if progress_callback: progress_callback(70, '자막/가사 검색 중...')
-
-            # 4-A. 공식 음원 크롤링
-            if source_type == 'official' and meta.get('title'):
-                try:
-                    res = self.lyrics_crawler.fetch_lyrics(meta['title'], meta['artist'], meta['album'])
-                    if res: lyrics_text = self.text_cleaner.clean_text(res['lyrics'])
-                except Exception as e:
-                    logger.warning(f"[Text] 크롤링 실패: {e}")
-
-            # 4-B. 자막 다운로드
-            if not lyrics_text:
-                try:
-                    sub_file = self._download_subtitles(video_id, work_dir)
-                    if sub_file:
-                        lyrics_text = self.text_cleaner.parse_vtt_to_text(sub_file)
-                except Exception as e:
-                    logger.warning(f"[Text] 자막 실패: {e}")
+            # 텍스트 단계 합류 (대부분 이미 끝나 있음)
+            if not text_future.done():
+                if progress_callback: progress_callback(70, '자막/가사 검색 중...')
+            with measure('text_wait', job_metrics):
+                lyrics_text = text_future.result()
 
             # [5단계] Whisper 정렬 (JSON 출력)
-            if lyrics_text and len(lyrics_text) > 10 and vocal_absolute_path:
-                if progress_callback: progress_callback(85, 'AI 정밀 정렬 중 (Whisper)...')
-                try:
-                    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-                    
-                    # align_lyrics가 이제 JSON 문자열을 반환한다고 가정
-                    lyrics_json_str = align_lyrics(vocal_absolute_path, lyrics_text, device=device)
-                    
-                    if lyrics_json_str:
-                        # JSON 파일로 저장
-                        (work_dir / 'aligned.json').write_text(lyrics_json_str, encoding='utf-8')
-                        
-                        # 결과에 포함 (변수명은 호환성을 위해 lyrics_lrc 유지)
-                        result['lyrics_lrc'] = lyrics_json_str
-                        logger.info("[Align] 정렬 및 JSON 저장 완료")
-                except Exception as e:
-                    logger.error(f"[Align] 정렬 실패: {e}")
+            with measure('align', job_metrics, processor.device):
+                self._stage_align(checkpoint, work_dir, lyrics_text, vocal_absolute_path, result, progress_callback,
+                                  vocal_audio)
             
             result['success'] = True
+            # 최종 MP3가 있으므로 점진적 재생용 HLS 사본은 삭제 (용량 집계 전에)
+            self._drop_stream(separation_dir)
+            if self.cache_manager:
+                if self.cache_manager.drop_input:
+                    self.cache_manager.drop_input_audio(video_id)
+                self.cache_manager.refresh(video_id)
+            self.cache_index.update(video_id)
+            # 색인의 버전 포함 경로(?v=내용해시)로 응답 (브라우저 immutable 캐시용)
+            result['tracks'] = self.cache_index.get_tracks(video_id) or result['tracks']
+            self._attach_lyrics_url(video_id, result)
+            result['timeline'] = job_metrics.timeline()
+            result['metrics'] = job_metrics.summary()
             if progress_callback: progress_callback(100, '완료!')
             return result
 
         except Exception as e:
             logger.error(f"Workflow Error: {e}")
+            # 가사/자막 단계가 아직 파일/체크포인트를 쓰는 중이면 끝날 때까지 대기 (재시도와 겹치지 않도록)
+            if text_future is not None and not text_future.cancel():
+                try:
+                    text_future.result()
+                except Exception as text_error:
+                    logger.warning(f"[Text] 실패 작업의 텍스트 단계 오류: {text_error}")
+            # 재시도 시 처음부터 다시 인코딩하므로 중간 HLS 세그먼트는 남기지 않음
+            self._drop_stream(self.download_dir / video_id / 'separated')
+            # 실패 작업의 폴더(원본/분리 체크포인트/부분 트랙)도 용량 예산과 정리 대상에 포함
+            if self.cache_manager:
+                self.cache_manager.refresh(video_id)
             result['error'] = str(e)
+            result['timeline'] = job_metrics.timeline()
+            result['metrics'] = job_metrics.summary()
             if progress_callback: progress_callback(0, f"Error: {e}")
             return result
-            
-        finally:
-            if demucs_model: del demucs_model
-            gc.collect()
-            torch.cuda.empty_cache()
 
-    def _check_cache(self, video_id: str) -> Optional[Dict]:
-        """캐시 확인 (JSON -> LRC 순)"""
-        work_dir = self.download_dir / video_id
-        separation_dir = work_dir / 'separated'
-        
-        processor = DemucsProcessor(str(self.download_dir))
-        tracks = processor.get_separated_tracks(str(separation_dir))
-        
-        required = ['vocal', 'drum', 'bass', 'other']
-        if not all(k in tracks for k in required):
+    def _stage_download(self, checkpoint: StageCheckpoint, video_id: str, work_dir: Path,
+                        progress_callback: Optional[Callable]) -> Path:
+        """[1단계] 오디오 다운로드"""
+        done = checkpoint.get('download')
+        if done and (work_dir / done['file']).exists():
+            return work_dir / done['file']
+        checkpoint.invalidate('download')
+
+        if progress_callback: progress_callback(5, '오디오 다운로드 중...')
+        audio_file = self.downloader.download(video_id, output_dir=work_dir)
+        if not audio_file: raise Exception("오디오 다운로드 실패")
+
+        file_size_mb = audio_file.stat().st_size / (1024 * 1024)
+        if file_size_mb > self.MAX_FILE_SIZE_MB:
+            try: audio_file.unlink()
+            except: pass
+            raise Exception(f"파일 크기 초과 ({file_size_mb:.1f}MB > 30MB)")
+
+        checkpoint.mark_done('download', {'file': audio_file.name, 'size_mb': round(file_size_mb, 2)})
+        return audio_file
+
+    def _stage_separate_encode(
+        self,
+        checkpoint: StageCheckpoint,
+        processor: DemucsProcessor,
+        model: str,
+        audio_file: Optional[Path],
+        video_id: str,
+        separation_dir: Path,
+        result: Dict[str, Any],
+        progress_callback: Optional[Callable],
+        streaming: bool,
+        chunk_callback: Optional[Callable],
+        overlap: Optional[float] = None
+    ) -> Optional[Tuple[torch.Tensor, int]]:
+        """
+        [2단계] Demucs 분리 + [3단계] MP3 변환
+        Returns: 메모리에 있는 보컬 (모노 파형, 샘플레이트), 분리 결과를 메모리에 두지 않은 경로(재사용/스트리밍)는 None
+        - 분리 결과는 StemStore(separated/stems.bin)로 저장 (인코딩과 동시 진행)
+          · 분리 단계 체크포인트 겸 후처리(정렬/분석)용 원본 PCM (변환 후에는 STEM_STORE_KEEP 트랙만 보관)
+        - 변환 단계에서 실패하면 재시도 시 Demucs를 다시 돌리지 않고 저장소에서 재개 (audio_file은 None)
+        """
+        store_path = separation_dir / StemStore.FILE_NAME
+        sources = None
+        track_names = None
+        samplerate = None
+
+        store = self._checkpoint_store(separation_dir) if checkpoint.is_done('separate') else None
+        if store is not None:
+            if progress_callback: progress_callback(55, '분리 체크포인트에서 재개...')
+            sources = processor.load_stem_store(store)
+            track_names, samplerate = store.names, store.samplerate
+            store.close()
+        else:
+            checkpoint.invalidate('separate')
+            if audio_file is None:
+                raise Exception("분리 체크포인트를 읽을 수 없음 (다음 시도에서 다시 분리)")
+
+        if sources is None:
+            # 오디오 지문으로 동일 음원의 기존 분리 결과 확인
+            fingerprint = None
+            if self.fingerprints is not None:
+                try:
+                    fingerprint = compute_fingerprint(audio_file)
+                    reused_from = self._reuse_stems(fingerprint, video_id, separation_dir) if fingerprint is not None else None
+                    if reused_from:
+                        if progress_callback: progress_callback(60, '동일 음원의 분리 결과 재사용')
+                        result['reused_from'] = reused_from
+                        self.fingerprints.add(video_id, *fingerprint)
+                        checkpoint.mark_done('separate', {'reused_from': reused_from})
+                        checkpoint.mark_done('encode', {'reused_from': reused_from})
+                        return
+                except Exception as e:
+                    logger.warning(f"[Fingerprint] 지문 확인 실패: {e}")
+
+            if progress_callback: progress_callback(20, 'AI 오디오 분리 및 MP3 변환 중 (GPU)...')
+            separation_dir.mkdir(parents=True, exist_ok=True)
+
+            with processor.acquire_model(model) as demucs_model:
+                if streaming:
+                    def on_chunk(info):
+                        if chunk_callback:
+                            chunk_callback({
+                                **info,
+                                'video_id': video_id,
+                                'playlists': {
+                                    t: f"/downloads/{video_id}/stream/{name}.m3u8"
+                                    for t, name in self.STREAM_TRACKS.items()
+                                }
+                            })
+                    # 스트리밍 모드는 분리와 변환이 한 번에 끝남
+                    stream_kwargs = {'overlap': overlap} if overlap is not None else {}
+                    if not processor.process_streaming(
+                            demucs_model, audio_file, separation_dir, progress_callback, chunk_callback=on_chunk,
+                            store_path=store_path if STEM_STORE_KEEP != 'none' else None, **stream_kwargs):
+                        raise Exception("Demucs 분리 실패")
+                    self._trim_stem_store(store_path)
+                    checkpoint.mark_done('separate', {'streaming': True})
+                    checkpoint.mark_done('encode', {'streaming': True})
+                    result['encode_timings'] = {n: r['seconds'] for n, r in processor.last_encode_report.items()}
+                    if fingerprint is not None:
+                        self.fingerprints.add(video_id, *fingerprint)
+                    return
+
+                try:
+                    if overlap is not None:
+                        sources = processor.separate(demucs_model, audio_file, overlap=overlap)
+                    else:
+                        sources = processor.separate(demucs_model, audio_file)
+                except Exception as e:
+                    logger.error(f"[Demucs] 오류: {e}")
+                    raise Exception("Demucs 분리 실패")
+                track_names, samplerate = list(demucs_model.sources), demucs_model.samplerate
+
+            if fingerprint is not None:
+                self.fingerprints.add(video_id, *fingerprint)
+
+            # 분리 체크포인트(저장소)는 인코딩과 병렬로 기록
+            save_future = self._io_pool.submit(processor.save_stem_store, sources, track_names, samplerate, store_path)
+        else:
+            save_future = None
+
+        if progress_callback: progress_callback(60, '트랙 저장 및 MP3 변환 중...')
+        encode_error = None
+        try:
+            processor.encode_stems(sources, track_names, separation_dir, samplerate)
+        except Exception as e:
+            encode_error = e
+
+        if save_future is not None:
+            try:
+                save_future.result().close()
+                checkpoint.mark_done('separate', {'store': StemStore.FILE_NAME, 'sources': track_names,
+                                                  'samplerate': samplerate})
+            except Exception as e:
+                logger.warning(f"[Checkpoint] 분리 결과 저장 실패: {e}")
+
+        if encode_error is not None:
+            raise Exception(f"MP3 변환 실패: {encode_error}")
+
+        checkpoint.mark_done('encode', {'tracks': track_names})
+        result['encode_timings'] = {n: r['seconds'] for n, r in processor.last_encode_report.items()}
+        # 체크포인트 용도가 끝났으므로 후처리용으로 보관할 트랙만 남김
+        self._trim_stem_store(store_path)
+
+        # 정렬용 보컬만 남김 (모노 다운믹스는 새 텐서이므로 나머지 트랙 메모리는 해제됨)
+        if 'vocals' in track_names:
+            return sources[track_names.index('vocals')].mean(0), samplerate
+        return None
+
+    def _checkpoint_store(self, separation_dir: Path) -> Optional[StemStore]:
+        """변환 단계를 재개할 수 있는 저장소 (모든 트랙 포함), 없거나 일부만 남아 있으면 None"""
+        store = open_stem_store(separation_dir)
+        if store is not None and not set(self.STREAM_TRACKS.values()) <= set(store.names):
+            store.close()
             return None
-            
-        for t, info in tracks.items():
-            info['path'] = f"/downloads/{video_id}/{t}.mp3"
-            
-        lyrics_content = None
-        
-        # 1. JSON 캐시 확인
-        json_path = work_dir / 'aligned.json'
-        if json_path.exists():
-            lyrics_content = json_path.read_text(encoding='utf-8')
+        return store
+
+    @staticmethod
+    def _trim_stem_store(store_path: Path):
+        """변환 완료 후 STEM_STORE_KEEP에 따라 저장소 정리 (vocals: 보컬만 / none: 삭제 / all: 유지)"""
+        if STEM_STORE_KEEP == 'all' or not store_path.is_file():
+            return
+        try:
+            if STEM_STORE_KEEP == 'vocals':
+                keep_stems(store_path, ['vocals'])
+            else:
+                store_path.unlink()
+        except (OSError, ValueError) as e:
+            logger.warning(f"[StemStore] 저장소 정리 실패: {e}")
+
+    @staticmethod
+    def _drop_stream(separation_dir: Path):
+        """점진적 분리의 HLS 플레이리스트/세그먼트(separated/stream) 삭제"""
+        stream_dir = separation_dir / 'stream'
+        if stream_dir.is_dir():
+            shutil.rmtree(stream_dir, ignore_errors=True)
+
+    @staticmethod
+    def _stored_vocals(separation_dir: Path) -> Optional[Tuple[np.ndarray, int]]:
+        """StemStore의 보컬 (모노 파형, 샘플레이트), 없으면 None"""
+        store = open_stem_store(separation_dir)
+        if store is None or 'vocals' not in store.names:
+            return None
+        try:
+            return store.read('vocals').mean(axis=0), store.samplerate
+        finally:
+            store.close()
+
+    def _stage_text(self, checkpoint: StageCheckpoint, video_id: str, work_dir: Path,
+                    meta: Dict[str, Any]) -> Optional[str]:
+        """[4단계] 가사/자막 텍스트 확보 (분리와 병렬 실행되므로 진행률은 보내지 않음)"""
+        done = checkpoint.get('text')
+        if done is not None:
+            return done.get('lyrics_text')
+
+        lyrics_text = None
+        errors = []
+        source_type = meta.get('sourceType', 'general')
+
+        # 4-A. 공식 음원 크롤링
+        if source_type == 'official' and meta.get('title'):
+            try:
+                res = self.lyrics_crawler.fetch_lyrics(meta['title'], meta['artist'], meta['album'])
+                if res: lyrics_text = self.text_cleaner.clean_text(res['lyrics'])
+            except Exception as e:
+                logger.warning(f"[Text] 크롤링 실패: {e}")
+                errors.append(f"crawl: {e}")
+
+        # 4-B. 자막 다운로드
+        if not lyrics_text:
+            try:
+                sub_file = self._download_subtitles(video_id, work_dir)
+                if sub_file:
+                    lyrics_text = self.text_cleaner.parse_vtt_to_text(sub_file)
+            except Exception as e:
+                logger.warning(f"[Text] 자막 실패: {e}")
+                errors.append(f"subtitle: {e}")
+
+        # 일시적 오류로 못 찾은 경우는 다음 요청에서 재시도 (한도 내)
+        if lyrics_text or not errors:
+            checkpoint.mark_done('text', {'lyrics_text': lyrics_text})
         else:
-            # 2. LRC 캐시 확인 (하위 호환)
-            lrc_path = work_dir / 'aligned.lrc'
-            if lrc_path.exists():
-                lyrics_content = lrc_path.read_text(encoding='utf-8')
+            checkpoint.record_failure('text', '; '.join(errors))
+        return lyrics_text
+
+    def _stage_align(self, checkpoint: StageCheckpoint, work_dir: Path, lyrics_text: Optional[str],
+                     vocal_path: Optional[str], result: Dict[str, Any], progress_callback: Optional[Callable],
+                     vocal_audio: Optional[Tuple[Any, int]] = None):
+        """
+        [5단계] Whisper 정렬 → aligned.json (원자적 기록)
+        - 보컬 입력 우선순위: 메모리 파형 → StemStore → vocals.mp3 경로
+        """
+        json_path = work_dir / 'aligned.json'
+        if checkpoint.is_done('align'):
+            if json_path.exists():
+                result['lyrics_lrc'] = json_path.read_text(encoding='utf-8')
+                ensure_compact(work_dir)
+            return
+
+        if not (lyrics_text and len(lyrics_text) > 10 and vocal_path):
+            # 가사 단계가 일시 오류로 끝나지 않았으면 정렬도 미완료로 두어 재시도 시 다시 실행
+            if not checkpoint.is_done('text'):
+                logger.info("[Align] 가사 단계 미완료, 정렬 보류")
+                return
+            checkpoint.mark_done('align', {'skipped': True, 'reason': 'no_lyrics'})
+            return
+
+        if progress_callback: progress_callback(85, 'AI 정밀 정렬 중 (Whisper)...')
+        try:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            
+            vocal_audio = vocal_audio or self._stored_vocals(work_dir / 'separated')
+            audio, samplerate = vocal_audio if vocal_audio else (vocal_path, None)
+
+            # align_lyrics가 이제 JSON 문자열을 반환한다고 가정
+            lyrics_json_str = self.aligner(audio, lyrics_text, device=device, samplerate=samplerate)
             
-        return {
+            if lyrics_json_str:
+                # JSON 파일로 저장
+                atomic_write_text(json_path, lyrics_json_str)
+                # 클라이언트용 압축 형식 (열 배열 + 줄 그룹, gzip 사본)
+                write_compact(work_dir, lyrics_json_str)
+                coverage = parse_tags(lyrics_json_str).get('coverage')
+                checkpoint.mark_done('align', {'file': json_path.name, 'coverage': coverage and float(coverage)})
+                result['lyrics_coverage'] = coverage and float(coverage)
+                
+                # 결과에 포함 (변수명은 호환성을 위해 lyrics_lrc 유지)
+                result['lyrics_lrc'] = lyrics_json_str
+                logger.info("[Align] 정렬 및 JSON 저장 완료")
+            else:
+                checkpoint.record_failure('align', 'align_lyrics 결과 없음')
+        except Exception as e:
+            logger.error(f"[Align] 정렬 실패: {e}")
+            checkpoint.record_failure('align', str(e))
+
+    def _reuse_stems(self, fingerprint, video_id: str, separation_dir: Path) -> Optional[str]:
+        """
+        지문이 일치하는 기존 video_id의 MP3 트랙(+저장소)을 현재 작업 폴더로 연결 (하드링크, 실패 시 복사)
+        Returns: 재사용한 원본 video_id (없으면 None)
+        """
+        fp, duration = fingerprint
+        match_id = self.fingerprints.lookup(fp, duration, exclude=video_id)
+        if not match_id:
+            return None
+
+        source_dir = self.download_dir / match_id / 'separated'
+        file_names = [f"{name}.mp3" for name in self.STREAM_TRACKS.values()]
+        if (source_dir / StemStore.FILE_NAME).is_file():
+            file_names.append(StemStore.FILE_NAME)
+        if not self.cache_index.get(match_id):
+            logger.info(f"[Fingerprint] 일치 항목({match_id})의 트랙이 없어 재사용 불가")
+            return None
+
+        separation_dir.mkdir(parents=True, exist_ok=True)
+        for name in file_names:
+            src, dst = source_dir / name, separation_dir / name
+            if dst.exists():
+                dst.unlink()
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+        logger.info(f"[Fingerprint] {match_id}의 분리 결과를 {video_id}에 재사용")
+        return match_id
+
+    def get_cached_result(self, video_id: str) -> Optional[Dict]:
+        """
+        완료된 결과가 있으면 반환 (작업 큐 등록 전 빠른 확인용)
+        - 미완료 단계(자막/정렬 실패 등)가 남아 있으면 None → 파이프라인이 해당 단계부터 재개
+        """
+        cached = self._check_cache(video_id)
+        if cached and self.cache_manager:
+            self.cache_manager.touch(video_id)
+        return cached
+
+    def _check_cache(self, video_id: str) -> Optional[Dict]:
+        """캐시 확인 (색인 조회, 적중 시에만 가사 파일 읽기)"""
+        entry = self.cache_index.get(video_id)
+        if not entry or not entry.get('complete', True):
+            return None
+
+        tracks = self.cache_index.get_tracks(video_id)
+        result = {
             'success': True,
             'video_id': video_id,
             'tracks': tracks,
-            'lyrics_lrc': lyrics_content,
+            'lyrics_lrc': None,
             'cached': True
         }
 
-    def _download_subtitles(self, video_id: str, output_dir: Path) -> Optional[str]:
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        
-        # 기존 자막 삭제
-        for old_file in output_dir.glob("*.vtt"):
-            try: old_file.unlink()
-            except: pass
+        # 압축 형식이 있으면 경로만 전달, 없으면 JSON -> LRC 순 (색인에 기록된 파일) 원문
+        self._attach_lyrics_url(video_id, result)
+        if entry.get('lyrics_file') and (LYRICS_INLINE_LRC or not result.get('lyrics_url')):
+            try:
+                result['lyrics_lrc'] = (self.download_dir / video_id / entry['lyrics_file']).read_text(encoding='utf-8')
+            except OSError:
+                pass
+        return result
 
-        def try_download(is_auto: bool):
-            cmd = [
-                'yt-dlp',
-                '--write-auto-sub' if is_auto else '--write-sub',
-                '--sub-lang', 'ko,en',
-                '--skip-download',
-                '-o', str(output_dir / '%(title)s.%(ext)s'),
-                url
-            ]
-            subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            candidates = list(output_dir.glob('*.vtt'))
-            if not candidates: return None
-            for f in candidates:
-                if '.ko' in f.name: return str(f)
-            return str(candidates[0])
-
-        manual_sub = try_download(False)
-        if manual_sub: return manual_sub
-        
-        if self.REQUIRE_MANUAL_SUBTITLES: return None
-            
-        return try_download(True)
\ No newline at end of file
+    def _attach_lyrics_url(self, video_id: str, result: Dict[str, Any]):
+        """압축 가사 경로 추가 (있으면 LRC 원문은 LYRICS_INLINE_LRC일 때만 유지)"""
+        lyrics_url = self.cache_index.get_lyrics_url(video_id)
+        if not lyrics_url:
+            return
+        result['lyrics_url'] = lyrics_url
+        if not LYRICS_INLINE_LRC:
+            result['lyrics_lrc'] = None
+
+    def _download_subtitles(self, video_id: str, output_dir: Path) -> Optional[str]:
+        return self.downloader.download_subtitles(
+            video_id, output_dir, allow_auto=not self.REQUIRE_MANUAL_SUBTITLES
+        )
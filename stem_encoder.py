@@ -0,0 +1,172 @@
+"""
+분리된 트랙 MP3 인코딩 단계
+- 트랙 텐서를 raw float32 PCM으로 ffmpeg stdin에 직접 전달 (임시 WAV 없음)
+- 프로세스 전역 공유 풀로 동시 인코딩 수 제한 (여러 작업이 동시에 돌아도 코어 수 초과 방지)
+- 트랙별 소요 시간/크기 리포트
+- 점진적 분리용 HLS(event playlist) 스트리밍 인코더
+"""
+
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any
+
+import torch
+
+from config import STEM_ENCODE_WORKERS, STREAM_SEGMENT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 인코딩 전용 공유 풀 (각 작업은 ffmpeg 서브프로세스이므로 스레드로 충분)
+_encode_pool = ThreadPoolExecutor(max_workers=STEM_ENCODE_WORKERS, thread_name_prefix='stem-encoder')
+
+
+def encode_stem(source: torch.Tensor, mp3_path: Path, samplerate: int, quality: int = 2) -> bool:
+    """
+    분리된 트랙 텐서(channels, samples)를 raw float32 PCM으로 ffmpeg stdin에 전달하여 MP3 인코딩
+    - 완성된 파일만 최종 경로로 교체 (부분 파일 노출 방지)
+    """
+    mp3_path = Path(mp3_path)
+    part_path = mp3_path.with_name(mp3_path.name + '.part')
+    try:
+        source = source.detach().cpu().float()
+        # save_audio(clip='rescale')와 동일: 피크가 1을 넘으면 전체 스케일 다운
+        source = source / max(1.01 * source.abs().max().item(), 1)
+        channels = source.shape[0]
+        pcm = source.t().contiguous().numpy().tobytes()  # interleaved f32le
+
+        cmd = [
+            'ffmpeg', '-y',
+            '-f', 'f32le', '-ar', str(samplerate), '-ac', str(channels),
+            '-i', 'pipe:0',
+            '-codec:a', 'libmp3lame',
+            '-qscale:a', str(quality),  # VBR (2 = High Quality, ~190kbps average)
+            '-f', 'mp3',
+            str(part_path)
+        ]
+        proc = subprocess.run(cmd, input=pcm, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0 or not part_path.exists() or part_path.stat().st_size == 0:
+            logger.error(f"[Encoder] MP3 변환 실패 ({mp3_path.name}): {proc.stderr.decode(errors='ignore')[-500:]}")
+            return False
+
+        os.replace(part_path, mp3_path)
+        return True
+
+    except Exception as e:
+        logger.error(f"[Encoder] MP3 변환 실패 ({mp3_path.name}): {e}")
+        return False
+
+    finally:
+        if part_path.exists():
+            try: part_path.unlink()
+            except OSError: pass
+
+
+class StemEncoder:
+    """트랙 묶음을 공유 풀에서 동시에 인코딩"""
+
+    def __init__(self, quality: int = 2):
+        self.quality = quality
+
+    def encode_all(self, stems: Dict[str, torch.Tensor], output_dir: Path, samplerate: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Args:
+            stems: {트랙 이름: (channels, samples) 텐서}
+        Returns:
+            {트랙 이름: {'ok': bool, 'seconds': float, 'size': MB}}
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        def run(name, source):
+            mp3_path = output_dir / f"{name}.mp3"
+            start = time.time()
+            ok = encode_stem(source, mp3_path, samplerate, self.quality)
+            elapsed = time.time() - start
+            size = mp3_path.stat().st_size / (1024 * 1024) if ok else 0.0
+            return name, {'ok': ok, 'seconds': round(elapsed, 3), 'size': size}
+
+        stage_start = time.time()
+        futures = [_encode_pool.submit(run, name, source) for name, source in stems.items()]
+        report = dict(f.result() for f in futures)
+        stage_seconds = time.time() - stage_start
+
+        serial_seconds = sum(r['seconds'] for r in report.values())
+        detail = ', '.join(f"{n} {r['seconds']:.1f}s" for n, r in report.items())
+        logger.info(f"[Encoder] 인코딩 완료 {stage_seconds:.1f}s (트랙 합계 {serial_seconds:.1f}s): {detail}")
+        return report
+
+
+class StreamingStemEncoder:
+    """
+    트랙별 ffmpeg 프로세스를 열어두고 분리된 구간을 도착 순서대로 이어 붙여 HLS로 인코딩
+    - <stream_dir>/<트랙>.m3u8 (EVENT playlist) + <트랙>_NNN.ts 세그먼트
+    - 플레이리스트가 append-only로 늘어나므로 클라이언트는 첫 세그먼트부터 재생 가능
+    """
+
+    def __init__(self, stream_dir: Path, track_names, samplerate: int, channels: int,
+                 segment_seconds: int = STREAM_SEGMENT_SECONDS, bitrate: str = '192k'):
+        self.stream_dir = Path(stream_dir)
+        self.track_names = list(track_names)
+        self.samplerate = samplerate
+        self.channels = channels
+        self.segment_seconds = segment_seconds
+        self.bitrate = bitrate
+        self._procs = {}
+
+    def playlist_path(self, name: str) -> Path:
+        return self.stream_dir / f"{name}.m3u8"
+
+    def start(self):
+        self.stream_dir.mkdir(parents=True, exist_ok=True)
+        for old in list(self.stream_dir.glob('*.ts')) + list(self.stream_dir.glob('*.m3u8')):
+            try: old.unlink()
+            except OSError: pass
+
+        for name in self.track_names:
+            cmd = [
+                'ffmpeg', '-y',
+                '-f', 'f32le', '-ar', str(self.samplerate), '-ac', str(self.channels),
+                '-i', 'pipe:0',
+                '-codec:a', 'aac', '-b:a', self.bitrate,
+                '-f', 'hls',
+                '-hls_time', str(self.segment_seconds),
+                '-hls_list_size', '0',
+                '-hls_playlist_type', 'event',
+                '-hls_segment_filename', str(self.stream_dir / f"{name}_%03d.ts"),
+                str(self.playlist_path(name))
+            ]
+            self._procs[name] = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def write(self, chunks: Dict[str, torch.Tensor]):
+        """확정된 구간(channels, samples)을 트랙별 인코더에 전달"""
+        for name, chunk in chunks.items():
+            proc = self._procs.get(name)
+            if proc is None or proc.poll() is not None:
+                continue
+            # 전체 피크를 아직 모르므로 rescale 대신 클리핑
+            pcm = chunk.detach().cpu().float().clamp(-1, 1).t().contiguous().numpy().tobytes()
+            try:
+                proc.stdin.write(pcm)
+                proc.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                logger.warning(f"[Encoder] 스트리밍 인코더 종료됨 ({name}): {e}")
+
+    def close(self, timeout: float = 60) -> bool:
+        """stdin을 닫아 마지막 세그먼트와 #EXT-X-ENDLIST 기록"""
+        ok = True
+        for name, proc in self._procs.items():
+            try:
+                if proc.stdin and not proc.stdin.closed:
+                    proc.stdin.close()
+                ok = proc.wait(timeout=timeout) == 0 and ok
+            except Exception as e:
+                logger.warning(f"[Encoder] 스트리밍 인코더 종료 실패 ({name}): {e}")
+                proc.kill()
+                ok = False
+        self._procs = {}
+        return ok